@@ -1,29 +1,55 @@
 
-import serial
-import time
+import argparse
+
+from sensor_reader import BAUD_RATE, SENSOR_NAMES, SensorReader
 
 # === CONFIGURATION ===
 SERIAL_PORT = "/dev/ttyUSB0"  # Change to your port (Linux: "/dev/ttyUSB0")
-BAUD_RATE = 9600
+DETECT_THRESHOLD = 1.0        # meters, same as the sketch's motor threshold
+
+def format_reading(seq, distances):
+    cells = []
+    for name, d in zip(SENSOR_NAMES, distances):
+        cells.append(f"{name} {'  -  ' if d != d else f'{d:4.2f}m'}")
+    return f"#{seq:5d}  " + "  ".join(cells)
+
+def detected_bits(distances, threshold=DETECT_THRESHOLD):
+    """Legacy 4-bit value: bit i set if sensor i sees something within threshold."""
+    value = 0
+    for i, d in enumerate(distances):
+        if d == d and d <= threshold:
+            value |= 1 << i
+    return value
 
 def main():
+    parser = argparse.ArgumentParser(description='Read the ultrasonic sensor board')
+    parser.add_argument('--port', default=SERIAL_PORT, help='Serial port (or simulator pty)')
+    parser.add_argument('--baud', type=int, default=BAUD_RATE, help='Baud rate')
+    parser.add_argument('--stats_every', type=float, default=2.0, help='Seconds between link statistics')
+    args = parser.parse_args()
+
+    def show(t_host, seq, distances):
+        print(f"{format_reading(seq, distances)}  bits {detected_bits(distances):04b}")
+
+    reader = SensorReader(args.port, args.baud, on_reading=show)
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        time.sleep(2)  # Allow Arduino reset
-
-        print("Reading sensor binary data...")
-        while True:
-            line = ser.readline().decode('utf-8').strip()
-            if line:
-                # Example: "0101"
-                print(f"Binary: {line}")
-                value = int(line, 2)
-                print(f"As Integer: {value}")
-            time.sleep(0.1)
-    except serial.SerialException as e:
+        reader.open()
+    except Exception as e:
         print(f"Error: {e}")
+        return
+
+    print("Reading sensor distances...")
+    reader.start()
+    try:
+        while reader.is_alive():
+            reader.join(args.stats_every)
+            print(reader.summary())
+        if reader.error is not None:
+            print(f"Error: {reader.error}")
     except KeyboardInterrupt:
         print("\nExiting...")
+    finally:
+        reader.stop()
 
 if __name__ == "__main__":
     main()
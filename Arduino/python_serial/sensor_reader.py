@@ -0,0 +1,242 @@
+"""
+Low-latency reader for the framed distance protocol sent by
+ultrasonic_and_motor_control.ino.
+
+Frame (17 bytes, little-endian):
+    0xAA 0x55      sync
+    seq            u16, wraps at 65536
+    t_ms           u32, Arduino millis() when the sweep finished
+    dist_mm[4]     u16 per sensor (front, left, back, right), 0 = no echo
+    checksum       u8, XOR of every byte between sync and checksum
+
+A background thread blocks on the port (no polling sleeps), parses frames
+as soon as their bytes arrive, and publishes timestamped readings into a
+fixed-size ring buffer. Sequence gaps are counted as dropped frames and
+corrupt frames are skipped by re-synchronising on the next sync word.
+
+    reader = SensorReader("/dev/ttyACM0")
+    reader.start()
+    t_host, seq, distances = reader.ring.latest()
+"""
+import struct
+import threading
+import time
+
+import numpy as np
+
+SYNC = b"\xAA\x55"
+BAUD_RATE = 115200
+N_SENSORS = 4
+SENSOR_NAMES = ("front", "left", "back", "right")
+_BODY = struct.Struct("<HI" + "H" * N_SENSORS)
+FRAME_SIZE = len(SYNC) + _BODY.size + 1
+
+
+def checksum(body):
+    c = 0
+    for b in body:
+        c ^= b
+    return c
+
+
+def encode_frame(seq, t_ms, distances_mm):
+    """Build one frame (used by the simulator; mirrors sendFrame() in the sketch)."""
+    body = _BODY.pack(seq & 0xFFFF, t_ms & 0xFFFFFFFF, *[min(max(int(d), 0), 0xFFFF) for d in distances_mm])
+    return SYNC + body + bytes([checksum(body)])
+
+
+class FrameParser:
+    """
+    Incremental parser: feed() raw bytes in any chunking, get back the
+    complete frames as (seq, t_ms, distances_mm) tuples.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.bad_checksum = 0
+        self.skipped_bytes = 0
+
+    def feed(self, data):
+        self._buf += data
+        frames = []
+        buf = self._buf
+        start = 0
+        while True:
+            i = buf.find(SYNC, start)
+            if i < 0:
+                # keep a trailing 0xAA, it may be the first half of the next sync word
+                keep = 1 if buf[-1:] == SYNC[:1] else 0
+                self.skipped_bytes += len(buf) - start - keep
+                start = len(buf) - keep
+                break
+            self.skipped_bytes += i - start
+            if len(buf) - i < FRAME_SIZE:
+                start = i
+                break
+            body = bytes(buf[i + 2:i + FRAME_SIZE - 1])
+            if checksum(body) != buf[i + FRAME_SIZE - 1]:
+                self.bad_checksum += 1
+                start = i + 1                       # resync past this sync word
+                continue
+            seq, t_ms, *dist = _BODY.unpack(body)
+            frames.append((seq, t_ms, dist))
+            start = i + FRAME_SIZE
+        del buf[:start]
+        return frames
+
+
+class ReadingRing:
+    """
+    Fixed-size ring of the most recent readings. Distances are stored in
+    meters (float32, NaN = no echo) next to the host receive time, the
+    device time and the sequence number.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.t_host = np.zeros(capacity, dtype=np.float64)
+        self.t_device = np.zeros(capacity, dtype=np.float64)
+        self.seq = np.zeros(capacity, dtype=np.int64)
+        self.distance = np.full((capacity, N_SENSORS), np.nan, dtype=np.float32)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def push(self, t_host, t_device, seq, distances_mm):
+        i = self.count % self.capacity
+        d = np.asarray(distances_mm, dtype=np.float32) * np.float32(1e-3)
+        d[d <= 0] = np.nan
+        with self._lock:
+            self.t_host[i] = t_host
+            self.t_device[i] = t_device
+            self.seq[i] = seq
+            self.distance[i] = d
+            self.count += 1
+
+    def latest(self):
+        """(t_host, seq, distances_m) of the newest reading, or None."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            i = (self.count - 1) % self.capacity
+            return float(self.t_host[i]), int(self.seq[i]), self.distance[i].copy()
+
+    def recent(self, n=None, since=None):
+        """
+        Oldest-first copies of the last n readings (all retained by default),
+        optionally only those received after host time `since`.
+        Returns dict with "t_host", "t_device", "seq", "distance".
+        """
+        with self._lock:
+            available = min(self.count, self.capacity)
+            n = available if n is None else min(n, available)
+            idx = (np.arange(self.count - n, self.count)) % self.capacity
+            out = {
+                "t_host": self.t_host[idx],
+                "t_device": self.t_device[idx],
+                "seq": self.seq[idx],
+                "distance": self.distance[idx],
+            }
+        if since is not None:
+            keep = out["t_host"] > since
+            out = {k: v[keep] for k, v in out.items()}
+        return out
+
+
+class LinkStats:
+    """
+    Dropped-frame and latency bookkeeping. Host and Arduino clocks are not
+    synchronised, so latency is reported relative to the fastest frame seen
+    (clock offset = min(host - device)): it is the queuing / transmission
+    delay on top of the best case, which is what jitter on the link costs.
+    """
+
+    def __init__(self, window=200):
+        self.frames = 0
+        self.dropped = 0
+        self.last_seq = None
+        self._offset = None
+        self._lat = np.zeros(window, dtype=np.float64)
+        self._n = 0
+
+    def record(self, seq, t_device, t_host):
+        if self.last_seq is not None:
+            gap = (seq - self.last_seq) & 0xFFFF
+            if gap > 1:
+                self.dropped += gap - 1
+        self.last_seq = seq
+        self.frames += 1
+
+        offset = t_host - t_device
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+        self._lat[self._n % len(self._lat)] = offset - self._offset
+        self._n += 1
+
+    def latency_ms(self):
+        """(p50, p95, max) of the excess latency over the recent window, in ms."""
+        lat = self._lat[:min(self._n, len(self._lat))]
+        if lat.size == 0:
+            return 0.0, 0.0, 0.0
+        p50, p95 = np.percentile(lat, [50, 95])
+        return 1000 * float(p50), 1000 * float(p95), 1000 * float(lat.max())
+
+    def summary(self):
+        total = self.frames + self.dropped
+        loss = 100.0 * self.dropped / total if total else 0.0
+        p50, p95, worst = self.latency_ms()
+        return (f"frames {self.frames} dropped {self.dropped} ({loss:.1f}%) "
+                f"latency p50 {p50:.1f} ms p95 {p95:.1f} ms max {worst:.1f} ms")
+
+
+class SensorReader(threading.Thread):
+    """
+    Background thread: reads whatever bytes the port has (blocking until at
+    least one arrives), parses frames and pushes them into `ring`.
+    on_reading(t_host, seq, distances_m), if given, is called from this thread.
+    """
+
+    def __init__(self, port, baud=BAUD_RATE, ring_size=256, on_reading=None, read_timeout=0.1):
+        super().__init__(name="sensor-reader", daemon=True)
+        self.port = port
+        self.baud = baud
+        self.ring = ReadingRing(ring_size)
+        self.parser = FrameParser()
+        self.stats = LinkStats()
+        self.on_reading = on_reading
+        self.read_timeout = read_timeout
+        self.error = None
+        self._stop_event = threading.Event()
+        self._ser = None
+
+    def open(self):
+        import serial
+        # The timeout only bounds how long stop() waits; reads return as soon as data is there.
+        self._ser = serial.Serial(self.port, self.baud, timeout=self.read_timeout)
+        return self._ser
+
+    def run(self):
+        try:
+            ser = self._ser or self.open()
+            while not self._stop_event.is_set():
+                data = ser.read(max(1, ser.in_waiting))
+                if not data:
+                    continue
+                t_host = time.time()
+                for seq, t_ms, dist in self.parser.feed(data):
+                    self.stats.record(seq, t_ms / 1000.0, t_host)
+                    self.ring.push(t_host, t_ms / 1000.0, seq, dist)
+                    if self.on_reading is not None:
+                        self.on_reading(t_host, seq, self.ring.latest()[2])
+        except Exception as e:
+            self.error = e
+        finally:
+            if self._ser is not None:
+                self._ser.close()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self.join(timeout)
+
+    def summary(self):
+        return (f"{self.stats.summary()} | bad checksum {self.parser.bad_checksum} "
+                f"skipped {self.parser.skipped_bytes} B")
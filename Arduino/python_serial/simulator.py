@@ -0,0 +1,89 @@
+"""
+Stand-in for the Arduino: opens a pseudo-terminal and writes framed distance
+readings to it, so sensor_reader.py / pythonserial.py can run without hardware.
+
+    python simulator.py --rate 20 --drop 0.02 --corrupt 0.01
+    # Simulated sensor port: /dev/pts/5
+    python pythonserial.py --port /dev/pts/5
+
+Distances follow slow sinusoids (one per sensor) with occasional "no echo"
+zeros; --drop skips sequence numbers and --corrupt flips a byte, to exercise
+the reader's drop counting and resynchronisation.
+"""
+import argparse
+import os
+import pty
+import time
+import tty
+
+import numpy as np
+
+from sensor_reader import N_SENSORS, encode_frame
+
+
+class PtySimulator:
+
+    def __init__(self, rate=20.0, drop=0.0, corrupt=0.0, seed=0):
+        self.rate = rate
+        self.drop = drop
+        self.corrupt = corrupt
+        self.rng = np.random.default_rng(seed)
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)                      # no line discipline mangling of 0x0A / 0x0D
+        self.port = os.ttyname(self.slave)
+        self.seq = 0
+        self.sent = 0
+        self._t0 = time.monotonic()
+
+    def distances_mm(self, t):
+        phase = np.arange(N_SENSORS) * np.pi / 2
+        d = 1500 + 1200 * np.sin(0.4 * t + phase)
+        d[self.rng.random(N_SENSORS) < 0.03] = 0     # no echo
+        return d
+
+    def frame(self):
+        t = time.monotonic() - self._t0
+        if self.rng.random() < self.drop:
+            self.seq += 1                           # lost on the wire
+        data = bytearray(encode_frame(self.seq, int(t * 1000), self.distances_mm(t)))
+        if self.rng.random() < self.corrupt:
+            data[self.rng.integers(2, len(data))] ^= 0xFF
+        self.seq = (self.seq + 1) & 0xFFFF
+        return bytes(data)
+
+    def run(self, duration=None):
+        period = 1.0 / self.rate
+        next_t = time.monotonic()
+        end = None if duration is None else next_t + duration
+        while end is None or next_t < end:
+            os.write(self.master, self.frame())
+            self.sent += 1
+            next_t += period
+            time.sleep(max(0.0, next_t - time.monotonic()))
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the ultrasonic sensor board on a pty')
+    parser.add_argument('--rate', type=float, default=20.0, help='Frames per second')
+    parser.add_argument('--drop', type=float, default=0.0, help='Probability of skipping a sequence number')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='Probability of corrupting a frame')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    args = parser.parse_args()
+
+    sim = PtySimulator(args.rate, args.drop, args.corrupt)
+    print(f"Simulated sensor port: {sim.port}", flush=True)
+    try:
+        sim.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Sent {sim.sent} frames")
+        sim.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,19 @@ const int motorPins[4] = {4, 7, 10, 13};
 // Distance threshold (in meters) for detection
 const float DETECT_THRESHOLD = 1.0;  // 1m
 
+// Minimum time between sweeps (ms); a sweep itself takes up to 4 x 30 ms
+// when nothing echoes, so this only throttles the fast (close obstacle) case
+const unsigned long SWEEP_PERIOD_MS = 50;
+
+// === Serial frame (see python_serial/sensor_reader.py) ===
+// 0xAA 0x55 | seq u16 | millis u32 | 4 x distance u16 (mm, 0 = no echo) | XOR checksum
+const byte SYNC0 = 0xAA;
+const byte SYNC1 = 0x55;
+uint16_t seq = 0;
+unsigned long lastSweep = 0;
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(115200);
   for (int i = 0; i < 4; i++) {
     pinMode(trigPins[i], OUTPUT);
     pinMode(echoPins[i], INPUT);
@@ -32,26 +43,46 @@ float getDistance(int trigPin, int echoPin) {
   return distance / 100.0;                       // convert to meters
 }
 
+void writeLE(byte *buf, int &n, unsigned long value, int bytes) {
+  for (int b = 0; b < bytes; b++) {
+    buf[n++] = (value >> (8 * b)) & 0xFF;
+  }
+}
+
+void sendFrame(const uint16_t distMm[4]) {
+  byte buf[17];
+  int n = 0;
+  buf[n++] = SYNC0;
+  buf[n++] = SYNC1;
+  writeLE(buf, n, seq++, 2);
+  writeLE(buf, n, millis(), 4);
+  for (int i = 0; i < 4; i++) {
+    writeLE(buf, n, distMm[i], 2);
+  }
+  byte check = 0;
+  for (int i = 2; i < n; i++) {
+    check ^= buf[i];
+  }
+  buf[n++] = check;
+  Serial.write(buf, n);  // buffered by the UART driver, does not block the sweep
+}
+
 void loop() {
-  byte sensorBits = 0;
+  unsigned long now = millis();
+  if (now - lastSweep < SWEEP_PERIOD_MS) {
+    return;
+  }
+  lastSweep = now;
 
+  uint16_t distMm[4];
   for (int i = 0; i < 4; i++) {
     float dist = getDistance(trigPins[i], echoPins[i]);
     bool detected = (dist > 0 && dist <= DETECT_THRESHOLD);
-
-    if (detected) {
-      sensorBits |= (1 << i); // Set bit if obstacle detected
-    }
+    distMm[i] = (uint16_t)min(dist * 1000.0, 65535.0);
 
     // Motor control
     digitalWrite(motorPins[i], detected ? HIGH : LOW);
   }
 
-  // Print as binary string
-  for (int i = 3; i >= 0; i--) {
-    Serial.print((sensorBits >> i) & 1);
-  }
-  Serial.println();
-
-  delay(200); // Refresh rate
+  sendFrame(distMm);
 }
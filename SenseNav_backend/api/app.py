@@ -1,26 +1,119 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import numpy as np
+from functools import lru_cache, wraps
+import atexit
+import json
+import logging
 import sys
 import os
-import requests
-from dotenv import load_dotenv
+import time
 
-# Load environment variables
-load_dotenv()
-
-# Add the spatial_audio directory to the path
+# Add the spatial_audio and utils directories to the path (once, even if
+# app is re-imported by a reloader or a worker spawn)
 current_dir = os.path.dirname(os.path.abspath(__file__))
-spatial_audio_dir = os.path.join(current_dir, '..', 'spatial_audio')
-sys.path.insert(0, spatial_audio_dir)
+spatial_audio_dir = os.path.normpath(os.path.join(current_dir, '..', 'spatial_audio'))
+utils_dir = os.path.normpath(os.path.join(current_dir, '..', 'utils'))
+for path in (spatial_audio_dir, utils_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
 
 from closest_obstacle_audio import (
     nearest_by_sector, 
-    spatial_layers_from_pointcloud,
-    distance_to_params,
-    choose_targets,
-    process_boundary_obstacle
+    analyze_sectors,
+    process_boundary_obstacle,
+    set_render_quality
+)
+from audio_stream import CODECS, CONTAINERS, MODES, mimetype, stream_cue
+from data_processing import (
+    analysis_to_json, analysis_to_compact, analysis_to_binary, analysis_to_visualization,
+    decode_depth_roi, decode_mask, validate_point_cloud
 )
+from recording import Recorder
+from visualization_stream import VisualizationStream
+from quality import QualityController, subsample_points
+from log import setup_logging
+
+setup_logging()
+log = logging.getLogger('sensenav.api')
+
+RESPONSE_FORMATS = ('json', 'compact', 'binary')
+
+@lru_cache(maxsize=None)
+def _requests():
+    """`requests` is only needed by the Suno endpoints, so load it on first use."""
+    import requests
+    return requests
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Load .env once, on first use. python-dotenv is optional."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return False
+    return load_dotenv()
+
+def get_env(name, default=None):
+    load_env()
+    return os.getenv(name, default)
+
+SUNO_API_BASE = 'https://studio-api.prod.suno.com/api/v2/external/hackmit'
+
+def suno_api_base():
+    """Suno API root; override with SUNO_API_BASE (e.g. benchmarks/suno_stub.py for load tests)."""
+    return get_env('SUNO_API_BASE', SUNO_API_BASE).rstrip('/')
+
+@lru_cache(maxsize=None)
+def get_recorder():
+    """
+    Session recorder, if SENSENAV_RECORD_DIR is set: every analyzed request is
+    appended to <dir>/<start time> (see utils/recording.py). None otherwise.
+    """
+    record_dir = get_env('SENSENAV_RECORD_DIR')
+    if not record_dir:
+        return None
+    recorder = Recorder(os.path.join(record_dir, time.strftime('%Y%m%d-%H%M%S')))
+    atexit.register(recorder.close)
+    return recorder
+
+# Settings below come from the environment / .env, so they are read on first
+# request rather than at import (importing app must not load dotenv)
+
+@lru_cache(maxsize=None)
+def get_visualization_stream():
+    """Markers of the latest /analyze result, served as deltas by /api/visualization."""
+    return VisualizationStream(move_threshold=float(get_env('SENSENAV_VIS_THRESHOLD', 0.05)))
+
+# Latency budget per endpoint: /analyze takes milliseconds and /analyze-boundary
+# about a second, so each steps down against its own budget and a slow boundary
+# request can't lower the point budget of /analyze or the sample rate of /stream.
+QUALITY_BUDGETS = {
+    'analyze': 'SENSENAV_FRAME_BUDGET_MS',         # /analyze; /stream renders at its fs
+    'boundary': 'SENSENAV_BOUNDARY_BUDGET_MS',     # /analyze-boundary
+}
+
+@lru_cache(maxsize=None)
+def get_quality_controller(endpoint):
+    """
+    Quality controller for one endpoint (a QUALITY_BUDGETS key). Quality stays
+    at the full level unless the endpoint's budget variable is set.
+    """
+    budget_ms = float(get_env(QUALITY_BUDGETS[endpoint]) or 0)
+    if endpoint == 'boundary':
+        # Only the boundary layers are rendered with overtones / effects
+        return QualityController(budget_ms=budget_ms,
+                                 on_change=lambda p: set_render_quality(p["harmonics"], p["effects"]))
+    return QualityController(budget_ms=budget_ms)
+
+def quality_frame(endpoint):
+    """Count each request to the view as one frame for the endpoint's quality controller."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            with get_quality_controller(endpoint).frame():
+                return view(*args, **kwargs)
+        return wrapped
+    return decorator
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
@@ -31,76 +124,65 @@ def health_check():
     return jsonify({"status": "healthy", "message": "SenseNav backend is running"})
 
 @app.route('/api/spatial-audio/analyze', methods=['POST'])
+@quality_frame('analyze')
 def analyze_obstacles():
     """
     Analyze point cloud data and return spatial audio information
-    Expected input: {"points": [[x, y, z], [x, y, z], ...]}
+    Expected input: {"points": [[x, y, z], [x, y, z], ...]} or int16
+    millimeters {"points": {"data": base64, "shape": [n, 3]}} (see validate_point_cloud)
+    Optional "format" (body or ?format=): "json" (default, full objects),
+    "compact" (parallel arrays) or "binary" (see analysis_to_binary)
     """
     try:
         data = request.get_json()
         if not data or 'points' not in data:
             return jsonify({"error": "Missing 'points' in request body"}), 400
         
-        points = np.array(data['points'])
+        response_format = request.args.get('format') or data.get('format', 'json')
+        if response_format not in RESPONSE_FORMATS:
+            return jsonify({"error": f"Unknown format '{response_format}', expected one of {list(RESPONSE_FORMATS)}"}), 400
+        
+        try:
+            points = validate_point_cloud(data['points'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if points.size == 0:
+            get_visualization_stream().update({})
             return jsonify({
                 "obstacles": {},
                 "targets": [],
                 "message": "No obstacles detected"
             })
         
-        # Get obstacles by sector
-        obstacles = nearest_by_sector(points, ignore_behind=data.get('ignore_behind', False))
-        
-        # Get prioritized targets
-        targets = choose_targets(obstacles, max_targets=data.get('max_targets', 3))
-        
-        # Format response
-        response_data = {
-            "obstacles": {},
-            "targets": [],
-            "total_obstacles": len(obstacles)
-        }
+        # One columnar pass over all sectors and targets (on at most the
+        # current quality level's point budget)
+        quality = get_quality_controller('analyze')
+        with quality.stage('analyze'):
+            analyzed = subsample_points(points, quality.params['point_budget'])
+            table = analyze_sectors(
+                analyzed,
+                ignore_behind=data.get('ignore_behind', False),
+                max_targets=data.get('max_targets', 3)
+            )
         
-        # Format obstacles data
-        for sector, (distance, azimuth, elevation) in obstacles.items():
-            rate, freq, gain = distance_to_params(distance)
-            response_data["obstacles"][sector] = {
-                "distance": float(distance),
-                "azimuth_deg": float(np.degrees(azimuth)),
-                "elevation_deg": float(np.degrees(elevation)),
-                "azimuth_rad": float(azimuth),
-                "elevation_rad": float(elevation),
-                "audio_params": {
-                    "frequency": float(freq),
-                    "tremolo_rate": float(rate),
-                    "gain": float(gain)
-                }
-            }
+        recorder = get_recorder()
+        if recorder is not None:
+            # The points the table was computed from, so replay re-checks match
+            recorder.write(analyzed, sectors=table)
+        get_visualization_stream().update(analysis_to_visualization(table))
         
-        # Format targets data
-        for name, distance, azimuth, elevation in targets:
-            rate, freq, gain = distance_to_params(distance)
-            response_data["targets"].append({
-                "sector": name,
-                "distance": float(distance),
-                "azimuth_deg": float(np.degrees(azimuth)),
-                "elevation_deg": float(np.degrees(elevation)),
-                "azimuth_rad": float(azimuth),
-                "elevation_rad": float(elevation),
-                "audio_params": {
-                    "frequency": float(freq),
-                    "tremolo_rate": float(rate),
-                    "gain": float(gain)
-                }
-            })
-        
-        return jsonify(response_data)
+        if response_format == 'compact':
+            return jsonify(analysis_to_compact(table))
+        if response_format == 'binary':
+            return Response(analysis_to_binary(table), mimetype='application/octet-stream')
+        return jsonify(analysis_to_json(table))
     
     except Exception as e:
+        log.exception("analyze failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/spatial-audio/analyze-boundary', methods=['POST'])
+@quality_frame('boundary')
 def analyze_boundary_obstacles():
     """
     Analyze obstacle boundary data and return spatial audio information for the entire boundary.
@@ -110,6 +192,13 @@ def analyze_boundary_obstacles():
         "image_width": 320,
         "image_height": 240
     }
+    Optional:
+        "depth_roi": metric depth over the bbox, as nested lists or
+            {"data": base64, "shape": [h, w], "dtype": "uint16", "scale": 0.001}
+            (any resolution, 0 = invalid; see decode_depth_roi)
+        "mask": obstacle mask over the bbox, as nested 0/1 lists or
+            {"data": base64 np.packbits, "shape": [h, w]}
+        "intrinsics": {"fx", "fy", "cx", "cy"} in pixels, or "focal_length"
     """
     try:
         data = request.get_json()
@@ -133,13 +222,34 @@ def analyze_boundary_obstacles():
             if field not in bbox:
                 return jsonify({"error": f"Missing '{field}' in bbox"}), 400
         
+        try:
+            depth_roi = decode_depth_roi(data['depth_roi']) if data.get('depth_roi') is not None else None
+            mask = decode_mask(data['mask']) if data.get('mask') is not None else None
+            intrinsics = data.get('intrinsics')
+            K = tuple(float(intrinsics[k]) for k in ('fx', 'fy', 'cx', 'cy')) if intrinsics else None
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Process boundary obstacle
-        result = process_boundary_obstacle(
-            bbox=bbox,
-            depth_value=depth,
-            image_width=image_width,
-            image_height=image_height
-        )
+        quality = get_quality_controller('boundary')
+        with quality.stage('render'):
+            result = process_boundary_obstacle(
+                bbox=bbox,
+                depth_value=depth,
+                image_width=image_width,
+                image_height=image_height,
+                focal_length=data.get('focal_length'),
+                depth_roi=depth_roi,
+                mask=mask,
+                K=K,
+                fs=quality.params['fs'],
+                play=False
+            )
+        
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.write(sectors=result['obstacles'], targets=result['targets'],
+                           bboxes=[(bbox['x'], bbox['y'], bbox['width'], bbox['height'], depth)])
         
         # Convert numpy arrays to lists for JSON serialization
         if 'layers' in result and result['layers'] is not None:
@@ -154,8 +264,46 @@ def analyze_boundary_obstacles():
         return jsonify(result)
     
     except Exception as e:
+        log.exception("analyze-boundary failed")
         return jsonify({"error": str(e)}), 500
 
+MAX_STREAM_DURATION = 600.0
+
+@app.route('/api/spatial-audio/stream', methods=['POST'])
+def stream_audio():
+    """
+    Render the cue for a point cloud block by block and stream it as it is rendered
+    Expected input: {"points": [[x, y, z], ...]}
+    Optional: "mode" ("all" or "sequential"), "duration" (seconds; per cue in
+    sequential mode), "codec" ("pcm16" or "ulaw"), "container" ("wav" with an
+    unknown-length header, or "raw": big-endian audio/L16 or audio/PCMU)
+    """
+    data = request.get_json(silent=True)
+    if not data or 'points' not in data:
+        return jsonify({"error": "Missing 'points' in request body"}), 400
+    mode = data.get('mode', 'all')
+    codec = data.get('codec', 'pcm16')
+    container = data.get('container', 'wav')
+    for name, value, allowed in (('mode', mode, MODES), ('codec', codec, CODECS), ('container', container, CONTAINERS)):
+        if value not in allowed:
+            return jsonify({"error": f"Unknown {name} '{value}', expected one of {list(allowed)}"}), 400
+    try:
+        duration = float(data.get('duration', 2.0))
+        points = validate_point_cloud(data['points'])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not 0 < duration <= MAX_STREAM_DURATION:
+        return jsonify({"error": f"'duration' must be in (0, {MAX_STREAM_DURATION:g}] seconds"}), 400
+
+    picked = nearest_by_sector(points, ignore_behind=data.get('ignore_behind', False))
+    if not picked:
+        return '', 204      # nothing to announce
+    fs = get_quality_controller('analyze').params['fs']
+    return Response(stream_cue(picked, mode, duration, fs, codec=codec, container=container),
+                    mimetype=mimetype(container, codec, fs), direct_passthrough=True,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                             'X-Sample-Rate': str(fs)})
+
 @app.route('/api/spatial-audio/sectors', methods=['GET'])
 def get_sector_info():
     """Get information about the spatial audio sectors"""
@@ -174,6 +322,56 @@ def get_sector_info():
         "distance_range": {"min": 0.3, "max": 4.0}
     })
 
+@app.route('/api/quality', methods=['GET'])
+def get_quality():
+    """Per endpoint: current quality level, its knobs, and recent per-request / per-stage timings."""
+    return jsonify({endpoint: get_quality_controller(endpoint).snapshot() for endpoint in QUALITY_BUDGETS})
+
+def _since_arg():
+    """Client's last acknowledged visualization version (?since= or SSE Last-Event-ID)."""
+    since = request.args.get('since') or request.headers.get('Last-Event-ID') or 0
+    return int(since)
+
+@app.route('/api/visualization', methods=['GET'])
+def get_visualization():
+    """
+    Obstacle / target markers changed since the client's acknowledged version:
+    GET /api/visualization?since=<version>
+    Returns {"version", "since", "full", "upsert": [markers], "remove": [ids]};
+    since=0 (or a version too old to diff against) returns a full snapshot.
+    """
+    try:
+        return jsonify(get_visualization_stream().delta(_since_arg()))
+    except ValueError:
+        return jsonify({"error": "'since' must be an integer version"}), 400
+
+@app.route('/api/visualization/stream', methods=['GET'])
+def stream_visualization():
+    """
+    Server-sent events: one delta per new version, each with id=<version> so a
+    reconnecting EventSource resumes from Last-Event-ID. Keepalive comments
+    every 15 s while nothing changes.
+    """
+    try:
+        since = _since_arg()
+    except ValueError:
+        return jsonify({"error": "'since' must be an integer version"}), 400
+
+    visualization = get_visualization_stream()
+
+    def events(since):
+        yield "retry: 1000\n\n"
+        while True:
+            if not visualization.wait(since, timeout=15.0):
+                yield ": keepalive\n\n"
+                continue
+            delta = visualization.delta(since)
+            since = delta["version"]
+            yield f"id: {since}\ndata: {json.dumps(delta)}\n\n"
+
+    return Response(events(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/suno/generate-audio', methods=['POST'])
 def generate_suno_audio():
     """
@@ -186,6 +384,7 @@ def generate_suno_audio():
         "duration": 10 (optional, default 10)
     }
     """
+    requests = _requests()
     try:
         data = request.get_json()
         if not data:
@@ -206,12 +405,12 @@ def generate_suno_audio():
             prompt = generate_obstacle_prompt(direction, distance, horizontal, vertical)
         
         # Get Suno API key from environment
-        suno_api_key = os.getenv('SUNO_API_KEY')
+        suno_api_key = get_env('SUNO_API_KEY')
         if not suno_api_key:
             return jsonify({"error": "Suno API key not configured"}), 500
         
         # Suno API configuration - use correct HackMIT 2025 endpoint
-        suno_api_url = 'https://studio-api.prod.suno.com/api/v2/external/hackmit/generate'
+        suno_api_url = f'{suno_api_base()}/generate'
         
         request_data = {
             "topic": prompt,
@@ -225,26 +424,23 @@ def generate_suno_audio():
             'Content-Type': 'application/json'
         }
         
-        print(f"Making request to Suno API: {suno_api_url}")
-        print(f"Request data: {request_data}")
-        print(f"Headers: {headers}")
-        print(f"API Key: {suno_api_key}")
+        log.info("Suno generate request: %s", suno_api_url)
+        log.debug("Suno request data: %s", request_data)
         
         # Step 1: Submit generation request
         response = requests.post(suno_api_url, json=request_data, headers=headers, timeout=30)
         
-        print(f"Response status: {response.status_code}")
-        print(f"Response headers: {dict(response.headers)}")
-        print(f"Response text: {response.text[:500]}...")
+        log.info("Suno generate response: %d", response.status_code, extra={"status": response.status_code})
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Suno response body: %.500s", response.text)
         
         if response.status_code == 200:
             suno_data = response.json()
-            print(f"Suno generation response: {suno_data}")
             
             # Check if we got clip IDs
             if 'id' in suno_data:
                 clip_id = suno_data['id']
-                print(f"Got clip ID: {clip_id}")
+                log.info("Suno clip id: %s", clip_id, extra={"clip_id": clip_id})
                 
                 # Step 2: Poll for status and audio URL
                 return poll_for_audio_url(clip_id, suno_api_key, prompt, duration)
@@ -252,6 +448,7 @@ def generate_suno_audio():
                 return jsonify({"error": "No clip ID in Suno response"}), 500
         else:
             # For now, return a mock response since Suno API seems unavailable
+            log.warning("Suno generate returned %d, using fallback audio", response.status_code)
             return jsonify({
                 "success": True,
                 "audio_url": "https://www.soundjay.com/misc/sounds/bell-ringing-05.wav",  # Mock audio URL
@@ -261,8 +458,10 @@ def generate_suno_audio():
             })
     
     except requests.exceptions.Timeout:
+        log.warning("Suno generate request timed out")
         return jsonify({"error": "Suno API request timed out"}), 504
     except requests.exceptions.RequestException as e:
+        log.warning("Suno generate network error: %s", e)
         return jsonify({"error": f"Network error: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -397,7 +596,8 @@ def get_tone_description(distance, horizontal, vertical):
 
 def poll_for_audio_url(clip_id, suno_api_key, prompt, duration, max_attempts=10):
     """Poll the clips endpoint to get audio URL when ready"""
-    clips_url = 'https://studio-api.prod.suno.com/api/v2/external/hackmit/clips'
+    requests = _requests()
+    clips_url = f'{suno_api_base()}/clips'
     headers = {
         'Authorization': f'Bearer {suno_api_key}',
         'Content-Type': 'application/json'
@@ -405,19 +605,19 @@ def poll_for_audio_url(clip_id, suno_api_key, prompt, duration, max_attempts=10)
     
     for attempt in range(max_attempts):
         try:
-            print(f"Polling attempt {attempt + 1} for clip {clip_id}")
+            log.debug("Polling attempt %d for clip %s", attempt + 1, clip_id)
             response = requests.get(f"{clips_url}?ids={clip_id}", headers=headers, timeout=30)
             
             if response.status_code == 200:
                 clips_data = response.json()
-                print(f"Clips response: {clips_data}")
                 
                 if clips_data and len(clips_data) > 0:
                     clip = clips_data[0]
                     status = clip.get('status', 'unknown')
                     audio_url = clip.get('audio_url')
                     
-                    print(f"Clip status: {status}, audio_url: {audio_url}")
+                    log.info("Clip %s status: %s", clip_id, status,
+                             extra={"clip_id": clip_id, "status": status, "attempt": attempt + 1})
                     
                     if status in ['streaming', 'complete'] and audio_url:
                         return jsonify({
@@ -432,20 +632,18 @@ def poll_for_audio_url(clip_id, suno_api_key, prompt, duration, max_attempts=10)
                         return jsonify({"error": f"Clip generation failed: {clip.get('error', 'Unknown error')}"}), 500
                     else:
                         # Still generating, wait and try again
-                        import time
                         time.sleep(2)  # Wait 2 seconds before next poll
                         continue
                 else:
                     return jsonify({"error": "No clip data received"}), 500
             else:
-                print(f"Clips API error: {response.status_code} - {response.text}")
+                log.warning("Clips API error: %d %.200s", response.status_code, response.text)
                 return jsonify({"error": f"Clips API error: {response.status_code}"}), response.status_code
                 
         except Exception as e:
-            print(f"Error polling clips: {str(e)}")
+            log.warning("Error polling clips (attempt %d): %s", attempt + 1, e)
             if attempt == max_attempts - 1:
                 return jsonify({"error": f"Failed to get audio after {max_attempts} attempts: {str(e)}"}), 500
-            import time
             time.sleep(2)
     
     return jsonify({"error": f"Timeout: Audio not ready after {max_attempts} attempts"}), 504
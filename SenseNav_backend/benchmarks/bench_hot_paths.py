@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the geometry, synthesis and API hot paths.
+
+Synthetic clouds (uniform, clustered, floor-dominated) from 1k to 1M points
+drive nearest_by_sector / analyze_sectors; the cue generators, pan_stereo,
+darken, mix_and_limit and every spatial_layers_from_pointcloud mode are
+rendered headless (play=False); the Flask endpoints are exercised through
+the test client. Each case reports the median time per call.
+
+    python3 bench_hot_paths.py                          # run everything, print table
+    python3 bench_hot_paths.py --save baselines/dev.json
+    python3 bench_hot_paths.py --baseline baselines/dev.json --threshold 0.25
+    python3 bench_hot_paths.py --quick --filter geometry/
+
+With --baseline, cases that got slower than baseline * (1 + threshold) are
+flagged and the exit status is 1, so the suite can gate CI.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+_backend_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+for _sub in ('spatial_audio', 'utils', 'api'):
+    _path = os.path.join(_backend_dir, _sub)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import closest_obstacle_audio as coa
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+QUICK_SIZES = (1_000, 10_000, 100_000)
+FS = 48000
+
+
+# ---------- synthetic clouds ----------
+def uniform_cloud(n, rng):
+    """Points uniformly distributed in a 10 x 10 x 3 m box around the user."""
+    return rng.uniform((-5, -5, -1.5), (5, 5, 1.5), size=(n, 3)).astype(np.float32)
+
+
+def clustered_cloud(n, rng, clusters=12):
+    """Points in a few compact blobs (furniture, people, poles)."""
+    centers = rng.uniform((-4, -4, -1), (4, 4, 1.5), size=(clusters, 3))
+    labels = rng.integers(0, clusters, size=n)
+    return (centers[labels] + rng.normal(0, 0.15, size=(n, 3))).astype(np.float32)
+
+
+def floor_cloud(n, rng, floor_z=-1.2, floor_fraction=0.8):
+    """Mostly floor (a noisy plane below the user) with some obstacles on top."""
+    n_floor = int(n * floor_fraction)
+    floor = np.column_stack([rng.uniform(-5, 5, n_floor), rng.uniform(-5, 5, n_floor),
+                             floor_z + rng.normal(0, 0.02, n_floor)])
+    return np.concatenate([floor, clustered_cloud(n - n_floor, rng)]).astype(np.float32)
+
+
+GENERATORS = {"uniform": uniform_cloud, "clustered": clustered_cloud, "floor": floor_cloud}
+
+
+# ---------- timing ----------
+def measure(fn, min_time=0.2, max_runs=200, warmup=1):
+    """Median seconds per call over as many runs as fit in min_time (at least 3)."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < 3 or (time.perf_counter() - start < min_time and len(times) < max_runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)), len(times)
+
+
+# ---------- cases ----------
+def geometry_cases(sizes, rng):
+    cases = {}
+    for gen_name, gen in GENERATORS.items():
+        for n in sizes:
+            cloud = gen(n, rng)
+            cases[f"geometry/nearest_by_sector/{gen_name}/{n}"] = lambda c=cloud: coa.nearest_by_sector(c)
+            cases[f"geometry/analyze_sectors/{gen_name}/{n}"] = lambda c=cloud: coa.analyze_sectors(c)
+    picked = coa.nearest_by_sector(uniform_cloud(10_000, rng))
+    cases["geometry/choose_targets"] = lambda: coa.choose_targets(picked)
+    return cases
+
+
+def synthesis_cases(rng):
+    dur = 0.5
+    mono = coa.tone_left(600, dur, FS)
+    stems = [coa.pan_stereo(mono, az, 0.0, FS) for az in (-1.0, -0.3, 0.4, 2.5)]
+    return {
+        "synthesis/make_beep": lambda: coa.make_beep(800, dur, FS),
+        "synthesis/tone_left": lambda: coa.tone_left(600, dur, FS),
+        "synthesis/tone_right": lambda: coa.tone_right(600, dur, FS),
+        "synthesis/tone_up": lambda: coa.tone_up(600, dur, FS),
+        "synthesis/tone_down": lambda: coa.tone_down(400, dur, FS),
+        "synthesis/sustained_tone": lambda: coa.sustained_tone(600, dur, FS, tremolo_rate=4.0),
+        "synthesis/tremolo": lambda: coa.tremolo(mono, FS, 4.0),
+        "synthesis/pan_stereo": lambda: coa.pan_stereo(mono, 0.6, 0.0, FS),
+        "synthesis/darken": lambda: coa.darken(mono, FS, cutoff=900),
+        "synthesis/mix_and_limit": lambda: coa.mix_and_limit(stems),
+    }
+
+
+def render_cases(rng):
+    # One obstacle per level sector plus UP / DOWN so every mode renders its full path
+    cloud = np.array([[2.0, 1.5, 0.0], [2.5, -1.2, 0.0], [-1.8, 1.0, 0.0],
+                      [-2.2, -0.8, 0.0], [1.0, 0.0, 2.5], [2.0, 0.0, -1.5]], dtype=np.float32)
+    cases = {}
+    for mode in ("sequential", "priority", "unified", "all"):
+        cases[f"render/{mode}"] = (
+            lambda m=mode: coa.spatial_layers_from_pointcloud(cloud, fs=FS, dur=2.0, mode=m, play=False))
+    return cases
+
+
+def api_cases(rng):
+    # Fixed full quality (also when the environment sets a budget): the app's
+    # controllers would otherwise step quality down whenever a slow case runs
+    # over its endpoint's budget
+    for var in ("SENSENAV_FRAME_BUDGET_MS", "SENSENAV_BOUNDARY_BUDGET_MS"):
+        os.environ[var] = "0"
+    try:
+        import app as api
+    except ImportError as e:
+        print(f"Skipping API benchmarks: {e}", file=sys.stderr)
+        return {}
+    api.get_quality_controller.cache_clear()
+    client = api.app.test_client()
+    points = uniform_cloud(1_000, rng).tolist()
+
+    def boundary(x):
+        return {"bbox": {"x": x, "y": 50, "width": 80, "height": 60},
+                "depth": 1.5, "image_width": 320, "image_height": 240}
+
+    def post(path, body):
+        def run():
+            response = client.post(path, json=body() if callable(body) else body)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        return run
+
+    # A new box every call, so the per-box result cache never hits
+    boxes = itertools.count()
+    cases = {f"api/analyze/{fmt}/1000": post(f"/api/spatial-audio/analyze?format={fmt}", {"points": points})
+             for fmt in api.RESPONSE_FORMATS}
+    cases["api/analyze-boundary"] = post("/api/spatial-audio/analyze-boundary",
+                                         lambda: boundary(100 + next(boxes) % 64))
+    cases["api/analyze-boundary/cached"] = post("/api/spatial-audio/analyze-boundary", boundary(100))
+    cases["api/sectors"] = lambda: client.get("/api/spatial-audio/sectors")
+    return cases
+
+
+def build_cases(sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    cases = {}
+    cases.update(geometry_cases(sizes, rng))
+    cases.update(synthesis_cases(rng))
+    cases.update(render_cases(rng))
+    cases.update(api_cases(rng))
+    return cases
+
+
+# ---------- baselines ----------
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """[(name, old_s, new_s, ratio)] for cases slower than baseline * (1 + threshold)."""
+    regressions = []
+    for name, row in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = row["median_s"] / old["median_s"] if old["median_s"] > 0 else float("inf")
+        if ratio > 1.0 + threshold:
+            regressions.append((name, old["median_s"], row["median_s"], ratio))
+    return regressions
+
+
+def format_time(s):
+    if s < 1e-3:
+        return f"{s * 1e6:8.1f} us"
+    if s < 1.0:
+        return f"{s * 1e3:8.2f} ms"
+    return f"{s:8.3f} s "
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SenseNav hot paths')
+    parser.add_argument('--quick', action='store_true', help='Skip the 1M-point clouds')
+    parser.add_argument('--filter', type=str, default=None, help='Only run cases whose name contains this')
+    parser.add_argument('--min_time', type=float, default=0.2, help='Seconds spent timing each case')
+    parser.add_argument('--save', type=str, default=None, metavar='PATH', help='Write results as a JSON baseline')
+    parser.add_argument('--baseline', type=str, default=None, metavar='PATH', help='Compare against a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown that counts as a regression (default: 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    cases = build_cases(QUICK_SIZES if args.quick else SIZES)
+    # Keep cue descriptions and per-request logs out of the timings (after
+    # build_cases: importing app sets the level from SENSENAV_LOG_LEVEL)
+    logging.getLogger("sensenav").setLevel(logging.WARNING)
+    if args.filter:
+        cases = {name: fn for name, fn in cases.items() if args.filter in name}
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for name, fn in cases.items():
+        median, runs = measure(fn, min_time=args.min_time)
+        results[name] = {"median_s": median, "runs": runs}
+        old = baseline.get(name)
+        delta = f"{100 * (median / old['median_s'] - 1):+6.1f}%" if old else ""
+        print(f"{name:48s} {format_time(median)}  ({runs:3d} runs) {delta}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} results to {args.save}")
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {100 * args.threshold:.0f}%:")
+            for name, old, new, ratio in regressions:
+                print(f"  {name:46s} {format_time(old)} -> {format_time(new)}  x{ratio:.2f}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {100 * args.threshold:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
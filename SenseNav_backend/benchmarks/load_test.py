@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Load generator for the SenseNav API.
+
+Drives /api/spatial-audio/analyze, /analyze-boundary and /suno/generate-audio
+(point the backend at suno_stub.py) and reports throughput, latency
+percentiles and error rates per endpoint, plus the server's CPU and RSS over
+time (sampled from /proc, Linux only).
+
+Modes:
+  closed   N workers, each sending its next request when the previous one
+           returned (--concurrency; measures capacity)
+  open     requests arrive at --rate per second (Poisson) regardless of how
+           fast the server answers; latency is measured from the scheduled
+           send time, so queueing at saturation is not hidden
+  replay   open loop on a recorded mix: a JSONL file of requests with "t"
+           offsets (see --save_mix) or a utils/recording.py session directory
+
+    # spawn the stub and the dev server, sweep closed-loop concurrency
+    python3 load_test.py --spawn --suno_stub --mode closed --sweep 1,2,4,8,16
+    # an existing server (e.g. gunicorn) with its master PID for CPU / RSS
+    python3 load_test.py --url http://127.0.0.1:8000 --server_pid 1234 --mode open --sweep 20,50,100,200
+    # recorded traffic at twice the original speed
+    python3 load_test.py --spawn --mode replay --replay sessions/20250914-101500 --speed 2
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+_backend_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+_api_dir = os.path.join(_backend_dir, 'api')
+_utils_dir = os.path.join(_backend_dir, 'utils')
+
+ENDPOINTS = {
+    "analyze": "/api/spatial-audio/analyze",
+    "boundary": "/api/spatial-audio/analyze-boundary",
+    "suno": "/api/suno/generate-audio",
+}
+DEFAULT_MIX = "analyze=0.8,boundary=0.15,suno=0.05"
+
+
+# ---------- request mixes ----------
+def make_request(kind, rng, n_points=1000):
+    """One synthetic request of the given kind: {"kind", "path", "body"}."""
+    if kind == "analyze":
+        pts = rng.uniform((-5, -5, -1.5), (5, 5, 1.5), size=(n_points, 3)).round(3)
+        body = {"points": pts.tolist()}
+    elif kind == "boundary":
+        w, h = int(rng.integers(20, 160)), int(rng.integers(20, 120))
+        body = {"bbox": {"x": int(rng.integers(0, 320 - w)), "y": int(rng.integers(0, 240 - h)),
+                         "width": w, "height": h},
+                "depth": float(rng.uniform(0.3, 4.0)), "image_width": 320, "image_height": 240}
+    elif kind == "suno":
+        body = {"direction": str(rng.choice(["Left", "Right", "Center"])),
+                "distance": str(rng.choice(["Very Close", "Close", "Medium", "Far"])),
+                "horizontal": "Center", "vertical": "Center", "duration": 10}
+    else:
+        raise ValueError(f"Unknown request kind '{kind}', expected one of {list(ENDPOINTS)}")
+    return {"kind": kind, "path": ENDPOINTS[kind], "body": body}
+
+
+def parse_weights(spec):
+    weights = {}
+    for part in spec.split(","):
+        kind, _, w = part.partition("=")
+        weights[kind.strip()] = float(w or 1.0)
+    return weights
+
+
+def synthetic_mix(weights, count, n_points=1000, seed=0):
+    """`count` requests drawn according to `weights` (kind -> relative weight)."""
+    rng = np.random.default_rng(seed)
+    kinds = list(weights)
+    p = np.array([weights[k] for k in kinds], dtype=np.float64)
+    picks = rng.choice(len(kinds), size=count, p=p / p.sum())
+    return [make_request(kinds[i], rng, n_points) for i in picks]
+
+
+def load_mix(path):
+    """
+    Recorded mix: a JSONL file of {"t", "kind", "path", "body"} (t = offset in
+    seconds) or a recording directory, replayed as /analyze requests at the
+    recorded frame times.
+    """
+    if os.path.isdir(path):
+        if _utils_dir not in sys.path:
+            sys.path.insert(0, _utils_dir)
+        from recording import Recording
+        rec = Recording(path)
+        t0 = float(rec.t[0]) if len(rec) else 0.0
+        return [{"t": float(rec.t[i]) - t0, "kind": "analyze", "path": ENDPOINTS["analyze"],
+                 "body": {"points": np.asarray(rec.points(i)).round(3).tolist()}}
+                for i in range(len(rec)) if rec.n_points[i] > 0]
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_mix(mix, path, rate=None):
+    """Write a mix as JSONL (with "t" offsets at `rate` requests / s when given)."""
+    with open(path, "w") as f:
+        for i, req in enumerate(mix):
+            row = dict(req)
+            if rate and "t" not in row:
+                row["t"] = i / rate
+            f.write(json.dumps(row) + "\n")
+
+
+# ---------- clients ----------
+class Client:
+    """One requests.Session per thread (connection reuse without sharing)."""
+
+    def __init__(self, base_url, timeout=60.0):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def send(self, req):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        try:
+            response = session.post(self.base_url + req["path"], json=req["body"], timeout=self.timeout)
+            return response.status_code, None
+        except Exception as e:
+            return 0, type(e).__name__
+
+
+def run_closed(client, mix, concurrency, duration, think=0.0):
+    """Closed loop: `concurrency` workers cycling through the mix for `duration` s."""
+    results = []
+    lock = threading.Lock()
+    t_start = time.perf_counter()
+    deadline = t_start + duration
+    counter = iter(range(1 << 62))
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            with lock:
+                req = mix[next(counter) % len(mix)]
+            t0 = time.perf_counter()
+            status, error = client.send(req)
+            local.append((req["kind"], t0 - t_start, time.perf_counter() - t0, status, error))
+            if think:
+                time.sleep(think)
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_open(client, mix, rate=None, duration=None, schedule=None, max_workers=256, seed=0):
+    """
+    Open loop: send mix[i] at schedule[i] seconds (or at Poisson arrivals of
+    `rate` per second for `duration` seconds). Latency includes the time a
+    request waited for a free worker after its scheduled send time.
+    """
+    if schedule is None:
+        rng = np.random.default_rng(seed)
+        gaps = rng.exponential(1.0 / rate, size=int(rate * duration * 1.5) + 16)
+        schedule = np.cumsum(gaps)
+        schedule = schedule[schedule < duration]
+    results = []
+    lock = threading.Lock()
+    t_start = time.perf_counter()
+
+    def fire(req, t_sched):
+        status, error = client.send(req)
+        latency = time.perf_counter() - (t_start + t_sched)
+        with lock:
+            results.append((req["kind"], t_sched, latency, status, error))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i, t_sched in enumerate(schedule):
+            delay = t_start + t_sched - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, mix[i % len(mix)], float(t_sched))
+    return results
+
+
+# ---------- server monitoring ----------
+def _descendants(pid):
+    """pid and all its descendants (gunicorn / multiprocess servers)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    out, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        out.append(p)
+        stack.extend(children.get(p, []))
+    return out
+
+
+def _cpu_ticks_and_rss(pids):
+    ticks, rss_kb = 0, 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])      # utime + stime
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss_kb += int(line.split()[1])
+                        break
+        except (OSError, IndexError, ValueError):
+            continue
+    return ticks, rss_kb
+
+
+class ServerMonitor(threading.Thread):
+    """Samples CPU (% of one core) and RSS (MB) of a server process tree every `interval` s."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(name="server-monitor", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []                 # (t, cpu_percent, rss_mb)
+        self._stop_event = threading.Event()
+        self._hz = os.sysconf("SC_CLK_TCK")
+
+    def run(self):
+        t_start = time.perf_counter()
+        prev_t, (prev_ticks, _) = t_start, _cpu_ticks_and_rss(_descendants(self.pid))
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            ticks, rss_kb = _cpu_ticks_and_rss(_descendants(self.pid))
+            cpu = 100.0 * (ticks - prev_ticks) / self._hz / (now - prev_t)
+            self.samples.append((now - t_start, cpu, rss_kb / 1024.0))
+            prev_t, prev_ticks = now, ticks
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def stop_process(proc, timeout=10.0):
+    """
+    SIGTERM the process group of a process started with start_new_session=True
+    (the shell and the server it runs, gunicorn workers, ...), SIGKILL after
+    `timeout` seconds.
+    """
+    if proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        proc.wait()
+
+
+def spawn_server(cmd, port, env=None, cwd=_api_dir, timeout=30.0):
+    """
+    Start a server (shell command, in its own process group so stop_process
+    reaches the server and not just the shell) and wait until /api/health answers.
+    """
+    import requests
+    proc = subprocess.Popen(cmd, shell=True, cwd=cwd, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with status {proc.returncode}: {cmd}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_process(proc)
+    raise RuntimeError(f"Server did not become healthy within {timeout:.0f}s: {cmd}")
+
+
+def spawn_stub(port, latency, timeout=15.0):
+    import requests
+    stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'suno_stub.py')
+    proc = subprocess.Popen([sys.executable, stub, "--port", str(port), "--latency", str(latency)],
+                            start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/clips", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    stop_process(proc)
+    raise RuntimeError("Suno stub did not start")
+
+
+# ---------- reporting ----------
+def summarize(results, elapsed):
+    """
+    Per-kind (and "all") count, throughput, error rate and latency percentiles
+    (ms). "all" is always there; with no results its rates and latencies are None.
+    """
+    out = {}
+    kinds = sorted({r[0] for r in results})
+    for kind in kinds + ["all"]:
+        rows = [r for r in results if kind == "all" or r[0] == kind]
+        if not rows:
+            out[kind] = {"count": 0, "rps": 0.0, "error_rate": None,
+                         "p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+            continue
+        lat = np.array([r[2] for r in rows]) * 1000.0
+        errors = sum(1 for r in rows if r[4] is not None or not 200 <= r[3] < 300)
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        out[kind] = {
+            "count": len(rows),
+            "rps": len(rows) / elapsed if elapsed > 0 else 0.0,
+            "error_rate": errors / len(rows),
+            "p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99),
+            "max_ms": float(lat.max()),
+        }
+    return out
+
+
+def timeline(results, samples, bucket=1.0):
+    """Per-bucket throughput, p95 latency, errors and mean server CPU / RSS."""
+    if not results:
+        return []
+    t_end = max(r[1] for r in results)
+    rows = []
+    for b in range(int(t_end // bucket) + 1):
+        lo, hi = b * bucket, (b + 1) * bucket
+        sel = [r for r in results if lo <= r[1] < hi]
+        srv = [s for s in samples if lo <= s[0] < hi]
+        lat = np.array([r[2] for r in sel]) * 1000.0
+        rows.append({
+            "t": lo,
+            "rps": len(sel) / bucket,
+            "p95_ms": float(np.percentile(lat, 95)) if len(lat) else 0.0,
+            "errors": sum(1 for r in sel if r[4] is not None or not 200 <= r[3] < 300),
+            "cpu_percent": float(np.mean([s[1] for s in srv])) if srv else None,
+            "rss_mb": float(np.mean([s[2] for s in srv])) if srv else None,
+        })
+    return rows
+
+
+def _fmt(value, width, scale=1.0):
+    return f"{'-':>{width}s}" if value is None else f"{scale * value:{width}.1f}"
+
+
+def print_summary(summary):
+    print(f"{'endpoint':10s} {'count':>7s} {'req/s':>8s} {'err%':>6s} {'p50 ms':>8s} {'p90 ms':>8s} "
+          f"{'p99 ms':>8s} {'max ms':>8s}")
+    for kind, s in summary.items():
+        print(f"{kind:10s} {s['count']:7d} {s['rps']:8.1f} {_fmt(s['error_rate'], 6, 100)} {_fmt(s['p50_ms'], 8)} "
+              f"{_fmt(s['p90_ms'], 8)} {_fmt(s['p99_ms'], 8)} {_fmt(s['max_ms'], 8)}")
+
+
+def print_timeline(rows):
+    print(f"{'t s':>5s} {'req/s':>7s} {'p95 ms':>8s} {'errors':>6s} {'cpu %':>6s} {'rss MB':>7s}")
+    for r in rows:
+        cpu = f"{r['cpu_percent']:6.0f}" if r["cpu_percent"] is not None else f"{'-':>6s}"
+        rss = f"{r['rss_mb']:7.1f}" if r["rss_mb"] is not None else f"{'-':>7s}"
+        print(f"{r['t']:5.0f} {r['rps']:7.1f} {r['p95_ms']:8.1f} {r['errors']:6d} {cpu} {rss}")
+
+
+def saturation_point(steps, gain=0.05, latency_factor=3.0):
+    """
+    First sweep level where adding load no longer buys throughput (less than
+    `gain` relative improvement) or p99 exceeds latency_factor x the first
+    level's. Returns the level before it (the last efficient one) or None.
+    A level where no request completed counts as saturated.
+    """
+    def total(step):
+        return step.get("all") or {"count": 0, "rps": 0.0, "p99_ms": None}
+
+    base = next((total(s)["p99_ms"] for s in steps if total(s)["count"]), None)
+    for prev, cur in zip(steps, steps[1:]):
+        p, c = total(prev), total(cur)
+        if not c["count"] or c["rps"] < p["rps"] * (1.0 + gain) or \
+                (base is not None and c["p99_ms"] > latency_factor * base):
+            return prev["level"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the SenseNav API')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='Server base URL')
+    parser.add_argument('--mode', choices=('closed', 'open', 'replay'), default='closed')
+    parser.add_argument('--concurrency', type=int, default=4, help='Closed-loop workers')
+    parser.add_argument('--rate', type=float, default=20.0, help='Open-loop arrivals per second')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run (closed / open)')
+    parser.add_argument('--sweep', type=str, default=None,
+                        help='Comma-separated concurrencies (closed) or rates (open) to run in turn')
+    parser.add_argument('--mix', type=str, default=DEFAULT_MIX, help='Request weights, e.g. analyze=0.8,boundary=0.2')
+    parser.add_argument('--points', type=int, default=1000, help='Points per synthetic /analyze request')
+    parser.add_argument('--mix_size', type=int, default=200, help='Distinct synthetic requests to cycle through')
+    parser.add_argument('--replay', type=str, default=None, help='JSONL mix or recording directory (--mode replay)')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed factor')
+    parser.add_argument('--save_mix', type=str, default=None, help='Write the synthetic mix as JSONL (t at --rate)')
+    parser.add_argument('--think', type=float, default=0.0, help='Closed-loop pause between requests (s)')
+    parser.add_argument('--server_pid', type=int, default=None, help='PID of the server to sample CPU / RSS from')
+    parser.add_argument('--spawn', action='store_true', help='Start the server for the test')
+    parser.add_argument('--server_cmd', type=str, default=None,
+                        help='Command for --spawn, run in api/ (default: Flask dev server, threaded)')
+    parser.add_argument('--suno_stub', action='store_true', help='Start suno_stub.py and point the spawned server at it')
+    parser.add_argument('--stub_port', type=int, default=5055)
+    parser.add_argument('--stub_latency', type=float, default=0.2, help='Stub /generate latency (s)')
+    parser.add_argument('--json', type=str, default=None, help='Write summaries and timelines to this file')
+    args = parser.parse_args()
+
+    port = int(args.url.rsplit(":", 1)[1].split("/")[0]) if args.url.count(":") == 2 else 80
+    procs = []
+    try:
+        env = dict(os.environ)
+        if args.suno_stub:
+            procs.append(spawn_stub(args.stub_port, args.stub_latency))
+            env["SUNO_API_BASE"] = f"http://127.0.0.1:{args.stub_port}"
+            env.setdefault("SUNO_API_KEY", "stub")
+        server_pid = args.server_pid
+        if args.spawn:
+            cmd = args.server_cmd or (f"{sys.executable} -c \"import app; "
+                                      f"app.app.run(host='127.0.0.1', port={port}, threaded=True)\"")
+            server = spawn_server(cmd, port, env=env)
+            procs.append(server)
+            server_pid = server.pid
+
+        if args.mode == "replay":
+            if not args.replay:
+                parser.error("--mode replay needs --replay PATH")
+            mix = load_mix(args.replay)
+            schedule = np.array([req.get("t", i / args.rate) for i, req in enumerate(mix)]) / args.speed
+            levels = [None]
+        else:
+            mix = synthetic_mix(parse_weights(args.mix), args.mix_size, args.points)
+            if args.save_mix:
+                save_mix(mix, args.save_mix, rate=args.rate)
+            default = args.concurrency if args.mode == "closed" else args.rate
+            levels = [float(v) for v in args.sweep.split(",")] if args.sweep else [default]
+
+        client = Client(args.url)
+        report = []
+        for level in levels:
+            monitor = ServerMonitor(server_pid) if server_pid and os.path.exists("/proc") else None
+            if monitor is not None:
+                monitor.start()
+            t0 = time.perf_counter()
+            if args.mode == "closed":
+                results = run_closed(client, mix, int(level), args.duration, args.think)
+            elif args.mode == "open":
+                results = run_open(client, mix, rate=level, duration=args.duration)
+            else:
+                results = run_open(client, mix, schedule=schedule)
+            elapsed = time.perf_counter() - t0
+            samples = []
+            if monitor is not None:
+                monitor.stop()
+                samples = monitor.samples
+
+            summary = summarize(results, elapsed)
+            rows = timeline(results, samples)
+            if args.mode == "closed":
+                label = f"concurrency {level:g}"
+            elif args.mode == "open":
+                label = f"rate {level:g}/s"
+            else:
+                label = f"replay x{args.speed:g}"
+            print(f"\n=== {label}: {len(results)} requests in {elapsed:.1f}s ===")
+            print_summary(summary)
+            print_timeline(rows)
+            step = {"level": level, "mode": args.mode, **summary, "timeline": rows}
+            if samples:
+                step["cpu_percent"] = float(np.mean([s[1] for s in samples]))
+                step["rss_mb_max"] = float(max(s[2] for s in samples))
+            report.append(step)
+
+        if len(report) > 1:
+            print(f"\n{'level':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p99 ms':>8s} {'err%':>6s} {'cpu %':>6s} {'rss MB':>7s}")
+            for s in report:
+                print(f"{s['level']:7g} {s['all']['rps']:8.1f} {_fmt(s['all']['p50_ms'], 8)} {_fmt(s['all']['p99_ms'], 8)} "
+                      f"{_fmt(s['all']['error_rate'], 6, 100)} {s.get('cpu_percent', 0.0):6.0f} {s.get('rss_mb_max', 0.0):7.1f}")
+            knee = saturation_point(report)
+            print(f"Saturation: {'beyond the tested range' if knee is None else f'around level {knee:g}'}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    finally:
+        for proc in reversed(procs):
+            stop_process(proc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Suno generate / clips API, for load tests that should
+exercise /api/suno/generate-audio without calling (or paying for) Suno.
+
+    python3 suno_stub.py --port 5055 --latency 0.2
+    SUNO_API_BASE=http://127.0.0.1:5055 SUNO_API_KEY=stub python3 ../api/app.py
+
+POST /generate answers with a clip id after --latency seconds; GET /clips
+reports the clip "complete" once --ready_after seconds have passed since it
+was created (0 = on the first poll). --error_rate makes a fraction of
+generate calls fail with 503, which the backend answers with its fallback.
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+
+def create_app(latency=0.0, ready_after=0.0, error_rate=0.0):
+    app = Flask(__name__)
+    clips = {}
+    lock = threading.Lock()
+
+    @app.route('/generate', methods=['POST'])
+    def generate():
+        time.sleep(latency)
+        if random.random() < error_rate:
+            return jsonify({"error": "Service unavailable (stub)"}), 503
+        clip_id = uuid.uuid4().hex
+        with lock:
+            clips[clip_id] = time.time()
+        return jsonify({"id": clip_id, "status": "submitted"})
+
+    @app.route('/clips', methods=['GET'])
+    def get_clips():
+        out = []
+        for clip_id in request.args.get('ids', '').split(','):
+            with lock:
+                created = clips.get(clip_id)
+            if created is None:
+                continue
+            ready = time.time() - created >= ready_after
+            out.append({
+                "id": clip_id,
+                "status": "complete" if ready else "submitted",
+                "audio_url": f"http://{request.host}/audio/{clip_id}.mp3" if ready else None,
+            })
+        return jsonify(out)
+
+    @app.route('/audio/<name>', methods=['GET'])
+    def audio(name):
+        return b"\0" * 1024, 200, {"Content-Type": "audio/mpeg"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Suno API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before /generate answers')
+    parser.add_argument('--ready_after', type=float, default=0.0, help='Seconds until a clip is complete')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of /generate calls that return 503')
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.ready_after, args.error_rate)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,201 +1,602 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import argparse
+import json
+import os
+import sys
 import time
 import cv2
 import numpy as np
-import torch
-from opencv import load_midas, colorize_depth, make_intrinsics, backproject
+from opencv import colorize_depth, make_intrinsics
+from pipeline import Pipeline
+from sources import open_source
+from scheduler import MotionScheduler
+from midas_backends import BACKENDS, make_backend
+
+# Sector engine lives in ../spatial_audio
+_spatial_audio_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spatial_audio'))
+if _spatial_audio_dir not in sys.path:
+    sys.path.insert(0, _spatial_audio_dir)
+
+_utils_dir = os.path.normpath(os.path.join(os.path.dirname(_spatial_audio_dir), 'utils'))
+
+from closest_obstacle_audio import nearest_by_sector, choose_targets
+from ray_grid import backproject_depth, inverse_to_metric
+
+class ClosestBandFinder:
+    """
+    Finds the connected regions in the *closest* band of a depth-like map.
+    Works whether values are inverse-depth (MiDaS) or metric depth.
+
+    The top-percent threshold is found in linear time: np.partition on a
+    decimated copy gives a conservative lower bound, then the exact k-th
+    largest value is selected among the full-resolution pixels above it.
+    Mask / label buffers are allocated once per frame shape and reused, so
+    calling find() every displayed frame does not churn the allocator.
+    """
+
+    def __init__(self, min_area=50, debug=False,
+                 inverse_depth=True,  # True for MiDaS: larger = closer
+                 top_percent=1.0,     # take closest X% of pixels
+                 morph_kernel=3,
+                 top_k=1,             # number of components to return
+                 decimate=4):         # stride of the coarse threshold pass
+        self.min_area = min_area
+        self.debug = debug
+        self.inverse_depth = inverse_depth
+        self.top_percent = top_percent
+        self.top_k = top_k
+        self.decimate = max(1, int(decimate))
+        self.kernel = None
+        if morph_kernel and morph_kernel > 1:
+            self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph_kernel, morph_kernel))
+        self._shape = None
+
+    def _ensure_buffers(self, shape):
+        if self._shape == shape:
+            return
+        self._shape = shape
+        self._close = np.empty(shape, dtype=np.float32)
+        self._finite = np.empty(shape, dtype=bool)
+        self._band = np.empty(shape, dtype=bool)
+        self._mask = np.empty(shape, dtype=np.uint8)
+        self._tmp = np.empty(shape, dtype=np.uint8)
+        self._labels = np.empty(shape, dtype=np.int32)
+        sub_shape = self._close[::self.decimate, ::self.decimate].shape
+        self._sub = np.empty(sub_shape[0] * sub_shape[1], dtype=np.float32)
+        self._sub2d = self._sub.reshape(sub_shape)
+
+    def closeness(self, depth_map):
+        """
+        "Closeness" scalar in a reused buffer: higher = closer, non-finite = -inf.
+        Returns (closeness, finite_count, dmin, dmax).
+        MiDaS (inverse depth): closer -> larger values -> use d directly
+        Metric depth: closer -> smaller values -> use -d
+        """
+        self._ensure_buffers(depth_map.shape)
+        close = self._close
+        if self.inverse_depth:
+            np.copyto(close, depth_map, casting="unsafe")
+        else:
+            np.negative(depth_map, out=close, casting="unsafe")
+
+        np.isfinite(close, out=self._finite)
+        n_finite = int(np.count_nonzero(self._finite))
+        if n_finite == 0:
+            return close, 0, np.nan, np.nan
+        if n_finite < close.size:
+            np.copyto(close, -np.inf, where=np.logical_not(self._finite, out=self._band))
+            vals = close[self._finite]
+            return close, n_finite, float(vals.min()), float(vals.max())
+        return close, n_finite, float(close.min()), float(close.max())
+
+    def threshold(self, close, n_finite):
+        """Exact value of the k-th closest pixel, k = ceil(n_finite * top_percent / 100)."""
+        k = max(1, int(np.ceil(n_finite * self.top_percent / 100.0)))
+
+        # Coarse pass on the decimated map; keep a 2x margin so the bound is
+        # below the true threshold in all but pathological maps
+        sub = self._sub
+        np.copyto(self._sub2d, close[::self.decimate, ::self.decimate])
+        k_sub = min(sub.size, 2 * max(1, int(np.ceil(sub.size * self.top_percent / 100.0))) + 1)
+        sub.partition(sub.size - k_sub)
+        lower = sub[sub.size - k_sub]
+
+        # Refine at full resolution among candidates above the bound
+        np.greater_equal(close, lower, out=self._band)
+        n_cand = int(np.count_nonzero(self._band))
+        if n_cand < k or not np.isfinite(lower):
+            cand = close[self._finite]  # bound too tight: exact selection on everything
+        else:
+            cand = close[self._band]
+        return float(np.partition(cand, cand.size - k)[cand.size - k])
+
+    def find(self, depth_map):
+        """
+        Returns a list of up to top_k components, largest first:
+        (cx, cy, depth_val, area, bbox) with bbox = (x, y, w, h).
+        """
+        close, n_finite, dmin, dmax = self.closeness(depth_map)
+        if n_finite == 0 or dmax - dmin < 1e-6:
+            return []
+
+        # Threshold: keep top X% as "closest band"
+        thr = self.threshold(close, n_finite)
+        np.greater_equal(close, thr, out=self._band)
+        mask = self._band.view(np.uint8)  # 0/1, no copy
+
+        # Morphological cleanup
+        if self.kernel is not None:
+            cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=self._tmp, iterations=1)
+            cv2.morphologyEx(self._tmp, cv2.MORPH_CLOSE, self.kernel, dst=self._mask, iterations=1)
+            mask = self._mask
+
+        # Connected components (more stable than contours for noisy masks)
+        num, _, stats, centroids = cv2.connectedComponentsWithStats(
+            mask, labels=self._labels, connectivity=8)
+        if num <= 1:
+            return []
+
+        # Skip label 0 (background); largest components first
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        order = np.argsort(-areas, kind="stable")[:self.top_k]
+
+        results = []
+        for rel in order:
+            area = int(areas[rel])
+            if area < self.min_area:
+                break
+            idx = rel + 1
+            cx, cy = centroids[idx]
+            cx_i, cy_i = int(round(cx)), int(round(cy))
+
+            # Bounding box (x, y, w, h)
+            x, y, w, h = stats[idx, cv2.CC_STAT_LEFT], stats[idx, cv2.CC_STAT_TOP], \
+                         stats[idx, cv2.CC_STAT_WIDTH], stats[idx, cv2.CC_STAT_HEIGHT]
+
+            # Depth value at centroid (fall back to median inside bbox if NaN)
+            depth_val = depth_map[cy_i, cx_i]
+            if not np.isfinite(depth_val):
+                roi = depth_map[y:y+h, x:x+w]
+                depth_val = np.nanmedian(roi[np.isfinite(roi)]) if np.isfinite(roi).any() else float("nan")
+
+            if self.debug:
+                print(f"[blue] area={area}, centroid=({cx_i},{cy_i}), depth={depth_val:.4f}, "
+                      f"thr={thr:.4f}, inverse_depth={self.inverse_depth}")
+
+            results.append((cx_i, cy_i, float(depth_val), area, (int(x), int(y), int(w), int(h))))
+        return results
 
 def find_most_intense_blue_centroid(depth_map, min_area=50, debug=False,
                                     inverse_depth=True,  # True for MiDaS: larger = closer
                                     top_percent=1.0,     # take closest X% of pixels
-                                    morph_kernel=3):
+                                    morph_kernel=3,
+                                    finder=None):
     """
     Find centroid of the *closest* region in a depth-like map.
     Works whether values are inverse-depth (MiDaS) or metric depth.
+    Pass a ClosestBandFinder as `finder` to reuse its buffers across frames
+    (the other keyword arguments are then taken from the finder).
 
     Returns: (cx, cy, depth_val, area, bbox) or None
     """
-    d = depth_map.astype(np.float32)
-    if not np.isfinite(d).any():
-        return None
-
-    # Normalize ignoring NaN/inf
-    finite = np.isfinite(d)
-    if not finite.any():
-        return None
-    dmin, dmax = np.nanmin(d), np.nanmax(d)
-    if dmax - dmin < 1e-6:
-        return None
-
-    # "Closeness" scalar: higher = closer
-    # MiDaS (inverse depth): closer → larger values → use d directly
-    # Metric depth: closer → smaller values → use -d
-    closeness = d if inverse_depth else (-d)
-
-    # Threshold by percentile: keep top X% as "closest band"
-    thr = np.nanpercentile(closeness[finite], 100.0 - top_percent)
-    mask = (closeness >= thr) & finite
-
-    # Morphological cleanup
-    if morph_kernel and morph_kernel > 1:
-        k = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph_kernel, morph_kernel))
-        mask = cv2.morphologyEx(mask.astype(np.uint8)*255, cv2.MORPH_OPEN, k, iterations=1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, k, iterations=1)
+    if finder is None:
+        finder = ClosestBandFinder(min_area=min_area, debug=debug, inverse_depth=inverse_depth,
+                                   top_percent=top_percent, morph_kernel=morph_kernel)
+    found = finder.find(depth_map)
+    return found[0] if found else None
+
+def sectors_from_depth(depth_map, K, args):
+    """
+    Full-frame per-sector nearest obstacles: MiDaS inverse depth -> metric
+    (scale / value) -> decimated cloud via the cached ray grid -> nearest_by_sector.
+    Returns (sectors, cloud).
+    """
+    metric = inverse_to_metric(depth_map, scale=args.depth_scale)
+    cloud = backproject_depth(metric, K, step=args.cloud_step, max_depth=args.max_range)
+    quality = getattr(args, "quality", None)
+    if quality is not None:
+        # Sector search on at most the quality level's point budget; sinks still get the full cloud
+        from quality import subsample_points
+        return nearest_by_sector(subsample_points(cloud, quality.params["point_budget"])), cloud
+    return nearest_by_sector(cloud), cloud
+
+def draw_sectors(combined, sectors):
+    """List per-sector nearest distances under the centroid info."""
+    for i, (name, (r, az, _)) in enumerate(sorted(sectors.items(), key=lambda kv: kv[1][0])):
+        cv2.putText(combined, f"{name}: {r:.2f}m {np.degrees(az):+.0f}deg", (10, 120 + 25 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+def make_finder(args):
+    return ClosestBandFinder(
+        min_area=args.min_area,
+        debug=args.debug,
+        inverse_depth=True,     # MiDaS: True; set False for metric depth maps
+        top_percent=1.0,        # try 0.5–2.0 depending on noise
+        morph_kernel=3,
+        top_k=args.top_k
+    )
+
+def annotate(frame, depth_map, args, finder):
+    """
+    Closest-band search + side-by-side RGB | colorized depth panel with markers.
+    Returns (combined_image, components); components[0] is the largest (or the list is empty).
+    """
+    components = finder.find(depth_map)
+    centroid_info = components[0] if components else None
+
+    depth_colored = colorize_depth(depth_map)
+    frame_resized = cv2.resize(frame, (args.width, args.height))
+    combined = np.hstack([frame_resized, depth_colored])
+
+    # Secondary components: thin boxes only
+    for (_, _, _, _, (bx, by, bw, bh)) in components[1:]:
+        cv2.rectangle(combined, (bx + args.width, by), (bx + args.width + bw, by + bh), (255, 255, 0), 1)
+
+    if centroid_info:
+        cx, cy, depth, area, (bx, by, bw, bh) = centroid_info
+
+        # IMPORTANT: draw on the depth panel (right half) => add x-offset
+        xoff = args.width
+        cv2.circle(combined, (cx + xoff, cy), 10, (0, 255, 0), -1)
+        cv2.circle(combined, (cx + xoff, cy), 15, (0, 0, 255), 2)
+        cv2.rectangle(combined, (bx + xoff, by), (bx + xoff + bw, by + bh), (0, 255, 255), 2)
+
+        cv2.putText(combined, f"Centroid: ({cx},{cy})", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(combined, f"Depth: {depth:.2f}", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(combined, f"Area: {area}px", (10, 90),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
     else:
-        mask = (mask.astype(np.uint8) * 255)
+        # Fallback: closest pixel (remember the x-offset too)
+        if np.isfinite(depth_map).any():
+            min_idx = np.nanargmax(depth_map) if True else np.nanargmin(depth_map)
+            # ^ use argmax for MiDaS (inverse_depth=True), argmin for metric depth
+            yy, xx = np.unravel_index(min_idx, depth_map.shape)
+            xoff = args.width
+            cv2.circle(combined, (xx + xoff, yy), 8, (255, 0, 255), -1)
+            cv2.circle(combined, (xx + xoff, yy), 12, (255, 255, 0), 2)
+            cv2.putText(combined, f"Closest: ({xx},{yy})", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
 
-    # Connected components (more stable than contours for noisy masks)
-    num, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
-    if num <= 1:
-        return None
+    return combined, components
 
-    # Skip label 0 (background); pick largest by area
-    areas = stats[1:, cv2.CC_STAT_AREA]
-    best_idx_rel = np.argmax(areas)
-    area = int(areas[best_idx_rel])
-    if area < min_area:
-        return None
+def load_depth_fn(args):
+    """
+    Build frame -> depth callable for the selected inference backend. torch /
+    onnxruntime are only imported here, so depth-sequence replay runs without them.
+    """
+    backend = make_backend(args.backend, args.model, threads=args.threads)
+    print(f"Backend: {backend.name} ({args.model}, {backend.input_size}px input)", file=sys.stderr)
 
-    best_idx = best_idx_rel + 1
-    cx, cy = centroids[best_idx]
-    cx_i, cy_i = int(round(cx)), int(round(cy))
+    quality = getattr(args, "quality", None)
+    if quality is not None and backend.name in ("eager", "quantized"):
+        # Eager graphs take any input size; traced / ONNX graphs are fixed to the native one
+        from quality import scaled_input_size
+        native = backend.input_size
 
-    # Bounding box (x, y, w, h)
-    x, y, w, h = stats[best_idx, cv2.CC_STAT_LEFT], stats[best_idx, cv2.CC_STAT_TOP], \
-                 stats[best_idx, cv2.CC_STAT_WIDTH], stats[best_idx, cv2.CC_STAT_HEIGHT]
+        def depth_fn(frame):
+            backend.input_size = scaled_input_size(native, quality.params["input_scale"])
+            return backend.infer(frame, args.width, args.height)
+        return depth_fn
 
-    # Depth value at centroid (fall back to median inside bbox if NaN)
-    depth_val = depth_map[cy_i, cx_i]
-    if not np.isfinite(depth_val):
-        roi = depth_map[y:y+h, x:x+w]
-        depth_val = np.nanmedian(roi[np.isfinite(roi)]) if np.isfinite(roi).any() else float("nan")
+    def depth_fn(frame):
+        return backend.infer(frame, args.width, args.height)
+    return depth_fn
 
-    if debug:
-        print(f"[blue] area={area}, centroid=({cx_i},{cy_i}), depth={depth_val:.4f}, "
-              f"thr={thr:.4f}, inverse_depth={inverse_depth}")
+def passthrough_depth(args):
+    """Depth sources: frames already are depth maps, only bring them to the working size."""
+    def depth_fn(depth):
+        depth = np.asarray(depth, dtype=np.float32)
+        if depth.shape != (args.height, args.width):
+            depth = cv2.resize(depth, (args.width, args.height))
+        return depth
+    return depth_fn
 
-    return cx_i, cy_i, float(depth_val), area, (int(x), int(y), int(w), int(h))
+def analyze(item, K, args, finder, sinks=()):
+    """
+    Post-processing shared by all modes: closest-band components + per-sector
+    obstacles (+ overlay), then every sink(item) (e.g. shared-memory publishing).
+    """
+    depth = item["depth"]
+    if args.headless:
+        item["components"] = finder.find(depth)
+    else:
+        frame = item["frame"] if item["frame"] is not None and item["frame"].ndim == 3 \
+            else np.zeros((args.height, args.width, 3), dtype=np.uint8)
+        item["combined"], item["components"] = annotate(frame, depth, args, finder)
+    item["sectors"], item["cloud"] = sectors_from_depth(depth, K, args)
+    item["n_points"] = len(item["cloud"])
+    if not args.headless:
+        draw_sectors(item["combined"], item["sectors"])
+    for sink in sinks:
+        sink(item)
+    return item
 
-def main():
-    parser = argparse.ArgumentParser(description='Real-time depth estimation with obstacle centroid detection')
-    parser.add_argument('--camera', type=int, default=0, help='Camera index')
-    parser.add_argument('--width', type=int, default=320, help='Camera width')
-    parser.add_argument('--height', type=int, default=240, help='Camera height')
-    parser.add_argument('--model', type=str, default='MiDaS_small', help='MiDaS model type')
-    parser.add_argument('--skip', type=int, default=3, help='Process every Nth frame')
-    parser.add_argument('--min_depth', type=float, default=0.05, help='Minimum depth threshold (meters) - not used in relative mode')
-    parser.add_argument('--max_depth', type=float, default=5.0, help='Maximum depth threshold (meters) - not used in relative mode')
-    parser.add_argument('--min_area', type=int, default=50, help='Minimum obstacle area (pixels)')
-    parser.add_argument('--debug', action='store_true', help='Enable debug output')
-    
-    args = parser.parse_args()
-    
-    # Set device
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Device: {device}")
-    
-    # Load MiDaS model
-    model, transform = load_midas(args.model, device=device)
-    
-    # Initialize camera
-    cap = cv2.VideoCapture(args.camera)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
-    
-    if not cap.isOpened():
-        print("Error: Could not open camera")
-        return
-    
-    # Create intrinsic matrix
-    K = make_intrinsics(args.width, args.height)
-    
+class ResultLog:
+    """
+    Headless output: one JSON object per processed frame (JSON Lines) with
+    the centroid, bbox, depth and area of each component and the per-sector
+    nearest obstacles.
+    """
+
+    def __init__(self, path):
+        self.f = open(path, "w") if path and path != "-" else sys.stdout
+        self.count = 0
+
+    def write(self, item):
+        record = {
+            "frame": item["id"],
+            "t": round(item["t_capture"], 6),
+            "components": [
+                {"centroid": [cx, cy], "depth": depth, "area": area, "bbox": list(bbox)}
+                for (cx, cy, depth, area, bbox) in item["components"]
+            ],
+            "sectors": {name: [float(r), float(az), float(el)]
+                        for name, (r, az, el) in item["sectors"].items()},
+            "n_points": item["n_points"],
+            "inferred": item.get("inferred", True),
+        }
+        self.f.write(json.dumps(record) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+def cloud_publisher(name, args):
+    """
+    Sink publishing each frame's point cloud to a shared-memory ring
+    (utils/shm_ring.py) for the spatial audio process to read without copies.
+    """
+    if _utils_dir not in sys.path:
+        sys.path.insert(0, _utils_dir)
+    from shm_ring import ShmRing
+
+    step = max(1, args.cloud_step)
+    capacity = (-(-args.height // step)) * (-(-args.width // step))
+    ring = ShmRing.create(name, n_slots=args.publish_slots, capacity=capacity, row_shape=(3,))
+    print(f"Publishing point clouds to shared memory '{name}' "
+          f"({args.publish_slots} slots x {capacity} points)", file=sys.stderr)
+
+    def publish(item):
+        ring.publish(item["cloud"], frame_id=item["id"])
+    publish.close = ring.close
+    return publish
+
+def session_recorder(path):
+    """
+    Sink appending each frame's cloud, closest-band boxes and per-sector
+    obstacles to a recording (utils/recording.py) for later replay.
+    """
+    if _utils_dir not in sys.path:
+        sys.path.insert(0, _utils_dir)
+    from recording import Recorder
+
+    recorder = Recorder(path)
+    print(f"Recording session to {path}", file=sys.stderr)
+
+    def record(item):
+        # t_capture is perf_counter(); recordings use wall-clock time
+        t = time.time() - (time.perf_counter() - item["t_capture"])
+        bboxes = [(x, y, w, h, depth) for (_, _, depth, _, (x, y, w, h)) in item["components"]]
+        recorder.write(item["cloud"], t=t, frame_id=item["id"], sectors=item["sectors"],
+                       targets=choose_targets(item["sectors"]), bboxes=bboxes)
+    record.close = recorder.close
+    return record
+
+def account(item, args):
+    """Feed a finished item's capture-to-output latency to the quality controller, if any."""
+    quality = getattr(args, "quality", None)
+    if quality is not None:
+        quality.record_frame(time.perf_counter() - item["t_capture"], item.get("stage_s"))
+
+def emit(item, log):
+    """Send a finished item to the display or the headless log. Returns False to quit."""
+    if log is not None:
+        log.write(item)
+        return True
+    cv2.imshow('RGB | Depth with Centroid', item["combined"])
+    # Check for exit
+    return not (cv2.waitKey(1) & 0xFF == 27)  # ESC key
+
+def run_serial(source, depth_fn, K, args, log=None, sinks=()):
+    """Original single-loop mode: infer every --skip'th frame, reuse the last depth otherwise."""
     frame_count = 0
     last_depth = None
+    finder = make_finder(args)
     start_time = time.time()
-    
-    print("Starting depth estimation with obstacle centroid detection...")
-    print("Press ESC to quit")
-    
+
     while True:
-        ret, frame = cap.read()
+        ret, frame = source.read()
         if not ret:
             break
         
         frame_count += 1
         
         # Process depth every Nth frame
-        if frame_count % args.skip == 0:
-            # Preprocess frame
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            rgb_resized = cv2.resize(rgb, (384, 384))
-            rgb_tensor = transform(rgb_resized).to(device)
-            
-            # Run depth estimation
-            with torch.no_grad():
-                depth = model(rgb_tensor)
-                depth = depth.squeeze().cpu().numpy()
-                depth = cv2.resize(depth, (args.width, args.height))
-            
-            last_depth = depth
+        t_capture = time.perf_counter()
+        if frame_count % args.skip == 0 or source.is_depth:
+            last_depth = depth_fn(frame)
         
         if last_depth is not None:
-            centroid_info = find_most_intense_blue_centroid(
-                last_depth,
-                min_area=args.min_area,
-                debug=args.debug,
-                inverse_depth=True,     # MiDaS: True; set False for metric depth maps
-                top_percent=1.0,        # try 0.5–2.0 depending on noise
-                morph_kernel=3
-            )
-
-            depth_colored = colorize_depth(last_depth)
-            frame_resized = cv2.resize(frame, (args.width, args.height))
-            combined = np.hstack([frame_resized, depth_colored])
-
-            if centroid_info:
-                cx, cy, depth, area, (bx, by, bw, bh) = centroid_info
-
-                # IMPORTANT: draw on the depth panel (right half) => add x-offset
-                xoff = args.width
-                cv2.circle(combined, (cx + xoff, cy), 10, (0, 255, 0), -1)
-                cv2.circle(combined, (cx + xoff, cy), 15, (0, 0, 255), 2)
-                cv2.rectangle(combined, (bx + xoff, by), (bx + xoff + bw, by + bh), (0, 255, 255), 2)
-
-                cv2.putText(combined, f"Centroid: ({cx},{cy})", (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(combined, f"Depth: {depth:.2f}", (10, 60),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(combined, f"Area: {area}px", (10, 90),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            else:
-                # Fallback: closest pixel (remember the x-offset too)
-                if np.isfinite(last_depth).any():
-                    min_idx = np.nanargmax(last_depth) if True else np.nanargmin(last_depth)
-                    # ^ use argmax for MiDaS (inverse_depth=True), argmin for metric depth
-                    yy, xx = np.unravel_index(min_idx, last_depth.shape)
-                    xoff = args.width
-                    cv2.circle(combined, (xx + xoff, yy), 8, (255, 0, 255), -1)
-                    cv2.circle(combined, (xx + xoff, yy), 12, (255, 255, 0), 2)
-                    cv2.putText(combined, f"Closest: ({xx},{yy})", (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
+            t_infer = time.perf_counter()
+            item = {"id": frame_count - 1, "t_capture": t_capture,
+                    "frame": None if source.is_depth else frame, "depth": last_depth}
+            analyze(item, K, args, finder, sinks)
+            item["stage_s"] = {"infer": t_infer - t_capture, "post": time.perf_counter() - t_infer}
+            account(item, args)
             
             # Calculate and display FPS
             if frame_count % 30 == 0:
                 elapsed_time = time.time() - start_time
                 fps = frame_count / elapsed_time
-                print(f"FPS: {fps:.1f}")
+                print(f"FPS: {fps:.1f}", file=sys.stderr)
             
-            # Display
-            cv2.imshow('RGB | Depth with Centroid', combined)
-        
-        # Check for exit
-        if cv2.waitKey(1) & 0xFF == 27:  # ESC key
+            if not emit(item, log):
+                break
+        elif log is None and cv2.waitKey(1) & 0xFF == 27:
             break
+
+def run_pipeline(source, depth_fn, K, args, log=None, sinks=()):
+    """
+    Threaded mode: capture keeps the latest frame, inference runs on the
+    freshest one when the motion scheduler asks for it (held / warped depth
+    otherwise), post-processing (centroid + sectors + overlay) runs
+    in its own stage. Display stays on the main thread (required by
+    cv2.imshow on macOS). Recorded sources use lossless queues so every frame
+    is processed, as fast as the slowest stage allows.
+    """
+    scheduler = None
+    if args.adaptive and not source.is_depth:
+        scheduler = MotionScheduler(motion_threshold=args.motion_threshold,
+                                    max_staleness=args.max_staleness,
+                                    cpu_budget=args.cpu_budget,
+                                    warp=not args.no_warp)
+
+    def infer(item):
+        t0 = time.perf_counter()
+        if scheduler is not None:
+            item["depth"], item["inferred"], item["motion"] = scheduler.step(item["frame"], depth_fn)
+        else:
+            item["depth"], item["inferred"] = depth_fn(item["frame"]), True
+        if source.is_depth:
+            item["frame"] = None
+        item["stage_s"] = {"infer": time.perf_counter() - t0}
+        return item
+
+    finder = make_finder(args)
+
+    def post(item):
+        t0 = time.perf_counter()
+        analyze(item, K, args, finder, sinks)
+        item["stage_s"]["post"] = time.perf_counter() - t0
+        return item
+
+    pipe = Pipeline(source.read, infer, post, drop=source.is_live).start()
+    last_report = time.perf_counter()
+    try:
+        while not pipe.finished:
+            item = pipe.get()
+            if item is not None:
+                account(item, args)
+                if not emit(item, log):
+                    break
+            if item is None and log is None and cv2.waitKey(1) & 0xFF == 27:
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= args.stats_every:
+                print(stats_line(pipe, scheduler, getattr(args, "quality", None)), file=sys.stderr)
+                last_report = now
+
+            if pipe.errors():
+                raise pipe.errors()[0]
+    finally:
+        pipe.stop()
+        print(stats_line(pipe, scheduler, getattr(args, "quality", None)), file=sys.stderr)
+
+def stats_line(pipe, scheduler, quality=None):
+    line = pipe.stats_line()
+    if scheduler is not None:
+        line = f"{line} | {scheduler.summary()}"
+    return line if quality is None else f"{line} | {quality.summary()}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Real-time depth estimation with obstacle centroid detection')
+    parser.add_argument('--camera', type=int, default=0, help='Camera index')
+    parser.add_argument('--source', type=str, default=None,
+                        help='Input instead of --camera: video file, image directory, .npy depth sequence '
+                             '(T,H,W) or directory of .npy depth maps')
+    parser.add_argument('--realtime', action='store_true', help='Pace recorded sources at their nominal FPS')
+    parser.add_argument('--source_fps', type=float, default=30.0, help='Nominal FPS of image / depth sequences')
+    parser.add_argument('--headless', action='store_true', help='No window; write per-frame results as JSON Lines to --log')
+    parser.add_argument('--log', type=str, default='-', help='Headless result log path (- = stdout)')
+    parser.add_argument('--width', type=int, default=320, help='Camera width')
+    parser.add_argument('--height', type=int, default=240, help='Camera height')
+    parser.add_argument('--model', type=str, default='MiDaS_small', help='MiDaS model type')
+    parser.add_argument('--backend', type=str, default='eager', choices=sorted(BACKENDS),
+                        help='Inference backend (see midas_backends.py; benchmark with python3 midas_backends.py)')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads for inference')
+    parser.add_argument('--serial', action='store_true', help='Run the original single-threaded loop instead of the staged pipeline')
+    parser.add_argument('--skip', type=int, default=3, help='Process every Nth frame (--serial mode only)')
+    parser.add_argument('--no_adaptive', dest='adaptive', action='store_false',
+                        help='Pipeline mode: run inference on every fresh frame instead of motion-adaptive scheduling')
+    parser.add_argument('--motion_threshold', type=float, default=6.0, help='Mean abs gray difference (0-255) that triggers re-inference')
+    parser.add_argument('--max_staleness', type=float, default=1.0, help='Re-infer at least this often (seconds)')
+    parser.add_argument('--cpu_budget', type=float, default=0.6, help='Max fraction of one core spent on inference')
+    parser.add_argument('--no_warp', action='store_true', help='Hold the last depth between inferences instead of shifting it with the camera motion')
+    parser.add_argument('--stats_every', type=float, default=2.0, help='Seconds between per-stage FPS/latency reports')
+    parser.add_argument('--min_depth', type=float, default=0.05, help='Minimum depth threshold (meters) - not used in relative mode')
+    parser.add_argument('--max_depth', type=float, default=5.0, help='Maximum depth threshold (meters) - not used in relative mode')
+    parser.add_argument('--min_area', type=int, default=50, help='Minimum obstacle area (pixels)')
+    parser.add_argument('--top_k', type=int, default=3, help='Number of closest-band components to report')
+    parser.add_argument('--cloud_step', type=int, default=4, help='Pixel decimation for the depth -> point cloud backprojection')
+    parser.add_argument('--depth_scale', type=float, default=1000.0, help='MiDaS inverse depth -> meters: depth = scale / value (calibrate per camera)')
+    parser.add_argument('--max_range', type=float, default=4.0, help='Drop backprojected points farther than this (meters)')
+    parser.add_argument('--publish', type=str, default=None, metavar='NAME',
+                        help='Publish each frame\'s point cloud to the shared-memory ring NAME (see spatial_audio/shm_consumer.py)')
+    parser.add_argument('--publish_slots', type=int, default=8, help='Slots in the shared-memory ring')
+    parser.add_argument('--record', type=str, default=None, metavar='DIR',
+                        help='Record clouds, boxes and sectors to DIR (replay with utils/recording.py)')
+    parser.add_argument('--frame_budget', type=float, default=0.0, metavar='MS',
+                        help='Capture-to-output latency budget; lowers point budget / inference size when exceeded (0 = fixed quality)')
+    parser.add_argument('--debug', action='store_true', help='Enable debug output')
+    
+    args = parser.parse_args()
+    
+    args.quality = None
+    if args.frame_budget > 0:
+        if _utils_dir not in sys.path:
+            sys.path.insert(0, _utils_dir)
+        from quality import QualityController
+        args.quality = QualityController(budget_ms=args.frame_budget)
+    
+    # Initialize input
+    try:
+        source = open_source(args.source if args.source is not None else args.camera,
+                             width=args.width, height=args.height,
+                             fps=args.source_fps, realtime=args.realtime)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+    
+    depth_fn = passthrough_depth(args) if source.is_depth else load_depth_fn(args)
+    
+    # Create intrinsic matrix (used for the depth -> point cloud backprojection)
+    K = make_intrinsics(args.width, args.height)
+    
+    log = ResultLog(args.log) if args.headless else None
+    sinks = []
+    if args.publish:
+        sinks.append(cloud_publisher(args.publish, args))
+    if args.record:
+        sinks.append(session_recorder(args.record))
+    
+    print("Starting depth estimation with obstacle centroid detection...", file=sys.stderr)
+    if log is None:
+        print("Press ESC to quit")
     
-    cap.release()
-    cv2.destroyAllWindows()
+    start = time.perf_counter()
+    try:
+        if args.serial:
+            run_serial(source, depth_fn, K, args, log, sinks)
+        else:
+            run_pipeline(source, depth_fn, K, args, log, sinks)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.release()
+        for sink in sinks:
+            sink.close()
+        if log is not None:
+            log.close()
+            elapsed = time.perf_counter() - start
+            print(f"Processed {log.count} frames in {elapsed:.2f}s "
+                  f"({log.count / max(elapsed, 1e-9):.1f} fps)", file=sys.stderr)
+        else:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU-oriented MiDaS inference backends.
+
+  eager      plain PyTorch (reference)
+  traced     TorchScript trace, cached on disk per model / input size
+  quantized  dynamic int8 quantization of Linear layers (helps the DPT /
+             transformer models; MiDaS_small is conv-based and gains little)
+  onnx       ONNX Runtime session on an exported graph, cached on disk
+
+All backends feed the model at its native input resolution (256 for
+MiDaS_small, 384 for the DPT models) with a configurable number of
+intra-op threads, and return a relative inverse-depth map resized to the
+requested output size.
+
+Benchmark (latency + agreement with the eager reference):
+    python3 midas_backends.py --model MiDaS_small --backends eager,traced,quantized,onnx --threads 4
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Native square input size and normalization (mean, std) per model type
+NATIVE_INPUT = {
+    "MiDaS_small": 256,
+    "MiDaS": 384,
+    "DPT_Hybrid": 384,
+    "DPT_Large": 384,
+}
+IMAGENET_NORM = ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225))
+DPT_NORM = ((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+
+CACHE_DIR = os.environ.get("SENSENAV_MODEL_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "sensenav"))
+
+
+def native_input_size(model_type):
+    return NATIVE_INPUT.get(model_type, 384)
+
+
+def normalization(model_type):
+    return DPT_NORM if model_type.startswith("DPT") else IMAGENET_NORM
+
+
+def preprocess(frame, size, norm):
+    """BGR uint8 frame -> (1, 3, size, size) float32 NCHW, normalized."""
+    rgb = cv2.cvtColor(cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+    x = rgb.astype(np.float32) * (1.0 / 255.0)
+    mean, std = norm
+    x -= np.asarray(mean, dtype=np.float32)
+    x /= np.asarray(std, dtype=np.float32)
+    return np.ascontiguousarray(x.transpose(2, 0, 1)[None])
+
+
+def _load_torch_model(model_type, device="cpu"):
+    import torch
+    from opencv import load_midas
+
+    model, _ = load_midas(model_type, device=torch.device(device))
+    return model.eval()
+
+
+class MidasBackend:
+    """Base class: preprocessing, thread setup and output resizing; subclasses implement _run."""
+    name = "base"
+
+    def __init__(self, model_type="MiDaS_small", threads=None, input_size=None):
+        self.model_type = model_type
+        self.threads = threads
+        self.input_size = input_size or native_input_size(model_type)
+        self.norm = normalization(model_type)
+
+    def _run(self, x):
+        raise NotImplementedError
+
+    def infer(self, frame, width, height):
+        """BGR frame -> (height, width) float32 relative inverse depth."""
+        depth = self._run(preprocess(frame, self.input_size, self.norm))
+        depth = np.asarray(depth, dtype=np.float32).reshape(depth.shape[-2:])
+        return cv2.resize(depth, (width, height))
+
+    def cache_path(self, ext):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        return os.path.join(CACHE_DIR, f"{self.model_type}_{self.input_size}.{ext}")
+
+
+class EagerBackend(MidasBackend):
+    """Plain PyTorch; the only backend that uses CUDA when available."""
+    name = "eager"
+
+    def __init__(self, model_type="MiDaS_small", threads=None, input_size=None):
+        super().__init__(model_type, threads, input_size)
+        import torch
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        self.device = "cuda" if self.name == "eager" and torch.cuda.is_available() else "cpu"
+        self.model = self._build()
+
+    def _build(self):
+        return _load_torch_model(self.model_type, self.device)
+
+    def _run(self, x):
+        with self.torch.inference_mode():
+            return self.model(self.torch.from_numpy(x).to(self.device)).cpu().numpy()
+
+
+class TracedBackend(EagerBackend):
+    name = "traced"
+
+    def _build(self):
+        torch = self.torch
+        path = self.cache_path("ts")
+        if os.path.exists(path):
+            return torch.jit.load(path, map_location="cpu")
+        model = _load_torch_model(self.model_type)
+        example = torch.zeros(1, 3, self.input_size, self.input_size)
+        with torch.inference_mode():
+            traced = torch.jit.freeze(torch.jit.trace(model, example, check_trace=False))
+        traced.save(path)
+        return traced
+
+
+class QuantizedBackend(EagerBackend):
+    name = "quantized"
+
+    def _build(self):
+        torch = self.torch
+        model = _load_torch_model(self.model_type)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(MidasBackend):
+    name = "onnx"
+
+    def __init__(self, model_type="MiDaS_small", threads=None, input_size=None):
+        super().__init__(model_type, threads, input_size)
+        import onnxruntime as ort
+
+        path = self.cache_path("onnx")
+        if not os.path.exists(path):
+            self._export(path)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _export(self, path):
+        import torch
+        model = _load_torch_model(self.model_type)
+        example = torch.zeros(1, 3, self.input_size, self.input_size)
+        torch.onnx.export(model, example, path, input_names=["image"], output_names=["depth"],
+                          opset_version=17)
+
+    def _run(self, x):
+        return self.session.run(None, {self.input_name: x})[0]
+
+
+BACKENDS = {
+    "eager": EagerBackend,
+    "traced": TracedBackend,
+    "quantized": QuantizedBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def make_backend(name, model_type="MiDaS_small", threads=None, input_size=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {list(BACKENDS)}")
+    return BACKENDS[name](model_type, threads=threads, input_size=input_size)
+
+
+# ---------- benchmark ----------
+def depth_agreement(ref, depth):
+    """
+    Agreement of two relative depth maps after least-squares scale/shift
+    alignment (MiDaS output is only defined up to scale and shift).
+    Returns (abs_rel, correlation).
+    """
+    r = ref.ravel().astype(np.float64)
+    d = depth.ravel().astype(np.float64)
+    A = np.stack([d, np.ones_like(d)], axis=1)
+    (s, t), *_ = np.linalg.lstsq(A, r, rcond=None)
+    aligned = s * d + t
+    denom = np.maximum(np.abs(r), 1e-6)
+    return float(np.mean(np.abs(aligned - r) / denom)), float(np.corrcoef(r, d)[0, 1])
+
+
+def load_frames(source, count, width, height):
+    """Frames from a video / image directory, or synthetic gradients + noise if source is None."""
+    if source is None:
+        rng = np.random.default_rng(0)
+        base = np.linspace(0, 255, width, dtype=np.float32)[None, :, None].repeat(height, 0).repeat(3, 2)
+        return [np.clip(base + rng.normal(0, 20, base.shape), 0, 255).astype(np.uint8) for _ in range(count)]
+
+    from sources import open_source
+    src = open_source(source)
+    frames = []
+    while len(frames) < count:
+        ok, frame = src.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    src.release()
+    return frames
+
+
+def benchmark(backend_names, model_type, threads, frames, width, height, warmup=3):
+    """Time each backend on the same frames and compare against the first (reference) backend."""
+    results = []
+    reference = None
+    for name in backend_names:
+        try:
+            t0 = time.perf_counter()
+            backend = make_backend(name, model_type, threads=threads)
+            load_s = time.perf_counter() - t0
+        except Exception as e:
+            results.append({"backend": name, "error": str(e)})
+            continue
+
+        for frame in frames[:warmup]:
+            backend.infer(frame, width, height)
+        times, depths = [], []
+        for frame in frames:
+            t0 = time.perf_counter()
+            depths.append(backend.infer(frame, width, height))
+            times.append(time.perf_counter() - t0)
+
+        row = {
+            "backend": name,
+            "load_s": load_s,
+            "mean_ms": 1000 * float(np.mean(times)),
+            "p95_ms": 1000 * float(np.percentile(times, 95)),
+        }
+        if reference is None:
+            reference = depths
+        else:
+            agree = [depth_agreement(r, d) for r, d in zip(reference, depths)]
+            row["abs_rel"] = float(np.mean([a for a, _ in agree]))
+            row["corr"] = float(np.mean([c for _, c in agree]))
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MiDaS CPU inference backends')
+    parser.add_argument('--model', type=str, default='MiDaS_small', help='MiDaS model type')
+    parser.add_argument('--backends', type=str, default='eager,traced,quantized,onnx',
+                        help='Comma-separated backends; the first one is the accuracy reference')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads (default: library default)')
+    parser.add_argument('--source', type=str, default=None, help='Video file or image directory (default: synthetic frames)')
+    parser.add_argument('--frames', type=int, default=30, help='Number of frames to time')
+    parser.add_argument('--width', type=int, default=320, help='Output depth width')
+    parser.add_argument('--height', type=int, default=240, help='Output depth height')
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, args.width, args.height)
+    results = benchmark(args.backends.split(','), args.model, args.threads, frames, args.width, args.height)
+
+    print(f"{args.model}, input {native_input_size(args.model)}px, {len(frames)} frames, threads={args.threads}")
+    print(f"{'backend':10s} {'load s':>7s} {'mean ms':>8s} {'p95 ms':>8s} {'abs_rel':>8s} {'corr':>6s}")
+    for row in results:
+        if "error" in row:
+            print(f"{row['backend']:10s} unavailable: {row['error']}")
+            continue
+        print(f"{row['backend']:10s} {row['load_s']:7.2f} {row['mean_ms']:8.1f} {row['p95_ms']:8.1f} "
+              f"{row.get('abs_rel', 0.0):8.4f} {row.get('corr', 1.0):6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Staged capture -> inference -> post-process pipeline.
+
+Stages run in their own threads and are connected by LatestQueue, a bounded
+queue that drops the oldest item when full. A slow stage therefore always
+picks up the freshest frame instead of working through a backlog of stale
+ones. Each stage keeps its own FPS / latency statistics.
+"""
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    """
+    Bounded queue where put() never blocks: when full, the oldest item is dropped.
+    With drop=False put() waits for space instead (lossless, for recorded input).
+    """
+
+    def __init__(self, maxsize=1, drop=True):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.drop = drop
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if not self.drop:
+                while len(self._items) == self._items.maxlen and not self._closed:
+                    self._cond.wait()
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None on timeout / after close()."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+            return None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class StageStats:
+    """Rolling FPS and latency for one stage (last `window` items)."""
+
+    def __init__(self, name, window=60):
+        self.name = name
+        self.count = 0
+        self._stamps = deque(maxlen=window)
+        self._latency = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s, t=None):
+        with self._lock:
+            self.count += 1
+            self._stamps.append(time.perf_counter() if t is None else t)
+            self._latency.append(latency_s)
+
+    def fps(self):
+        with self._lock:
+            if len(self._stamps) < 2:
+                return 0.0
+            span = self._stamps[-1] - self._stamps[0]
+            return (len(self._stamps) - 1) / span if span > 0 else 0.0
+
+    def latency_ms(self):
+        with self._lock:
+            if not self._latency:
+                return 0.0
+            return 1000.0 * sum(self._latency) / len(self._latency)
+
+    def summary(self):
+        return f"{self.name} {self.fps():5.1f} fps {self.latency_ms():6.1f} ms"
+
+
+class Stage(threading.Thread):
+    """
+    Worker thread: take the latest item from `inbox`, run `fn(item)` and put
+    the result into `outbox`. `fn` returning None drops the item.
+    """
+
+    def __init__(self, name, fn, inbox, outbox, stop_event, poll_s=0.05):
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.poll_s = poll_s
+        self.stats = StageStats(name)
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                item = self.inbox.get(timeout=self.poll_s)
+                if item is None:
+                    if self.inbox.closed:
+                        break
+                    continue
+                t0 = time.perf_counter()
+                out = self.fn(item)
+                self.stats.record(time.perf_counter() - t0)
+                if out is not None:
+                    self.outbox.put(out)
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        finally:
+            self.outbox.close()
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames as fast as the source delivers them and keeps only the latest.
+    Items are dicts with "id", "t_capture" (perf_counter) and "frame".
+    `read_fn()` returns (ok, frame) like cv2.VideoCapture.read.
+    """
+
+    def __init__(self, read_fn, outbox, stop_event):
+        super().__init__(name="capture", daemon=True)
+        self.read_fn = read_fn
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.stats = StageStats("capture")
+        self.error = None
+
+    def run(self):
+        frame_id = 0
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                ok, frame = self.read_fn()
+                if not ok:
+                    break
+                t1 = time.perf_counter()
+                self.stats.record(t1 - t0, t1)
+                self.outbox.put({"id": frame_id, "t_capture": t1, "frame": frame})
+                frame_id += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.outbox.close()
+
+
+class Pipeline:
+    """
+    capture -> infer -> post, each in its own thread; the caller consumes
+    finished items with get() (e.g. to imshow them on the main thread).
+
+    infer_fn(item) and post_fn(item) receive and return the item dict,
+    adding their own keys ("depth", "combined", ...). drop=False makes every
+    queue lossless, so recorded input is processed frame by frame as fast as
+    the slowest stage allows.
+    """
+
+    def __init__(self, read_fn, infer_fn, post_fn, queue_size=1, drop=True):
+        self.stop_event = threading.Event()
+        self.frames = LatestQueue(queue_size, drop)
+        self.depths = LatestQueue(queue_size, drop)
+        self.results = LatestQueue(queue_size, drop)
+        self.capture = CaptureThread(read_fn, self.frames, self.stop_event)
+        self.infer = Stage("infer", infer_fn, self.frames, self.depths, self.stop_event)
+        self.post = Stage("post", post_fn, self.depths, self.results, self.stop_event)
+        self.e2e = StageStats("e2e")
+
+    def start(self):
+        for t in (self.capture, self.infer, self.post):
+            t.start()
+        return self
+
+    def get(self, timeout=0.05):
+        """Next finished item (or None); records end-to-end latency from capture."""
+        item = self.results.get(timeout=timeout)
+        if item is not None:
+            self.e2e.record(time.perf_counter() - item["t_capture"])
+        return item
+
+    @property
+    def finished(self):
+        """True once the source is exhausted (or a stage failed) and every result was consumed."""
+        return self.results.closed and len(self.results) == 0
+
+    def stats_line(self):
+        return " | ".join(s.summary() for s in
+                          (self.capture.stats, self.infer.stats, self.post.stats, self.e2e))
+
+    def errors(self):
+        return [t.error for t in (self.capture, self.infer, self.post) if t.error is not None]
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        for q in (self.frames, self.depths, self.results):
+            q.close()
+        for t in (self.capture, self.infer, self.post):
+            t.join(timeout)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motion-adaptive inference scheduling for depth_centroid.py.
+
+Instead of running MiDaS on every Nth frame, a cheap motion estimate on a
+small grayscale copy of each frame decides when the depth is worth
+refreshing:
+
+  - motion = mean absolute difference (0..255) against the frame the current
+    depth was inferred from
+  - re-infer when motion exceeds the threshold, or when the depth is older
+    than max_staleness seconds
+  - never re-infer more often than the CPU budget allows: with an average
+    inference time t and a budget b (fraction of one core), the minimum
+    interval between inferences is t / b
+
+Between inferences the previous depth is held, or shifted by the global
+image translation (phase correlation) when warp is enabled.
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionScheduler:
+
+    def __init__(self, motion_threshold=6.0, max_staleness=1.0, cpu_budget=0.6,
+                 size=(80, 60), warp=True, ema=0.2):
+        self.motion_threshold = motion_threshold
+        self.max_staleness = max_staleness
+        self.cpu_budget = max(1e-3, cpu_budget)
+        self.size = size
+        self.warp_enabled = warp
+        self.ema = ema
+
+        self.depth = None         # last inferred depth
+        self.ref_gray = None      # small gray of the frame it came from
+        self.ref_time = None
+        self.infer_time = None    # EMA of inference duration (s)
+        self.inferences = 0
+        self.held = 0
+        self.last_motion = 0.0
+
+    def gray(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.float32)
+
+    def min_interval(self):
+        """Shortest allowed gap between inferences under the CPU budget."""
+        return 0.0 if self.infer_time is None else self.infer_time / self.cpu_budget
+
+    def decide(self, gray, now=None):
+        """Return (infer, motion) for a frame whose small gray is `gray`."""
+        now = time.perf_counter() if now is None else now
+        if self.ref_gray is None:
+            return True, float("inf")
+
+        motion = float(cv2.absdiff(gray, self.ref_gray).mean())
+        self.last_motion = motion
+        age = now - self.ref_time
+        if age >= self.max_staleness:
+            return True, motion
+        return motion > self.motion_threshold and age >= self.min_interval(), motion
+
+    def record_inference(self, gray, duration, now=None):
+        self.ref_gray = gray
+        self.ref_time = time.perf_counter() if now is None else now
+        self.inferences += 1
+        if self.infer_time is None:
+            self.infer_time = duration
+        else:
+            self.infer_time += self.ema * (duration - self.infer_time)
+
+    def warp(self, depth, gray):
+        """Shift the held depth by the global translation between its source frame and `gray`."""
+        if not self.warp_enabled or self.ref_gray is None:
+            return depth
+        (dx, dy), response = cv2.phaseCorrelate(self.ref_gray, gray)
+        if response < 0.1 or (abs(dx) < 0.25 and abs(dy) < 0.25):
+            return depth
+        sx = depth.shape[1] / self.size[0]
+        sy = depth.shape[0] / self.size[1]
+        M = np.float32([[1, 0, dx * sx], [0, 1, dy * sy]])
+        return cv2.warpAffine(depth, M, (depth.shape[1], depth.shape[0]),
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def step(self, frame, infer_fn):
+        """
+        Schedule one frame: run infer_fn(frame) if needed, otherwise hold / warp
+        the last inferred depth. Returns (depth, inferred, motion).
+        """
+        gray = self.gray(frame)
+        infer, motion = self.decide(gray)
+        if infer or self.depth is None:
+            t0 = time.perf_counter()
+            self.depth = infer_fn(frame)
+            self.record_inference(gray, time.perf_counter() - t0)
+            return self.depth, True, motion
+        self.held += 1
+        return self.warp(self.depth, gray), False, motion
+
+    def summary(self):
+        total = self.inferences + self.held
+        rate = self.inferences / total if total else 0.0
+        t = 0.0 if self.infer_time is None else self.infer_time * 1000.0
+        return (f"sched infer {self.inferences}/{total} ({100 * rate:.0f}%) "
+                f"{t:.1f} ms motion {self.last_motion:.1f}")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Frame sources for depth_centroid.py.
+
+Every source exposes the cv2.VideoCapture-style `read() -> (ok, frame)` and
+`release()`, plus:
+  is_depth  True when frames are already depth maps (inference is skipped)
+  is_live   True for cameras; recorded sources may run faster than real time
+  fps       nominal rate, used for --realtime pacing of recorded sources
+
+Supported specs (see open_source):
+  0, 1, ...           camera index
+  video.mp4           video file
+  frames/             directory of images (sorted by name)
+  depth.npy           (T, H, W) depth sequence, memory-mapped
+  depth_frames/       directory of per-frame (H, W) .npy depth maps, memory-mapped
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+class CameraSource:
+    is_depth = False
+    is_live = True
+
+    def __init__(self, index, width=None, height=None):
+        self.cap = cv2.VideoCapture(index)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open camera {index}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(CameraSource):
+    is_live = False
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video file {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+
+class ImageDirSource:
+    is_depth = False
+    is_live = False
+
+    def __init__(self, path, fps=30.0):
+        self.files = sorted(f for f in glob.glob(os.path.join(path, "*"))
+                            if f.lower().endswith(IMAGE_EXTS))
+        if not self.files:
+            raise IOError(f"No images found in {path}")
+        self.fps = fps
+        self._i = 0
+
+    def read(self):
+        if self._i >= len(self.files):
+            return False, None
+        frame = cv2.imread(self.files[self._i])
+        self._i += 1
+        return frame is not None, frame
+
+    def release(self):
+        pass
+
+
+class DepthSequenceSource:
+    """
+    Pre-computed depth maps, memory-mapped so frames are paged in on demand
+    (no decode, no copy until a stage writes to them).
+    """
+    is_depth = True
+    is_live = False
+
+    def __init__(self, path, fps=30.0):
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(path, "*.npy")))
+            if not files:
+                raise IOError(f"No .npy depth maps found in {path}")
+            self._frames = [np.load(f, mmap_mode="r") for f in files]
+        else:
+            seq = np.load(path, mmap_mode="r")
+            if seq.ndim == 2:
+                seq = seq[None]
+            if seq.ndim != 3:
+                raise ValueError(f"Depth sequence must be (T, H, W), got {seq.shape}")
+            self._frames = seq
+        self.fps = fps
+        self._i = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def read(self):
+        if self._i >= len(self._frames):
+            return False, None
+        depth = self._frames[self._i]
+        self._i += 1
+        return True, depth
+
+    def release(self):
+        self._frames = []
+
+
+class Paced:
+    """Wraps a recorded source so read() returns frames at its nominal fps."""
+
+    def __init__(self, source, fps=None):
+        self.source = source
+        self.period = 1.0 / (fps or source.fps)
+        self._next = None
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    def read(self):
+        now = time.perf_counter()
+        if self._next is None:
+            self._next = now
+        elif now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(self._next + self.period, time.perf_counter() - self.period)
+        return self.source.read()
+
+
+def open_source(spec, width=None, height=None, fps=30.0, realtime=False):
+    """Open a camera index, video file, image directory or depth sequence (see module doc)."""
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec), width, height)
+
+    if os.path.isdir(spec):
+        if glob.glob(os.path.join(spec, "*.npy")):
+            source = DepthSequenceSource(spec, fps=fps)
+        else:
+            source = ImageDirSource(spec, fps=fps)
+    elif spec.lower().endswith(".npy"):
+        source = DepthSequenceSource(spec, fps=fps)
+    elif os.path.isfile(spec):
+        source = VideoFileSource(spec)
+    else:
+        raise IOError(f"Unknown source: {spec}")
+
+    return Paced(source) if realtime else source
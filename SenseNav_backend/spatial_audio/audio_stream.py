@@ -0,0 +1,180 @@
+"""
+Progressive audio responses: cues rendered block by block and encoded as
+they are produced, so a client starts playing after one block instead of
+after the whole multi-second buffer.
+
+    for chunk in stream_cue(nearest_by_sector(cloud), mode="sequential", codec="ulaw"):
+        sock.send(chunk)        # WAV header first, then one block per chunk
+
+  - rendering goes through the block renderer (block_render.py) or, for the
+    one-cue-at-a-time sweep, the cue queue (cue_queue.py); each yields into
+    the same pooled float32 buffer, so memory stays constant however long
+    the cue is
+  - codecs: "pcm16" (16-bit PCM) or "ulaw" (G.711 mu-law, 8 bits per
+    sample, half the bandwidth; a 64 KB lookup table)
+  - container: "wav" starts with a RIFF header whose sizes are 0xFFFFFFFF
+    (length unknown, the usual convention for streamed WAV) and carries
+    little-endian PCM; "raw" sends the samples only, in the byte order of
+    their MIME type: audio/L16 is big-endian (RFC 2586), audio/PCMU is
+    mu-law (RFC 3551), both with rate and channels parameters
+
+Time-to-first-sample is one block (10.7 ms of audio at 512 / 48 kHz, plus
+that block's render time).
+"""
+import struct
+
+import numpy as np
+
+from block_render import BLOCK, BlockRenderer
+from cue_queue import CueQueue
+
+CODECS = ("pcm16", "ulaw")
+CONTAINERS = ("wav", "raw")
+MODES = ("all", "sequential")
+MIMETYPES = {
+    ("wav", "pcm16"): "audio/wav",
+    ("wav", "ulaw"): "audio/wav",
+    ("raw", "pcm16"): "audio/L16",        # big-endian; needs ;rate=...;channels=...
+    ("raw", "ulaw"): "audio/PCMU",        # likewise (audio/basic would mean 8 kHz mono)
+}
+UNKNOWN_SIZE = 0xFFFFFFFF
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_MULAW = 7
+
+
+def wav_header(fs, channels=2, codec="pcm16", data_bytes=None):
+    """RIFF/WAVE header; data_bytes=None writes 0xFFFFFFFF sizes for a stream of unknown length."""
+    if codec == "pcm16":
+        fmt_tag, bits, fmt = WAVE_FORMAT_PCM, 16, b""
+    else:
+        fmt_tag, bits, fmt = WAVE_FORMAT_MULAW, 8, struct.pack("<H", 0)     # cbSize for non-PCM
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", fmt_tag, channels, int(fs), int(fs) * block_align, block_align, bits) + fmt
+    data_size = UNKNOWN_SIZE if data_bytes is None else int(data_bytes)
+    riff_size = UNKNOWN_SIZE if data_bytes is None else 4 + 8 + len(fmt) + 8 + data_size
+    return (b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", data_size))
+
+
+def _mulaw_table():
+    """
+    G.711 mu-law byte for every 16-bit sample (indexed by the sample as
+    uint16), bit-exact with the reference encoder (14-bit input, bias 33,
+    clip 8159).
+    """
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    mag = np.minimum(np.abs(pcm), 8159) + 33
+    seg = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), mag)
+    uval = np.where(seg < 8, (seg << 4) | ((mag >> (seg + 1)) & 0x0F), 0x7F)
+    return (uval ^ mask).astype(np.uint8)
+
+
+_MULAW = None
+
+
+def mimetype(container, codec, fs, channels=2):
+    """Content type of a stream_cue() response."""
+    base = MIMETYPES[(container, codec)]
+    return base if container == "wav" else f"{base};rate={int(fs)};channels={channels}"
+
+
+class BlockEncoder:
+    """Float32 (block, channels) -> codec bytes, through preallocated buffers."""
+
+    def __init__(self, codec="pcm16", block=BLOCK, channels=2, byteorder="<"):
+        """byteorder: "<" (WAV) or ">" (raw audio/L16) for pcm16; mu-law is bytewise."""
+        global _MULAW
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {list(CODECS)}")
+        self.codec = codec
+        self.scaled = np.zeros((block, channels), dtype=np.float32)
+        self.pcm = np.zeros((block, channels), dtype=np.int16)
+        self.wire = np.zeros((block, channels), dtype=byteorder + "i2")
+        if codec == "ulaw":
+            if _MULAW is None:
+                _MULAW = _mulaw_table()
+            self.table = _MULAW
+            self.ulaw = np.zeros((block, channels), dtype=np.uint8)
+
+    def encode(self, x):
+        n = len(x)
+        scaled, pcm = self.scaled[:n], self.pcm[:n]
+        np.clip(x, -1.0, 1.0, out=scaled)
+        scaled *= 32767.0
+        np.copyto(pcm, scaled, casting="unsafe")
+        if self.codec == "pcm16":
+            wire = self.wire[:n]
+            np.copyto(wire, pcm)
+            return wire.tobytes()
+        np.take(self.table, pcm.view(np.uint16), out=self.ulaw[:n])
+        return self.ulaw[:n].tobytes()
+
+
+def cue_blocks(picked, mode="all", dur=2.0, fs=48000, block=BLOCK):
+    """
+    Yield the cue for `picked` (sector -> (r, az, el)) as (block, 2) float32
+    blocks. Every block is the same reused buffer: consume it before the next.
+      "all":        all sectors at once for `dur` seconds
+      "sequential": one sector after another by obstacle_score, `dur` seconds each
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {list(MODES)}")
+    out = np.zeros((block, 2), dtype=np.float32)
+    if mode == "all":
+        renderer = BlockRenderer(fs, block)
+        renderer.set_sectors(picked, dur=dur)
+        for _ in range(-(-int(dur * fs) // block)):
+            yield renderer.render(out)
+        return
+    queue = CueQueue(fs, block, seg_dur=dur)
+    queue.submit(picked)
+    while queue.current is not None or queue.pending:
+        yield queue.render(out)
+
+
+def stream_cue(picked, mode="all", dur=2.0, fs=48000, block=BLOCK, codec="pcm16", container="wav"):
+    """Encoded byte chunks of the cue: the WAV header (container="wav"), then one chunk per block."""
+    if container not in CONTAINERS:
+        raise ValueError(f"Unknown container '{container}', expected one of {list(CONTAINERS)}")
+    encoder = BlockEncoder(codec, block, byteorder="<" if container == "wav" else ">")
+    if container == "wav":
+        yield wav_header(fs, 2, codec)
+    for x in cue_blocks(picked, mode, dur, fs, block):
+        yield encoder.encode(x)
+
+
+def main():
+    import argparse
+    import time
+    import tracemalloc
+    parser = argparse.ArgumentParser(description='Time-to-first-sample and memory of a streamed cue')
+    parser.add_argument('--mode', default='sequential', choices=MODES)
+    parser.add_argument('--codec', default='pcm16', choices=CODECS)
+    parser.add_argument('--fs', type=int, default=48000)
+    parser.add_argument('--block', type=int, default=BLOCK)
+    args = parser.parse_args()
+
+    picked = {"FL": (1.2, 0.6, 0.0), "FR": (2.0, -0.4, 0.0), "UP": (1.0, 0.0, 1.0)}
+    for _ in stream_cue(picked, args.mode, 0.1, args.fs, args.block, args.codec):
+        pass                                  # warm up imports and filter design
+    for dur in (2.0, 20.0):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        chunks = stream_cue(picked, args.mode, dur, args.fs, args.block, args.codec)
+        next(chunks)
+        first = next(chunks)
+        ttfs = time.perf_counter() - t0
+        total = len(first)
+        for chunk in chunks:
+            total += len(chunk)
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{args.mode}, {dur:.0f} s cue: first block after {1e3 * ttfs:.2f} ms, "
+              f"{total / 1024:.0f} KB in {elapsed:.2f} s, peak memory {peak / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+Block-based cue rendering without steady-state allocations.
+
+The whole-buffer generators in closest_obstacle_audio.py build each cue from
+dozens of full-length temporaries (time bases, harmonics, modulators, echo
+buffers, padding, stacking). On small devices the resulting allocator / GC
+churn is audible. Here every stage keeps its state between blocks and writes
+into caller-provided or pooled float32 buffers (out= semantics), so once the
+voices exist, rendering a block allocates nothing:
+
+    renderer = BlockRenderer(fs=48000, block=512)
+    renderer.set_sectors({"FL": (1.2, 0.5, 0.0), "BR": (2.5, -2.3, 0.0)})
+    out = np.empty((512, 2), dtype=np.float32)
+    while streaming:
+        renderer.render(out)          # fills out in place
+        device.write(out)
+
+Differences to the whole-buffer path, all forced by streaming:
+  - filters are causal FIR filters (windowed sinc, applied tap by tap) instead
+    of zero-phase filtfilt, which needs the whole signal
+  - levels are controlled by a smoothed limiter on the mix instead of
+    per-stem peak normalization
+  - elevation is carried by the UP / DOWN timbres (as in the sequential and
+    priority modes, which pan with el=0)
+
+Allocation check (exits non-zero if steady-state rendering allocates):
+    python3 block_render.py --check
+"""
+import math
+import tracemalloc
+
+import numpy as np
+
+from closest_obstacle_audio import distance_to_params
+
+BLOCK = 512
+TWO_PI = 2.0 * math.pi
+
+
+class BufferPool:
+    """Named, preallocated float32 scratch buffers shared by the stages of one renderer."""
+
+    def __init__(self, block=BLOCK):
+        self.block = block
+        self._buffers = {}
+
+    def get(self, name, channels=None):
+        shape = (self.block,) if channels is None else (self.block, channels)
+        buf = self._buffers.get((name, shape))
+        if buf is None:
+            buf = self._buffers[(name, shape)] = np.zeros(shape, dtype=np.float32)
+        return buf
+
+
+# ---------- filter design ----------
+def lowpass_taps(cutoff, fs, n_taps=63):
+    """Hamming-windowed sinc low-pass FIR taps (float32, unity DC gain)."""
+    m = np.arange(n_taps) - (n_taps - 1) / 2.0
+    taps = np.sinc(2.0 * cutoff / fs * m) * np.hamming(n_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+def highpass_taps(cutoff, fs, n_taps=63):
+    """Spectral inversion of lowpass_taps (n_taps must be odd)."""
+    taps = -lowpass_taps(cutoff, fs, n_taps)
+    taps[(n_taps - 1) // 2] += 1.0
+    return taps
+
+
+# ---------- stages ----------
+class Oscillator:
+    """Phase accumulator; phase(out) writes the block's phase ramp in radians."""
+
+    def __init__(self, fs, block=BLOCK):
+        self.fs = fs
+        self.block = block
+        self.ramp = np.arange(block, dtype=np.float32)
+        self.ramp_sq = self.ramp * self.ramp
+        self.sweep_buf = np.zeros(block, dtype=np.float32)
+        self.phase0 = 0.0
+
+    def phase(self, freq, out, sweep=0.0):
+        """
+        Phase for a block at `freq` Hz, optionally sweeping by `sweep` Hz per
+        sample (linear chirp). Advances the oscillator by one block.
+        """
+        n = self.block
+        inc = TWO_PI * float(freq) / self.fs
+        np.multiply(self.ramp, inc, out=out)
+        advance = inc * n
+        if sweep:
+            d_inc = TWO_PI * float(sweep) / self.fs
+            np.multiply(self.ramp_sq, 0.5 * d_inc, out=self.sweep_buf)
+            out += self.sweep_buf
+            advance += 0.5 * d_inc * n * n
+        out += self.phase0
+        self.phase0 = (self.phase0 + advance) % TWO_PI
+        return out
+
+    def sine(self, freq, out):
+        """sin() of the next block's phase, into out."""
+        self.phase(freq, out)
+        return np.sin(out, out=out)
+
+
+class FIRFilter:
+    """Causal FIR filter with state carried across blocks."""
+
+    def __init__(self, taps, block=BLOCK):
+        self.taps = [float(t) for t in taps]
+        self.block = block
+        n = len(self.taps)
+        if n - 1 > block:
+            raise ValueError(f"{n} taps need a block of at least {n - 1} samples")
+        self.hist = np.zeros(n - 1 + block, dtype=np.float32)
+        self.tmp = np.zeros(block, dtype=np.float32)
+
+    def process(self, x, out):
+        """Filter one block; out may be x."""
+        n, b = len(self.taps), self.block
+        hist = self.hist
+        hist[:n - 1] = hist[b:b + n - 1]
+        hist[n - 1:] = x
+        np.multiply(hist[n - 1:n - 1 + b], self.taps[0], out=out)
+        for k in range(1, n):
+            np.multiply(hist[n - 1 - k:n - 1 - k + b], self.taps[k], out=self.tmp)
+            out += self.tmp
+        return out
+
+
+class DelayLine:
+    """Ring buffer delay; process() writes x and reads the block `delay` samples back."""
+
+    def __init__(self, max_delay, block=BLOCK):
+        size = 1
+        while size < max_delay + block:
+            size *= 2
+        self.buf = np.zeros(size, dtype=np.float32)
+        self.block = block
+        self.pos = 0
+
+    def process(self, x, delay, out):
+        """out = x delayed by `delay` samples (out must not be x)."""
+        buf, b, size = self.buf, self.block, len(self.buf)
+        w = self.pos
+        first = min(b, size - w)
+        buf[w:w + first] = x[:first]
+        if first < b:
+            buf[:b - first] = x[first:]
+        r = (w - int(delay)) % size
+        first = min(b, size - r)
+        out[:first] = buf[r:r + first]
+        if first < b:
+            out[first:] = buf[:b - first]
+        self.pos = (w + b) % size
+        return out
+
+
+class Envelope:
+    """Linear fade-in / fade-out over a cue of n_total samples (None = sustained)."""
+
+    def __init__(self, fs, n_total=None, fade=0.05, block=BLOCK):
+        self.fade_n = max(1, int(fs * fade))
+        self.n_total = n_total
+        self.ramp = np.arange(block, dtype=np.float32)
+        self.block = block
+        self.n = 0
+
+    @property
+    def done(self):
+        return self.n_total is not None and self.n >= self.n_total
+
+    def apply(self, x, scratch, scratch2):
+        """Multiply x by the envelope of the current block and advance."""
+        n0, b = self.n, self.block
+        self.n += b
+        in_fade_in = n0 < self.fade_n
+        in_fade_out = self.n_total is not None and n0 + b > self.n_total - self.fade_n
+        if not (in_fade_in or in_fade_out):
+            return x
+        inv = 1.0 / self.fade_n
+        np.add(self.ramp, float(n0), out=scratch)
+        scratch *= inv
+        if in_fade_out:
+            np.subtract(float(self.n_total - n0), self.ramp, out=scratch2)
+            scratch2 *= inv
+            np.minimum(scratch, scratch2, out=scratch)
+        np.clip(scratch, 0.0, 1.0, out=scratch)
+        x *= scratch
+        return x
+
+
+# ---------- voices ----------
+# Harmonic recipes (harmonic number, amplitude) and output gain, matching
+# tone_left / tone_right / tone_up in closest_obstacle_audio.py
+TIMBRES = {
+    "left": ([(1, 1.0), (2, 0.1), (3, 0.2 / 3)], 0.5),
+    "right": ([(1, 1.0), (3, 0.25 / 3), (5, 0.05)], 0.4),
+    "up": ([(1, 1.0), (2, 0.2), (4, 0.1)], 0.5),
+}
+SECTOR_VOICES = {
+    # sector: (timbre, freq factor, min freq, gain factor, tremolo factor, darken cutoff)
+    "FL": ("left", 1.0, 0.0, 1.0, 1.0, None),
+    "FR": ("right", 1.0, 0.0, 1.0, 1.0, None),
+    "BL": ("left", 0.9, 200.0, 0.9, 0.8, 900.0),
+    "BR": ("right", 0.85, 180.0, 0.85, 0.7, 700.0),
+    "UP": ("up", 1.0, 500.0, 0.9, 0.0, None),
+    "DOWN": ("down", 0.8, 200.0, 0.85, 0.0, None),
+}
+
+
+class CueVoice:
+    """
+    One sector's cue as a stream: timbre, tremolo, darkening (back sectors),
+    fades and binaural panning (ILD + ITD), rendered block by block into a
+    stereo mix.
+    """
+
+    def __init__(self, sector, r, az, el=0.0, fs=48000, block=BLOCK, pool=None, dur=None,
+                 head_width=0.18, fade=0.05):
+        self.sector = sector
+        self.fs = fs
+        self.block = block
+        self.pool = pool or BufferPool(block)
+        self.head_width = head_width
+        self.timbre, self.f_factor, self.f_min, self.g_factor, self.trem_factor, cutoff = SECTOR_VOICES[sector]
+
+        self.osc = Oscillator(fs, block)
+        self.sub_osc = Oscillator(fs, block)          # DOWN sub-bass
+        self.pulse_osc = Oscillator(fs, block)        # DOWN sub-bass pulse
+        self.lfo = Oscillator(fs, block)              # tremolo
+        self.env = Envelope(fs, None if dur is None else int(dur * fs), fade=fade, block=block)
+        self.lowpass = FIRFilter(lowpass_taps(cutoff, fs), block) if cutoff else None
+        self.echo = DelayLine(int(0.08 * fs), block) if cutoff else None
+        self.itd = DelayLine(int(head_width / 343.0 * fs) + 1, block)
+        self.set_params(r, az, el)
+
+    def set_params(self, r, az, el=0.0):
+        """Update distance / direction; takes effect from the next block."""
+        rate, freq, gain = distance_to_params(r)
+        self.r, self.az, self.el = float(r), float(az), float(el)
+        self.freq = max(self.f_min, self.f_factor * float(freq))
+        self.gain = self.g_factor * float(gain)
+        self.trem_rate = self.trem_factor * float(rate)
+        pan = -math.sin(self.az)
+        theta = (pan + 1.0) * (math.pi / 4.0)
+        self.left_gain, self.right_gain = math.cos(theta), math.sin(theta)
+        itd = self.head_width * math.sin(self.az) / 343.0
+        self.delay = int(round(abs(itd) * self.fs))
+        self.delay_left = itd < 0                     # source to the right -> delay left ear
+
+    @property
+    def done(self):
+        return self.env.done
+
+    def _tone(self, out):
+        """Mono tone for one block into out."""
+        pool = self.pool
+        phase, tmp = pool.get("phase"), pool.get("tmp")
+        if self.timbre == "down":
+            # Descending pulse: 40% downward sweep over the cue (or 2 s when sustained)
+            span = (self.env.n_total or 2 * self.fs)
+            sweep = -0.4 * self.freq / span
+            n0 = self.env.n % span
+            self.osc.phase(self.freq * (1.0 - 0.4 * n0 / span), out, sweep=sweep)
+            np.sin(out, out=out)
+            self.sub_osc.sine(0.25 * self.freq, tmp)
+            self.pulse_osc.sine(3.0, phase)
+            phase *= 0.5
+            phase += 0.5
+            tmp *= phase
+            tmp *= 0.6
+            out += tmp
+            out *= 0.4
+            return out
+        harmonics, level = TIMBRES[self.timbre]
+        self.osc.phase(self.freq, phase)
+        np.sin(phase, out=out)
+        for h, amp in harmonics[1:]:
+            np.multiply(phase, float(h), out=tmp)
+            np.sin(tmp, out=tmp)
+            tmp *= amp
+            out += tmp
+        out *= level
+        return out
+
+    def render(self, mix):
+        """Add this voice's next block to the (block, 2) stereo mix."""
+        if self.done:
+            return mix
+        pool = self.pool
+        mono, tmp, tmp2 = pool.get("mono"), pool.get("tmp"), pool.get("tmp2")
+        self._tone(mono)
+        if self.trem_rate > 0:
+            self.lfo.sine(self.trem_rate, tmp)
+            tmp *= 0.5
+            tmp += 0.5
+            mono *= tmp
+        mono *= self.gain
+        if self.lowpass is not None:
+            self.lowpass.process(mono, mono)
+            self.echo.process(mono, int(0.08 * self.fs), tmp)
+            tmp *= 0.3
+            mono += tmp
+            mono *= 0.8
+        self.env.apply(mono, tmp, tmp2)
+
+        delayed = pool.get("delayed")
+        self.itd.process(mono, self.delay, delayed)
+        left = delayed if self.delay_left else mono
+        right = mono if self.delay_left else delayed
+        np.multiply(left, self.left_gain, out=tmp)
+        mix[:, 0] += tmp
+        np.multiply(right, self.right_gain, out=tmp)
+        mix[:, 1] += tmp
+        return mix
+
+
+class BlockRenderer:
+    """
+    Mixes the active voices block by block with a smoothed peak limiter.
+    set_sectors() keeps existing voices (and their phase / filter state) for
+    sectors that stay occupied, so parameter updates do not click.
+    """
+
+    def __init__(self, fs=48000, block=BLOCK, limit_db=-3.0, release=0.05):
+        self.fs = fs
+        self.block = block
+        self.pool = BufferPool(block)
+        self.voices = {}
+        self.limit = 10 ** (limit_db / 20.0)
+        self.release = release            # max limiter gain recovery per block
+        self.gain = 1.0
+        self.ramp = np.arange(block, dtype=np.float32) / block
+
+    def add_voice(self, sector, r, az, el=0.0, dur=None):
+        voice = CueVoice(sector, r, az, el, self.fs, self.block, self.pool, dur=dur)
+        self.voices[sector] = voice
+        return voice
+
+    def set_sectors(self, picked, dur=None):
+        """picked: sector -> (r, az, el), as returned by nearest_by_sector."""
+        for sector in list(self.voices):
+            if sector not in picked:
+                del self.voices[sector]
+        for sector, (r, az, el) in picked.items():
+            voice = self.voices.get(sector)
+            if voice is None or voice.done:
+                self.add_voice(sector, r, az, el, dur=dur)
+            else:
+                voice.set_params(r, az, el)
+
+    @property
+    def active(self):
+        return any(not v.done for v in self.voices.values())
+
+    def render(self, out=None):
+        """Render the next (block, 2) float32 block into out (a pooled buffer if None)."""
+        if out is None:
+            out = self.pool.get("out", 2)
+        out[...] = 0.0
+        for voice in self.voices.values():
+            voice.render(out)
+
+        # Limiter: gain ramps from the previous block's value to this block's target
+        absbuf = self.pool.get("abs", 2)
+        np.abs(out, out=absbuf)
+        peak = float(absbuf.max())
+        target = min(1.0, self.limit / peak) if peak > 0 else 1.0
+        gain = target if target < self.gain else min(target, self.gain + self.release)
+        if gain != 1.0 or self.gain != 1.0:
+            g = self.pool.get("gain")
+            np.multiply(self.ramp, gain - self.gain, out=g)
+            g += self.gain
+            out[:, 0] *= g
+            out[:, 1] *= g
+        self.gain = gain
+        return out
+
+
+def render_sectors(picked, dur=2.0, fs=48000, block=BLOCK, out=None):
+    """
+    Render all sectors of `picked` simultaneously for `dur` seconds (the
+    streaming counterpart of the "all" mode). out: optional (n, 2) float32
+    buffer with n >= dur * fs; the rendered part is returned.
+    """
+    renderer = BlockRenderer(fs, block)
+    renderer.set_sectors(picked, dur=dur)
+    n = int(dur * fs)
+    n_blocks = -(-n // block)
+    if out is None:
+        out = np.zeros((n_blocks * block, 2), dtype=np.float32)
+    for i in range(n_blocks):
+        start = i * block
+        if start + block <= len(out):
+            renderer.render(out[start:start + block])
+        else:
+            tail = renderer.render()
+            out[start:] = tail[:len(out) - start]
+    return out[:n]
+
+
+# ---------- allocation check ----------
+def steady_state_allocations(render_block, warmup=8, blocks=200):
+    """
+    Peak bytes allocated while calling render_block() `blocks` times after
+    `warmup` calls, as seen by tracemalloc (NumPy reports its data buffers
+    there). Transient Python objects (views, floats) add up to a kilobyte or
+    two; any block-sized array is bigger than that once the block is large,
+    so check with a block of a few thousand samples.
+    """
+    for _ in range(warmup):
+        render_block()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in range(blocks):
+            render_block()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - base
+
+
+def main():
+    import argparse
+    import sys
+    import time
+    parser = argparse.ArgumentParser(description='Block renderer allocation check / timing')
+    parser.add_argument('--check', action='store_true', help='Fail if steady-state rendering allocates')
+    parser.add_argument('--block', type=int, default=BLOCK)
+    parser.add_argument('--fs', type=int, default=48000)
+    args = parser.parse_args()
+
+    picked = {"FL": (1.2, 0.6, 0.0), "FR": (2.0, -0.4, 0.0), "BL": (1.5, 2.2, 0.0),
+              "BR": (3.0, -2.5, 0.0), "UP": (1.0, 0.0, 1.0), "DOWN": (1.8, 0.0, -0.8)}
+    renderer = BlockRenderer(args.fs, args.block)
+    renderer.set_sectors(picked)
+    out = np.zeros((args.block, 2), dtype=np.float32)
+
+    n = 500
+    t0 = time.perf_counter()
+    for _ in range(n):
+        renderer.render(out)
+    per_block = (time.perf_counter() - t0) / n
+    budget = args.block / args.fs
+    print(f"6 voices, block {args.block}: {1e3 * per_block:.3f} ms per block "
+          f"({100 * per_block / budget:.1f}% of the {1e3 * budget:.1f} ms real-time budget)")
+
+    # Allocation check with a large block: one float32 temporary would be 16 KB
+    check_block = 4096
+    renderer = BlockRenderer(args.fs, check_block)
+    renderer.set_sectors(picked)
+    out = np.zeros((check_block, 2), dtype=np.float32)
+    grown = steady_state_allocations(lambda: renderer.render(out))
+    limit = check_block * 4 // 2
+    print(f"steady-state peak allocation at block {check_block}: {grown} bytes (limit {limit})")
+    if args.check and grown >= limit:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
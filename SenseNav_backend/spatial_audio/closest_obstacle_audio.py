@@ -1,9 +1,95 @@
+import logging
+import math
+from functools import lru_cache
+
 import numpy as np
-from scipy.signal import resample
-from scipy.io.wavfile import write
-import sounddevice as sd
+
+from ray_grid import intrinsics_tuple, ray_grid
+
+# Cue descriptions go to the "sensenav.audio" logger: per-sector detail at
+# DEBUG, mode banners at INFO (sampled when utils/log.py is set up, since the
+# server renders every frame). Unconfigured, nothing reaches stdout.
+log = logging.getLogger("sensenav.audio")
+_PER_FRAME = {"sample_every": 50}
+
+# ---------- lazy optional dependencies ----------
+# scipy.signal and sounddevice (PortAudio) are only needed to render / play
+# cues, so the geometry and cue-mapping paths import with NumPy alone.
+# Each module is imported on first use and cached afterwards.
+@lru_cache(maxsize=None)
+def _scipy_signal():
+    from scipy import signal
+    return signal
+
+@lru_cache(maxsize=None)
+def _sounddevice():
+    import sounddevice
+    return sounddevice
+
+@lru_cache(maxsize=64)
+def _butter(order, cutoff, btype, fs):
+    """Butterworth (b, a) coefficients, designed once per filter spec."""
+    return _scipy_signal().butter(order, cutoff, btype=btype, fs=fs)
+
+def _filtfilt(b, a, sig):
+    # scipy filters in float64; come back to the float32 audio dtype right away
+    return _scipy_signal().filtfilt(b, a, sig).astype(np.float32)
+
+# ---------- render quality ----------
+# Process-wide synthesis quality, lowered under load by utils/quality.py:
+# overtones kept per tone (None = all, 0 = pure sine) and whether the
+# chorus / vibrato / darken effects run.
+_RENDER_QUALITY = {"harmonics": None, "effects": True}
+
+def set_render_quality(harmonics=None, effects=True):
+    _RENDER_QUALITY["harmonics"] = harmonics
+    _RENDER_QUALITY["effects"] = bool(effects)
+
+def _overtones(seq):
+    """The overtones of a tone recipe allowed at the current quality."""
+    n = _RENDER_QUALITY["harmonics"]
+    return seq if n is None else seq[:n]
+
+def play_audio(buf, fs):
+    """Play a buffer on the default output device and block until done."""
+    sd = _sounddevice()
+    sd.play(buf, fs); sd.wait()
 
 # ---------- geometry ----------
+# Fixed sector order; columnar results and binary payloads index into it.
+SECTORS = ("FL", "FR", "BL", "BR", "UP", "DOWN")
+
+# 25° elevation deadband for "level" sectors
+EL_BAND = np.deg2rad(25)
+
+def sector_minima(P):
+    """
+    Nearest point of an (n, 3) array per sector, in SECTORS order: its row
+    index (-1 = empty sector; ties go to the lowest row) and (d, az, el)
+    (NaN for empty sectors). nearest_by_sector and the sharded version in
+    sharded_sectors.py both reduce through this, so they agree bit for bit.
+    """
+    d  = np.linalg.norm(P, axis=1)
+    az = np.arctan2(P[:,1], P[:,0])                       # + left, - right
+    el = np.arctan2(P[:,2], np.hypot(P[:,0], P[:,1]))     # + up, - down
+
+    front, back = P[:,0] > 0, P[:,0] <= 0
+    left, right = az >= 0, az < 0
+    level = np.abs(el) < EL_BAND
+    masks = (front & left & level, front & right & level,
+             back & left & level, back & right & level,
+             el >= EL_BAND, el <= -EL_BAND)
+
+    idx = np.full(len(SECTORS), -1, dtype=np.int64)
+    rae = np.full((len(SECTORS), 3), np.nan, dtype=np.result_type(d, az, el))
+    for k, mask in enumerate(masks):
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            sel = rows[np.argmin(d[rows])]
+            idx[k] = sel
+            rae[k] = d[sel], az[sel], el[sel]
+    return idx, rae
+
 def nearest_by_sector(points, ignore_behind=False):
     """
     Nearest obstacles by sector:
@@ -14,36 +100,15 @@ def nearest_by_sector(points, ignore_behind=False):
     if points.size == 0:
         return {}
 
-    P = points.copy()
+    P = points
     if ignore_behind:
         P = P[P[:,0] > 0]
 
     if P.size == 0:
         return {}
 
-    d  = np.linalg.norm(P, axis=1)
-    az = np.arctan2(P[:,1], P[:,0])                       # + left, - right
-    el = np.arctan2(P[:,2], np.hypot(P[:,0], P[:,1]))     # + up, - down
-
-    # 25° elevation deadband for "level" sectors
-    el_band = np.deg2rad(25)
-
-    sectors = {
-        "FL": lambda a,e: (P[:,0] > 0) & (a >=  0) & (np.abs(e) < el_band),
-        "FR": lambda a,e: (P[:,0] > 0) & (a <   0) & (np.abs(e) < el_band),
-        "BL": lambda a,e: (P[:,0] <= 0) & (a >= 0) & (np.abs(e) < el_band),
-        "BR": lambda a,e: (P[:,0] <= 0) & (a <  0) & (np.abs(e) < el_band),
-        "UP":   lambda a,e: (e >=  el_band),
-        "DOWN": lambda a,e: (e <= -el_band),
-    }
-
-    out = {}
-    for name, mask_fn in sectors.items():
-        mask = mask_fn(az, el)
-        if np.any(mask):
-            sel = np.where(mask)[0][np.argmin(d[mask])]
-            out[name] = (d[sel], az[sel], el[sel])
-    return out
+    idx, rae = sector_minima(P)
+    return {name: (rae[k, 0], rae[k, 1], rae[k, 2]) for k, name in enumerate(SECTORS) if idx[k] >= 0}
 
 # Legacy function for backward compatibility
 def nearest_obstacle(points):
@@ -65,112 +130,180 @@ def generate_boundary_points(bbox, depth_value, num_points=16):
         num_points: number of points to generate around the boundary
     
     Returns:
-        numpy array of 3D points ONLY on the boundary surface
+        numpy array of (pixel x, pixel y, depth) rows ONLY on the boundary,
+        clockwise from the top-left corner
     """
     if not bbox or bbox['width'] <= 0 or bbox['height'] <= 0:
         return np.array([])
     
     x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
     
-    # Generate points ONLY on the boundary perimeter (surface area)
-    points = []
-    
-    # Calculate points per edge (ensure we have at least 4 points total)
-    points_per_edge = max(1, num_points // 4)
-    
-    # Top edge (y = y, x varies from x to x+w)
-    for i in range(points_per_edge):
-        if points_per_edge == 1:
-            px = x + w/2  # Center of top edge
-        else:
-            px = x + (w * i / (points_per_edge - 1))
-        points.append([px, y, depth_value])
-    
-    # Right edge (x = x+w, y varies from y to y+h)
-    for i in range(points_per_edge):
-        if points_per_edge == 1:
-            py = y + h/2  # Center of right edge
-        else:
-            py = y + (h * i / (points_per_edge - 1))
-        points.append([x + w, py, depth_value])
-    
-    # Bottom edge (y = y+h, x varies from x+w to x)
-    for i in range(points_per_edge):
-        if points_per_edge == 1:
-            px = x + w/2  # Center of bottom edge
-        else:
-            px = x + w - (w * i / (points_per_edge - 1))
-        points.append([px, y + h, depth_value])
-    
-    # Left edge (x = x, y varies from y+h to y)
-    for i in range(points_per_edge):
-        if points_per_edge == 1:
-            py = y + h/2  # Center of left edge
-        else:
-            py = y + h - (h * i / (points_per_edge - 1))
-        points.append([x, py, depth_value])
-    
-    return np.array(points)
+    # Points per edge (at least one: the edge center)
+    k = max(1, num_points // 4)
+    f = np.linspace(0.0, 1.0, k) if k > 1 else np.array([0.5])
+    px = np.concatenate([x + w*f, np.full(k, x + w), x + w - w*f, np.full(k, x)])
+    py = np.concatenate([np.full(k, y), y + h*f, np.full(k, y + h), y + h - h*f])
+    return np.column_stack([px, py, np.full(4*k, depth_value)])
+
+def sample_bbox_pixels(bbox, image_width, image_height, mask=None, spacing=8.0,
+                       min_perimeter=16, max_perimeter=128, max_interior=128):
+    """
+    Pixel samples (u, v) over an obstacle: its outline plus an interior grid.
+    The count adapts to the box size (one sample every `spacing` pixels,
+    within the given limits). With a mask (bool array over the bbox, any
+    resolution), the outline is the mask edge and interior samples are
+    restricted to the mask.
 
-def process_boundary_obstacle(bbox, depth_value, image_width, image_height, focal_length=None):
+    Returns:
+        (u, v) int arrays of pixel coordinates inside the image
+    """
+    x, y, w, h = float(bbox['x']), float(bbox['y']), float(bbox['width']), float(bbox['height'])
+    n_perim = int(np.clip(2 * (w + h) / spacing, min_perimeter, max_perimeter))
+    step = max(spacing, np.sqrt(w * h / max_interior))
+
+    if mask is None:
+        # Evenly spaced along the rectangle outline
+        t = np.linspace(0.0, 2 * (w + h), n_perim, endpoint=False)
+        u = np.select([t < w, t < w + h, t < 2*w + h], [x + t, x + w, x + w - (t - w - h)], x)
+        v = np.select([t < w, t < w + h, t < 2*w + h], [y, y + (t - w), y + h], y + h - (t - 2*w - h))
+        gu = np.arange(x + step / 2, x + w, step)
+        gv = np.arange(y + step / 2, y + h, step)
+        iu, iv = np.meshgrid(gu, gv)
+        u = np.concatenate([u, iu.ravel()])
+        v = np.concatenate([v, iv.ravel()])
+    else:
+        mask = np.asarray(mask, dtype=bool)
+        mh, mw = mask.shape
+        # Edge cells: inside the mask with at least one 4-neighbour outside
+        padded = np.pad(mask, 1)
+        interior = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+        er, ec = np.nonzero(mask & ~interior)
+        if len(er) > n_perim:
+            keep = np.linspace(0, len(er) - 1, n_perim).astype(np.intp)
+            er, ec = er[keep], ec[keep]
+        # Interior grid in mask cells
+        sr, sc = max(1.0, step * mh / h), max(1.0, step * mw / w)
+        gr = np.arange(sr / 2, mh, sr).astype(np.intp)
+        gc = np.arange(sc / 2, mw, sc).astype(np.intp)
+        ir, ic = np.meshgrid(gr, gc, indexing="ij")
+        ir, ic = ir.ravel(), ic.ravel()
+        inside = mask[ir, ic]
+        rows = np.concatenate([er, ir[inside]])
+        cols = np.concatenate([ec, ic[inside]])
+        u = x + (cols + 0.5) * (w / mw)
+        v = y + (rows + 0.5) * (h / mh)
+
+    u = np.clip(np.round(u), 0, image_width - 1).astype(np.intp)
+    v = np.clip(np.round(v), 0, image_height - 1).astype(np.intp)
+    return u, v
+
+@lru_cache(maxsize=16)
+def _boundary_result(bbox, image_size, K, depth_value, roi, mask, fs, dur, quality):
+    """
+    Cached body of process_boundary_obstacle. bbox / image_size / K are
+    tuples; roi and mask are (bytes, shape, dtype) or None so that the
+    arguments hash. quality (the render quality the layers were made at)
+    only keys the cache.
+    """
+    x, y, w, h = bbox
+    width, height = image_size
+    box = {'x': x, 'y': y, 'width': w, 'height': h}
+    mask_arr = None if mask is None else np.frombuffer(mask[0], dtype=mask[2]).reshape(mask[1]).astype(bool)
+    u, v = sample_bbox_pixels(box, width, height, mask=mask_arr)
+
+    depth = np.full(len(u), float(depth_value), dtype=np.float32)
+    source = "constant"
+    if roi is not None:
+        roi_arr = np.frombuffer(roi[0], dtype=roi[2]).reshape(roi[1])
+        rh, rw = roi_arr.shape
+        # ROI cells covering each sample (the ROI may be decimated relative to the bbox)
+        r = np.clip(((v - y) * rh / h).astype(np.intp), 0, rh - 1)
+        c = np.clip(((u - x) * rw / w).astype(np.intp), 0, rw - 1)
+        sampled = roi_arr[r, c].astype(np.float32)
+        valid = np.isfinite(sampled) & (sampled > 0)
+        if np.any(valid):
+            u, v, depth = u[valid], v[valid], sampled[valid]
+            source = "roi"
+
+    # Backproject through the intrinsics into the sector frame (x forward, y left, z up)
+    rays = ray_grid(K, width, height)
+    points = rays[v, u] * depth[:, None]
+    points.setflags(write=False)
+
+    obstacles = {name: tuple(float(c) for c in rae)
+                 for name, rae in nearest_by_sector(points, ignore_behind=False).items()}
+    if not obstacles:
+        return {"obstacles": {}, "targets": [], "message": "No obstacles detected in boundary surface"}
+
+    # Generate spatial audio layers from the sampled obstacle surface
+    layers = spatial_layers_from_pointcloud(points, fs=fs, dur=dur, play=False)
+    if layers is not None:
+        layers.setflags(write=False)
+
+    # Choose targets for audio generation from boundary surface
+    targets = choose_targets(obstacles, max_targets=3)
+
+    return {
+        "obstacles": obstacles,
+        "targets": targets,
+        "layers": layers,
+        "fs": fs,
+        "boundary_surface_points": len(points),
+        "depth_source": source,
+        "message": f"Processed {len(points)} obstacle surface points ({source} depth)"
+    }
+
+def process_boundary_obstacle(bbox, depth_value, image_width, image_height, focal_length=None, play=True,
+                              depth_roi=None, mask=None, K=None, fs=48000, dur=8.0):
     """
     Process obstacle boundary data and return spatial audio information.
-    Audio will ONLY come from the boundary surface area points.
+    Audio comes from points sampled on the obstacle outline and interior,
+    backprojected through the camera intrinsics.
     
     Args:
         bbox: dict with 'x', 'y', 'width', 'height' (in pixels)
-        depth_value: depth value for the obstacle
+        depth_value: depth value for the obstacle (meters, z-depth); used for
+            every sample without a depth ROI, and where the ROI is invalid
         image_width: width of the image
         image_height: height of the image
-        focal_length: focal length for 3D projection (optional)
+        focal_length: focal length in pixels (optional, used when K is None)
+        play: also play the rendered layers on this machine
+        depth_roi: optional (h, w) metric z-depth over the bbox, any
+            resolution (0 / non-finite = invalid)
+        mask: optional (h, w) bool obstacle mask over the bbox
+        K: optional 3x3 intrinsics or (fx, fy, cx, cy)
     
     Returns:
-        dict with spatial audio information ONLY for boundary surface points
+        dict with spatial audio information for the sampled obstacle surface;
+        "layers" is (n, 2) stereo at "fs" Hz (the caller's fs, which the API
+        lowers at degraded quality levels). Results are cached per (bbox,
+        depth, ROI, mask, intrinsics).
     """
     if not bbox or bbox['width'] <= 0 or bbox['height'] <= 0:
         return {"obstacles": {}, "targets": [], "message": "Invalid bounding box"}
     
-    # Generate boundary surface points ONLY
-    boundary_points = generate_boundary_points(bbox, depth_value, num_points=16)
-    
-    if boundary_points.size == 0:
-        return {"obstacles": {}, "targets": [], "message": "No boundary surface points generated"}
-    
-    # Convert pixel coordinates to 3D coordinates
-    # Assuming camera is at origin looking down +Z axis
-    if focal_length is None:
-        focal_length = max(image_width, image_height)  # Simple focal length estimate
-    
-    # Convert to 3D coordinates (camera coordinate system)
-    # X: left-right, Y: up-down, Z: depth
-    cx, cy = image_width / 2, image_height / 2
-    
-    # Convert pixel coordinates to normalized coordinates, then to 3D
-    # ONLY using boundary surface points
-    normalized_points = boundary_points.copy()
-    normalized_points[:, 0] = (boundary_points[:, 0] - cx) / focal_length  # X
-    normalized_points[:, 1] = (boundary_points[:, 1] - cy) / focal_length  # Y
-    normalized_points[:, 2] = depth_value  # Z (depth)
-    
-    # Find nearest obstacles by sector using ONLY boundary surface points
-    obstacles = nearest_by_sector(normalized_points, ignore_behind=False)
-    
-    if not obstacles:
-        return {"obstacles": {}, "targets": [], "message": "No obstacles detected in boundary surface"}
-    
-    # Generate spatial audio layers from boundary surface points ONLY
-    layers = spatial_layers_from_pointcloud(normalized_points)
-    
-    # Choose targets for audio generation from boundary surface
-    targets = choose_targets(obstacles, max_targets=3)
-    
-    return {
-        "obstacles": obstacles,
-        "targets": targets,
-        "layers": layers,
-        "boundary_surface_points": len(boundary_points),
-        "message": f"Processed {len(boundary_points)} boundary surface points ONLY"
-    }
+    if K is None:
+        if focal_length is None:
+            focal_length = max(image_width, image_height)  # Simple focal length estimate
+        K = (focal_length, focal_length, image_width / 2, image_height / 2)
+
+    def key(arr):
+        if arr is None:
+            return None
+        arr = np.ascontiguousarray(arr)
+        return arr.tobytes(), arr.shape, arr.dtype.str
+
+    result = _boundary_result(
+        tuple(float(bbox[k]) for k in ('x', 'y', 'width', 'height')),
+        (int(image_width), int(image_height)), intrinsics_tuple(K), float(depth_value),
+        key(depth_roi), key(None if mask is None else np.asarray(mask, dtype=bool)), fs, dur,
+        (_RENDER_QUALITY["harmonics"], _RENDER_QUALITY["effects"]))
+    
+    if play and result.get("layers") is not None:
+        log.info("Playing 360° spatial cue…")
+        play_audio(result["layers"], fs)
+    # Shallow copy: callers may replace fields (e.g. layers -> list for JSON)
+    return dict(result)
 
 # ---------- cue mapping ----------
 def distance_to_params(r, r_min=0.3, r_max=4.0):
@@ -179,7 +312,13 @@ def distance_to_params(r, r_min=0.3, r_max=4.0):
     rate_hz = np.interp(r, [r_min, r_max], [2.0, 0.5])   # reduced beep rate (less pulsing)
     freq_hz = np.interp(r, [r_min, r_max], [800, 300])   # reduced pitch range
     gain    = np.interp(r, [r_min, r_max], [0.9, 0.4])
-    return rate_hz, freq_hz, gain
+    if np.ndim(r) == 0:
+        # Plain floats for a single obstacle: NumPy float64 scalars would
+        # promote the float32 signals they scale
+        return float(rate_hz), float(freq_hz), float(gain)
+    # np.interp always computes in float64; columns keep the distances' dtype
+    dtype = np.result_type(r, np.float32)
+    return rate_hz.astype(dtype, copy=False), freq_hz.astype(dtype, copy=False), gain.astype(dtype, copy=False)
 
 # ---------- simple binaural panner (ILD + ITD) ----------
 def pan_stereo(signal, az, el, fs, head_width=0.18):
@@ -190,41 +329,42 @@ def pan_stereo(signal, az, el, fs, head_width=0.18):
     """
     # Improved Interaural Level Difference (ILD)
     # Convert azimuth to pan value: negative az = right, positive az = left
-    pan = -np.sin(az)  # Flip sign: negative az (right) -> positive pan (right channel)
+    # Gains are plain floats so the float32 signal stays float32
+    az, el = float(az), float(el)
+    signal = np.asarray(signal, dtype=np.float32)
+    pan = -math.sin(az)  # Flip sign: negative az (right) -> positive pan (right channel)
     
     # Equal power panning: pan = -1 (left), pan = 0 (center), pan = 1 (right)
-    theta = (pan + 1.0) * (np.pi / 4.0)  # Map [-1,1] to [0, pi/2]
-    left_gain = np.cos(theta)   # Higher when pan < 0 (left)
-    right_gain = np.sin(theta)  # Higher when pan > 0 (right)
+    theta = (pan + 1.0) * (math.pi / 4.0)  # Map [-1,1] to [0, pi/2]
+    left_gain = math.cos(theta)   # Higher when pan < 0 (left)
+    right_gain = math.sin(theta)  # Higher when pan > 0 (right)
 
     # Elevation effects
-    elevation_factor = np.cos(el)  # Reduces volume for extreme up/down
+    elevation_factor = math.cos(el)  # Reduces volume for extreme up/down
     
     # Frequency filtering for elevation cues
     if el > 0.1:  # Above (positive elevation)
         # Gentler high-pass filter effect (less harsh)
-        from scipy.signal import butter, filtfilt
-        b, a = butter(2, 1500, btype='high', fs=fs)  # Lower cutoff, gentler slope
-        signal = filtfilt(b, a, signal)
-        elevation_factor *= (1.0 + 0.2 * np.sin(el))  # Reduced volume boost
+        b, a = _butter(2, 1500, 'high', fs)  # Lower cutoff, gentler slope
+        signal = _filtfilt(b, a, signal)
+        elevation_factor *= (1.0 + 0.2 * math.sin(el))  # Reduced volume boost
     elif el < -0.1:  # Below (negative elevation)
         # Aggressive low-pass + bass boost for "underground" feel
-        from scipy.signal import butter, filtfilt
         # Very low cutoff for muffled effect
-        b_low, a_low = butter(4, 800, btype='low', fs=fs)
-        signal = filtfilt(b_low, a_low, signal)
+        b_low, a_low = _butter(4, 800, 'low', fs)
+        signal = _filtfilt(b_low, a_low, signal)
         
         # Add bass resonance for "underground" rumble
-        b_bass, a_bass = butter(2, [100, 300], btype='band', fs=fs)
-        bass_signal = filtfilt(b_bass, a_bass, signal)
+        b_bass, a_bass = _butter(2, (100, 300), 'band', fs)
+        bass_signal = _filtfilt(b_bass, a_bass, signal)
         signal = 0.6 * signal + 0.4 * bass_signal  # Mix in bass
         
-        elevation_factor *= (0.4 + 0.2 * np.cos(abs(el)))  # Much quieter
+        elevation_factor *= (0.4 + 0.2 * math.cos(abs(el)))  # Much quieter
 
     # Interaural Time Difference (ITD)
     c = 343.0
-    itd = head_width * np.sin(az) / c  # seconds
-    delay_samples = int(np.round(abs(itd) * fs))
+    itd = head_width * math.sin(az) / c  # seconds
+    delay_samples = int(round(abs(itd) * fs))
 
     # Apply gains with elevation factor
     left = left_gain * signal * elevation_factor
@@ -240,112 +380,126 @@ def pan_stereo(signal, az, el, fs, head_width=0.18):
 
     stereo = np.stack([left, right], axis=1)
     # normalize to avoid clipping
-    m = np.max(np.abs(stereo))
+    m = float(np.max(np.abs(stereo)))
     if m > 1e-6:
         stereo /= (m * 1.05)
     return stereo
 
 # ---------- tone generator ----------
+# Audio is float32 end to end. Only phases are accumulated in float64, and
+# wrapped to one period before the cast, so long cues keep full precision.
+def _phase(freq, n, fs):
+    """float32 phase 2*pi*freq*t of n samples, wrapped to [0, 2*pi)."""
+    cycles = np.arange(n) * (float(freq) / fs)
+    cycles -= np.floor(cycles)
+    return (2 * np.pi * cycles).astype(np.float32)
+
+def _ramp(start, stop, n):
+    return np.linspace(start, stop, n, dtype=np.float32)
+
 def make_beep(freq=800, dur=0.4, fs=48000, rise_fall=0.02):
-    t = np.linspace(0, dur, int(fs*dur), endpoint=False)
-    s = np.sin(2*np.pi*freq*t)
+    s = np.sin(_phase(freq, int(fs*dur), fs))
     # apply short attack/release to avoid clicks
     rf = int(fs*rise_fall)
-    env = np.ones_like(s)
-    env[:rf] = np.linspace(0, 1, rf)
-    env[-rf:] = np.linspace(1, 0, rf)
-    return (s * env).astype(np.float32)
+    s[:rf] *= _ramp(0, 1, rf)
+    s[-rf:] *= _ramp(1, 0, rf)
+    return s
 
 # ---------- tone generators by sector ----------
 def tone_left(freq, dur=0.5, fs=48000):
     """Left sector tone - warm sawtooth wave"""
-    t = np.linspace(0, dur, int(fs*dur), endpoint=False)
+    phase = _phase(freq, int(fs*dur), fs)
     # Sawtooth-like wave with warm harmonics
-    tone = np.sin(2*np.pi*freq*t)
-    for h in range(2, 4):  # reduced harmonics for cleaner sound
-        tone += (0.2/h) * np.sin(2*np.pi*freq*h*t)  # reduced harmonic strength
+    tone = np.sin(phase)
+    for h in _overtones(range(2, 4)):  # reduced harmonics for cleaner sound
+        tone += (0.2/h) * np.sin(phase * h)  # reduced harmonic strength
     tone *= 0.5  # slightly louder
     return apply_fade(tone, fs)
 
 def tone_right(freq, dur=0.5, fs=48000):
     """Right sector tone - square wave (digital/metallic)"""
-    t = np.linspace(0, dur, int(fs*dur), endpoint=False)
+    phase = _phase(freq, int(fs*dur), fs)
     # Square wave approximation with odd harmonics
-    tone = np.sin(2*np.pi*freq*t)
-    for h in range(3, 6, 2):  # reduced odd harmonics for cleaner sound
-        tone += (0.25/h) * np.sin(2*np.pi*freq*h*t)  # reduced harmonic strength
+    tone = np.sin(phase)
+    for h in _overtones(range(3, 6, 2)):  # reduced odd harmonics for cleaner sound
+        tone += (0.25/h) * np.sin(phase * h)  # reduced harmonic strength
     tone *= 0.4  # slightly louder
     return apply_fade(tone, fs)
 
 def tone_up(freq, dur=0.5, fs=48000):
     """Up sector tone - constant frequency with sparkly harmonics"""
-    t = np.linspace(0, dur, int(fs*dur), endpoint=False)
     # Constant frequency (no sweep)
-    phase = 2*np.pi * freq * t
+    phase = _phase(freq, int(fs*dur), fs)
     tone = np.sin(phase)
     # Add sparkly harmonics
-    tone += 0.2 * np.sin(phase * 2) + 0.1 * np.sin(phase * 4)
+    for h, amp in _overtones(((2, 0.2), (4, 0.1))):
+        tone += amp * np.sin(phase * h)
     tone *= 0.5
     return apply_fade(tone, fs)
 
 def tone_down(freq, dur=0.5, fs=48000):
     """Down sector tone - descending pulse with sub-bass"""
-    t = np.linspace(0, dur, int(fs*dur), endpoint=False)
-    # Frequency sweep downward
-    freq_sweep = freq * (1 - 0.4 * t / dur)  # 40% frequency decrease
-    phase = 2*np.pi * np.cumsum(freq_sweep) / fs
-    tone = np.sin(phase)
+    n = int(fs*dur)
+    # Frequency sweep downward: 40% decrease, accumulated in float64 cycles
+    cycles = np.cumsum(freq * (1 - 0.4 * np.arange(n) / (fs * dur))) / fs
+    cycles -= np.floor(cycles)
+    tone = np.sin((2*np.pi*cycles).astype(np.float32))
     # Add deep sub-bass pulse
     pulse_rate = 3  # Hz
-    pulse = 0.5 + 0.5 * np.sin(2*np.pi*pulse_rate*t)
-    sub_bass = 0.6 * np.sin(2*np.pi*(freq*0.25)*t) * pulse
-    tone = tone + sub_bass
+    pulse = np.sin(_phase(pulse_rate, n, fs))
+    pulse *= 0.5
+    pulse += 0.5
+    sub_bass = np.sin(_phase(freq*0.25, n, fs))
+    sub_bass *= pulse
+    sub_bass *= 0.6
+    tone += sub_bass
     tone *= 0.4
     return apply_fade(tone, fs)
 
 def apply_fade(tone, fs, fade_dur=0.05):
-    """Apply fade in/out to avoid clicks"""
+    """Apply fade in/out to avoid clicks (in place on float32 input)"""
+    tone = np.asarray(tone, dtype=np.float32)
     fade_samples = int(fs * fade_dur)
-    fade_in = np.linspace(0, 1, fade_samples)
-    fade_out = np.linspace(1, 0, fade_samples)
-    
-    tone[:fade_samples] *= fade_in
-    tone[-fade_samples:] *= fade_out
-    
-    return tone.astype(np.float32)
+    tone[:fade_samples] *= _ramp(0, 1, fade_samples)
+    tone[-fade_samples:] *= _ramp(1, 0, fade_samples)
+    return tone
 
 def tremolo(signal, fs, rate):
     """Apply tremolo modulation"""
-    t = np.linspace(0, len(signal)/fs, len(signal), endpoint=False)
-    mod = 0.5 + 0.5 * np.sin(2*np.pi*rate*t)
+    mod = np.sin(_phase(rate, len(signal), fs))
+    mod *= 0.5
+    mod += 0.5
     return signal * mod
 
 def darken(sig, fs, cutoff=1200):
     """Darken tone for behind sectors with reverb-like effect"""
-    from scipy.signal import butter, filtfilt
+    if not _RENDER_QUALITY["effects"]:
+        return sig * 0.8
     # Low-pass filter
-    b, a = butter(2, cutoff, btype='low', fs=fs)
-    filtered = filtfilt(b, a, sig)
+    b, a = _butter(2, cutoff, 'low', fs)
+    filtered = _filtfilt(b, a, sig)
     
     # Add subtle reverb/echo effect for "behind" feeling
     delay_samples = int(0.08 * fs)  # 80ms delay
-    echo = np.zeros_like(filtered)
-    echo[delay_samples:] = filtered[:-delay_samples] * 0.3
-    
-    # Mix original filtered + echo
-    result = filtered + echo
+    result = filtered
+    result[delay_samples:] += filtered[:-delay_samples] * 0.3
     return result * 0.8  # Reduce overall volume
 
 def add_vibrato(sig, fs, rate=4.5, depth=0.15):
     """Add vibrato effect for more distinction"""
-    t = np.linspace(0, len(sig)/fs, len(sig), endpoint=False)
-    vibrato_mod = 1 + depth * np.sin(2*np.pi*rate*t)
+    if not _RENDER_QUALITY["effects"]:
+        return sig
+    vibrato_mod = np.sin(_phase(rate, len(sig), fs))
+    vibrato_mod *= depth
+    vibrato_mod += 1
     
     # Simple vibrato approximation by amplitude modulation
     return sig * vibrato_mod
 
 def add_chorus(sig, fs, delay_ms=15, depth=0.3):
     """Add chorus effect for richer sound"""
+    if not _RENDER_QUALITY["effects"]:
+        return sig
     delay_samples = int(delay_ms * fs / 1000)
     chorus = np.zeros_like(sig)
     
@@ -407,6 +561,42 @@ def obstacle_score(r, az, el):
     elevation_bonus = 0.1 if abs(el) > np.deg2rad(25) else 0.0
     return (1.0 / max(r, 1e-6)) * (0.7 + 0.3*frontal) + elevation_bonus
 
+def obstacle_scores(r, az, el):
+    """Vectorized obstacle_score over arrays of sectors."""
+    r, az, el = np.asarray(r), np.asarray(az), np.asarray(el)
+    frontal = np.maximum(np.cos(az), 0.0)
+    elevation_bonus = np.where(np.abs(el) > np.deg2rad(25), 0.1, 0.0).astype(np.result_type(r, np.float32))
+    return (1.0 / np.maximum(r, 1e-6)) * (0.7 + 0.3*frontal) + elevation_bonus
+
+def analyze_sectors(points, ignore_behind=False, max_targets=3):
+    """
+    Columnar analysis of a point cloud: one array per field, one row per
+    occupied sector (in SECTORS order). Cue parameters and salience are
+    computed once for all sectors; targets are row indices sorted by
+    salience (desc), same order as choose_targets.
+    """
+    picked = nearest_by_sector(points, ignore_behind=ignore_behind)
+    names = list(picked.keys())
+    # Columns stay in the points' float dtype (float32 from the parsers);
+    # the serializers convert at the edge
+    rae = np.array(list(picked.values()), dtype=np.result_type(points, np.float32)).reshape(-1, 3)
+    r, az, el = rae[:, 0], rae[:, 1], rae[:, 2]
+    rate, freq, gain = distance_to_params(r)
+    score = obstacle_scores(r, az, el)
+    targets = np.argsort(-score, kind="stable")[:max(int(max_targets), 0)]
+    return {
+        "sector": names,
+        "sector_index": np.array([SECTORS.index(n) for n in names], dtype=np.uint8),
+        "distance": r,
+        "azimuth": az,
+        "elevation": el,
+        "tremolo_rate": rate,
+        "frequency": freq,
+        "gain": gain,
+        "score": score,
+        "targets": targets,
+    }
+
 def choose_targets(picked, max_targets=3):
     """
     picked: dict sector -> (r, az, el)
@@ -423,10 +613,10 @@ def count_ping(n, fs, gap_ms=120):
     if n <= 1:
         return np.zeros((0,2), dtype=np.float32)
     dur = 0.08; f = 420
-    t = np.linspace(0, dur, int(fs*dur), endpoint=False)
-    sig = 0.2*np.sin(2*np.pi*f*t).astype(np.float32)
-    sig[:int(0.01*fs)] *= np.linspace(0,1,int(0.01*fs))
-    sig[-int(0.02*fs):] *= np.linspace(1,0,int(0.02*fs))
+    sig = np.sin(_phase(f, int(fs*dur), fs))
+    sig *= 0.2
+    sig[:int(0.01*fs)] *= _ramp(0, 1, int(0.01*fs))
+    sig[-int(0.02*fs):] *= _ramp(1, 0, int(0.02*fs))
     stereo = np.stack([sig, sig], axis=1)
     gap = np.zeros((int(fs*gap_ms/1000), 2), dtype=np.float32)
     out = []
@@ -434,7 +624,7 @@ def count_ping(n, fs, gap_ms=120):
         out.append(stereo); out.append(gap)
     return np.concatenate(out, axis=0)
 
-def _sequential_mode_audio(picked, fs, dur, max_targets=3, seg_dur=2.0, gap_ms=300, announce_count=True):
+def _sequential_mode_audio(picked, fs, dur, max_targets=3, seg_dur=2.0, gap_ms=300, announce_count=True, play=True):
     """
     Plays top-K obstacles one-by-one in a short sweep.
     seg_dur = per-obstacle segment length (seconds)
@@ -442,10 +632,11 @@ def _sequential_mode_audio(picked, fs, dur, max_targets=3, seg_dur=2.0, gap_ms=3
     targets = choose_targets(picked, max_targets=max_targets)
     k = len(targets)
     if k == 0:
-        print("No obstacles to announce.")
+        log.info("No obstacles to announce.", extra=_PER_FRAME)
         return
 
-    print(f"🧭 SEQUENTIAL MODE: {k} target(s); {seg_dur*1000:.0f} ms each")
+    log.info("🧭 SEQUENTIAL MODE: %d target(s); %.0f ms each", k, seg_dur * 1000, extra=_PER_FRAME)
+    debug = log.isEnabledFor(logging.DEBUG)
 
     segments = []
     # Optional count preamble
@@ -476,19 +667,30 @@ def _sequential_mode_audio(picked, fs, dur, max_targets=3, seg_dur=2.0, gap_ms=3
         segments.append(stereo)
         segments.append(np.zeros((int(fs*gap_ms/1000), 2), dtype=np.float32))
 
-        print(f"{name:5s} | r={r:.2f}m, az={np.degrees(az):+5.1f}°, el={np.degrees(el):+5.1f}°")
+        if debug:
+            log.debug("%-5s | r=%.2fm, az=%+5.1f°, el=%+5.1f°", name, r, np.degrees(az), np.degrees(el))
 
     sweep = np.concatenate(segments, axis=0)
     peak = np.max(np.abs(sweep))
     if peak > 0.95:
         sweep *= 0.95 / peak
 
-    print("Playing sequential sweep…")
-    sd.play(sweep, fs); sd.wait()
+    if play:
+        log.info("Playing sequential sweep…")
+        play_audio(sweep, fs)
     return sweep
 
 # ---------- 360° spatial audio system ----------
-def spatial_layers_from_pointcloud(points, fs=48000, dur=8.0, ignore_behind=False, mode="priority"):
+SECTOR_DESC = {
+    "FL": "Front-Left (warm sawtooth + vibrato)",
+    "FR": "Front-Right (metallic square + chorus)",
+    "BL": "Back-Left (dark warm + deep vibrato)",
+    "BR": "Back-Right (very dark metallic + long chorus)",
+    "UP": "Above (ascending chirp)",
+    "DOWN": "Below (descending pulse + sub-bass)"
+}
+
+def spatial_layers_from_pointcloud(points, fs=48000, dur=8.0, ignore_behind=False, mode="priority", play=True):
     """Generate spatial audio for detected obstacle sectors.
 
     Modes:
@@ -496,10 +698,13 @@ def spatial_layers_from_pointcloud(points, fs=48000, dur=8.0, ignore_behind=Fals
       - "priority":   focus on the single most critical obstacle (+soft background)
       - "unified":    sequential rhythmic slots for each obstacle (kept for testing)
       - "all":        mix all sectors simultaneously (can be overwhelming)
+
+    The rendered stereo buffer is returned; play=False renders it without
+    playback (headless servers, benchmarks).
     """
     picked = nearest_by_sector(points, ignore_behind=ignore_behind)
     if not picked:
-        print("No obstacles in sectors.")
+        log.info("No obstacles in sectors.", extra=_PER_FRAME)
         return
 
     if mode == "sequential":
@@ -510,15 +715,17 @@ def spatial_layers_from_pointcloud(points, fs=48000, dur=8.0, ignore_behind=Fals
             max_targets=6,   # Allow all sectors to be heard
             seg_dur=2.0,     # 2000 ms per cue
             gap_ms=300,      # 300ms gap
-            announce_count=len(picked) > 1  # Only announce count for multiple
+            announce_count=len(picked) > 1,  # Only announce count for multiple
+            play=play
         )
 
     if mode == "priority" and len(picked) > 1:
-        return _priority_mode_audio(picked, fs, dur)
+        return _priority_mode_audio(picked, fs, dur, play=play)
     elif mode == "unified" and len(picked) > 1:
-        return _unified_mode_audio(picked, fs, dur)
+        return _unified_mode_audio(picked, fs, dur, play=play)
 
     # Single obstacle or explicit "all"
+    debug = log.isEnabledFor(logging.DEBUG)
     stems = []
     for name, (r, az, el) in picked.items():
         rate, f, g = distance_to_params(r)
@@ -545,26 +752,18 @@ def spatial_layers_from_pointcloud(points, fs=48000, dur=8.0, ignore_behind=Fals
         stereo = pan_stereo(sig, az=az, el=0, fs=fs)  # Use az for panning, el handled by tone
         stems.append(stereo)
 
-        # Enhanced sector descriptions
-        sector_desc = {
-            "FL": "Front-Left (warm sawtooth + vibrato)",
-            "FR": "Front-Right (metallic square + chorus)", 
-            "BL": "Back-Left (dark warm + deep vibrato)",
-            "BR": "Back-Right (very dark metallic + long chorus)",
-            "UP": "Above (ascending chirp)",
-            "DOWN": "Below (descending pulse + sub-bass)"
-        }
-        
-        print(f"{name:5s} | r={r:.2f}m az={np.degrees(az):+5.1f}° "
-              f"el={np.degrees(el):+5.1f}° | {sector_desc.get(name, name)}")
-        print(f"      | {f:.0f}Hz, trem {rate:.1f}Hz, gain {g:.2f}")
+        if debug:
+            log.debug("%-5s | r=%.2fm az=%+5.1f° el=%+5.1f° | %s", name, r, np.degrees(az),
+                      np.degrees(el), SECTOR_DESC.get(name, name))
+            log.debug("      | %.0fHz, trem %.1fHz, gain %.2f", f, rate, g)
 
     mix = mix_and_limit(stems)
-    print("Playing 360° spatial cue…")
-    sd.play(mix, fs); sd.wait()
+    if play:
+        log.info("Playing 360° spatial cue…")
+        play_audio(mix, fs)
     return mix
 
-def _priority_mode_audio(picked, fs, dur):
+def _priority_mode_audio(picked, fs, dur, play=True):
     """Priority mode: Focus on the most critical obstacle"""
     # Priority order: closest first, then UP > DOWN > FL > FR > BL > BR
     priority_order = ["UP", "DOWN", "FL", "FR", "BL", "BR"]
@@ -610,28 +809,33 @@ def _priority_mode_audio(picked, fs, dur):
     if other_obstacles:
         # Create a gentle background "presence" tone
         bg_freq = 200  # Low background frequency
-        t = np.linspace(0, dur, int(fs*dur), endpoint=False)
-        bg_tone = background_level * np.sin(2*np.pi*bg_freq*t)
+        n = int(fs*dur)
+        bg_tone = np.sin(_phase(bg_freq, n, fs))
+        bg_tone *= background_level
         
         # Modulate based on number of other obstacles
         mod_rate = len(other_obstacles) * 0.5  # Faster pulse = more obstacles
-        bg_mod = 0.7 + 0.3 * np.sin(2*np.pi*mod_rate*t)
+        bg_mod = np.sin(_phase(mod_rate, n, fs))
+        bg_mod *= 0.3
+        bg_mod += 0.7
         bg_tone *= bg_mod
         
         sig = sig + apply_fade(bg_tone, fs)
     
     stereo = pan_stereo(sig, az=az, el=0, fs=fs)
     
-    print(f"🎯 PRIORITY MODE: Focusing on {primary}")
-    print(f"{primary:5s} | r={r:.2f}m az={np.degrees(az):+5.1f}° el={np.degrees(el):+5.1f}°")
-    if other_obstacles:
-        print(f"      | Background presence: {len(other_obstacles)} other obstacle(s)")
+    log.info("🎯 PRIORITY MODE: Focusing on %s", primary, extra=_PER_FRAME)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%-5s | r=%.2fm az=%+5.1f° el=%+5.1f°", primary, r, np.degrees(az), np.degrees(el))
+        if other_obstacles:
+            log.debug("      | Background presence: %d other obstacle(s)", len(other_obstacles))
     
-    print("Playing priority spatial cue…")
-    sd.play(stereo, fs); sd.wait()
+    if play:
+        log.info("Playing priority spatial cue…")
+        play_audio(stereo, fs)
     return stereo
 
-def _unified_mode_audio(picked, fs, dur):
+def _unified_mode_audio(picked, fs, dur, play=True):
     """Unified mode: Sequential rhythmic pattern of obstacles"""
     obstacle_count = len(picked)
     
@@ -639,7 +843,8 @@ def _unified_mode_audio(picked, fs, dur):
     priority_order = ["UP", "DOWN", "FL", "FR", "BL", "BR"]
     sorted_obstacles = sorted(picked.items(), key=lambda x: (x[1][0], priority_order.index(x[0]) if x[0] in priority_order else 999))
     
-    print(f"🌐 UNIFIED MODE: {obstacle_count} obstacles in rhythmic sequence")
+    log.info("🌐 UNIFIED MODE: %d obstacles in rhythmic sequence", obstacle_count, extra=_PER_FRAME)
+    debug = log.isEnabledFor(logging.DEBUG)
     
     # Create rhythmic pattern: each obstacle gets a time slot
     segment_dur = dur / obstacle_count  # Equal time for each obstacle
@@ -690,11 +895,14 @@ def _unified_mode_audio(picked, fs, dur):
         # Place in unified timeline
         unified_audio[start_sample:end_sample] = stereo_seg
         
-        print(f"{name:5s} | r={r:.2f}m az={np.degrees(az):+5.1f}° | Time: {i*segment_dur:.1f}-{(i+1)*segment_dur:.1f}s")
-    
-    print(f"      | Sequential pattern: {segment_dur:.1f}s per obstacle")
-    print("Playing unified spatial cue…")
-    sd.play(unified_audio, fs); sd.wait()
+        if debug:
+            log.debug("%-5s | r=%.2fm az=%+5.1f° | Time: %.1f-%.1fs", name, r, np.degrees(az),
+                      i * segment_dur, (i + 1) * segment_dur)
+    
+    log.debug("      | Sequential pattern: %.1fs per obstacle", segment_dur)
+    if play:
+        log.info("Playing unified spatial cue…")
+        play_audio(unified_audio, fs)
     return unified_audio
 
 # Legacy function for backward compatibility
@@ -702,25 +910,35 @@ def play_cue_from_pointcloud(points, fs=48000):
     """Legacy single-obstacle audio cue"""
     r, az, el = nearest_obstacle(points)
     if r is None:
-        print("No obstacle ahead.")
+        log.info("No obstacle ahead.")
         return
     
     rate, freq, gain = distance_to_params(r)
-    print(f"Nearest obstacle: {r:.2f}m away")
-    print(f"Direction: {np.degrees(az):.1f}° (azimuth), {np.degrees(el):.1f}° (elevation)")
-    print(f"Audio cue: sustained {freq:.0f}Hz tone, tremolo {rate:.1f}Hz, {gain:.2f} volume")
+    log.info("Nearest obstacle: %.2fm away", r)
+    log.info("Direction: %.1f° (azimuth), %.1f° (elevation)", np.degrees(az), np.degrees(el))
+    log.info("Audio cue: sustained %.0fHz tone, tremolo %.1fHz, %.2f volume", freq, rate, gain)
     
     # Generate sustained tone with tremolo rate based on distance
     mono = sustained_tone(freq, total_dur=3.0, fs=fs, tremolo_rate=rate, elevation=el) * gain
     stereo = pan_stereo(mono, az=az, el=el, fs=fs)
     
-    print("Playing sustained spatial audio cue...")
-    sd.play(stereo, fs)
-    sd.wait()
-    print("Audio cue finished.")
+    log.info("Playing sustained spatial audio cue...")
+    play_audio(stereo, fs)
+    log.info("Audio cue finished.")
 
 # ---- demo with fake data (replace with your LiDAR Nx3 points) ----
 if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Play each demo scenario as a sequential sweep')
+    parser.add_argument('--no_play', action='store_true', help='Render and describe the cues without playing them')
+    args = parser.parse_args()
+
+    # The demo narrates every cue: plain messages, all levels, no sampling.
+    # force: replace whatever handlers an import may have installed, so the
+    # sector descriptions always reach stdout.
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout, force=True)
+
     # Test scenarios for 360° spatial audio
     test_scenarios = [
         # Single obstacle tests
@@ -758,7 +976,7 @@ if __name__ == "__main__":
         print(f"Obstacles at: {[pt.tolist() for pt in cloud]}")
         
         # Use sequential mode for all scenarios - cycles through all detected sectors
-        spatial_layers_from_pointcloud(cloud, fs=48000, mode="sequential")
+        spatial_layers_from_pointcloud(cloud, fs=48000, mode="sequential", play=not args.no_play)
         print("\n" + "="*50)
 
 
@@ -0,0 +1,217 @@
+"""
+Preemptive cue queue on top of the block renderer.
+
+The sequential sweep plays up to six 2 s cues plus gaps and a count
+preamble as one blocking buffer (priority / all modes: 8 s), so an obstacle
+that appears mid-sweep waits for the whole buffer. CueQueue plays the same
+one-cue-at-a-time sweep block by block instead:
+
+  - pending cues are ordered by obstacle_score(); re-submitting a sector
+    replaces its pending cue (latest wins)
+  - a cue that is closer than `near` meters, or whose score beats the
+    playing cue's by `preempt_ratio`, preempts it: the old cue fades out
+    while the new one fades in within a single block
+  - the sounding cue follows updates to its own sector (set_params), and
+    its urgency and score with it
+  - urgent cues skip the gap between cues, so a close obstacle that stays
+    close keeps sounding
+
+Time-to-announce (submission to the start of the first block containing
+the cue) is measured per cue on a monotonic clock: submit() stamps each cue
+and render() stamps each block as it starts, so a cue submitted mid-block
+counts the rest of that block. Preempting cues are announced at the next
+block boundary, so their worst case is bounded by one block (block / fs,
+10.7 ms at 512 / 48 kHz) plus however late the audio thread runs. Offline
+callers (simulations, streams rendered faster than real time) pass their
+own times as submit(picked, t) and render(out, t).
+
+    queue = CueQueue(fs=48000, block=512)
+    queue.submit(nearest_by_sector(cloud))     # any thread, every frame
+    queue.render(out)                          # audio thread, every block
+    queue.stats()["urgent_tta_max_s"]
+
+Simulate a person stepping in front during a long sweep:
+    python3 cue_queue.py
+"""
+import threading
+import time
+
+import numpy as np
+
+from block_render import BLOCK, BufferPool, CueVoice
+from closest_obstacle_audio import obstacle_score
+
+
+class Cue:
+    __slots__ = ("sector", "r", "az", "el", "score", "submitted", "urgent")
+
+    def __init__(self, sector, r, az, el, submitted, urgent):
+        self.sector = sector
+        self.r, self.az, self.el = float(r), float(az), float(el)
+        self.score = float(obstacle_score(self.r, self.az, self.el))
+        self.submitted = submitted          # seconds, CueQueue.timer clock
+        self.urgent = urgent
+
+
+class CueQueue:
+    def __init__(self, fs=48000, block=BLOCK, seg_dur=2.0, gap=0.3, near=1.0, preempt_ratio=1.5,
+                 timer=time.monotonic):
+        self.fs = fs
+        self.block = block
+        self.seg_dur = seg_dur
+        self.gap_samples = int(gap * fs)
+        self.near = near
+        self.preempt_ratio = preempt_ratio
+        self.pool = BufferPool(block)
+        self.pending = {}                   # sector -> Cue
+        self.current = None                 # (Cue, CueVoice)
+        self.fading = None                  # CueVoice being crossfaded out
+        self.clock = 0                      # samples rendered so far
+        self.timer = timer                  # submission / block start times
+        self.block_t = 0.0                  # start time of the block being rendered
+        self.idle_since = -self.gap_samples  # the first cue doesn't wait for a gap
+        self.lock = threading.Lock()
+        self.fade_in = np.linspace(0.0, 1.0, block, endpoint=False, dtype=np.float32)[:, None]
+        self.fade_out = (1.0 - self.fade_in).astype(np.float32)
+        self.tta = []                       # (seconds, urgent) per announced cue
+        self.preemptions = 0
+
+    # ---------- producer side ----------
+    def submit(self, picked, t=None):
+        """Queue one cue per sector of a nearest_by_sector() dict, observed at t (default: now)."""
+        t = self.timer() if t is None else t
+        with self.lock:
+            for sector, (r, az, el) in picked.items():
+                urgent = r < self.near
+                if self.current is not None and self.current[0].sector == sector:
+                    # Sounding sector: follow the obstacle instead of queueing it
+                    # again, and re-rate it so preemption sees its new distance
+                    cue, voice = self.current
+                    voice.set_params(r, az, el)
+                    self.current = (Cue(sector, r, az, el, cue.submitted, urgent), voice)
+                    self.pending.pop(sector, None)
+                    continue
+                old = self.pending.get(sector)
+                # Time-to-announce counts from the first submission (or from turning urgent)
+                keep = old is not None and (old.urgent or not urgent)
+                submitted = old.submitted if keep else t
+                self.pending[sector] = Cue(sector, r, az, el, submitted, urgent)
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+
+    # ---------- audio side ----------
+    def _pop_best(self):
+        best = max(self.pending.values(), key=lambda c: (c.urgent, c.score), default=None)
+        if best is not None:
+            del self.pending[best.sector]
+        return best
+
+    def _should_preempt(self):
+        if self.current is None or not self.pending:
+            return False
+        playing = self.current[0]
+        best = max(self.pending.values(), key=lambda c: (c.urgent, c.score))
+        if best.urgent and not playing.urgent:
+            return True
+        return best.score > playing.score * self.preempt_ratio
+
+    def _start(self, cue, fade):
+        voice = CueVoice(cue.sector, cue.r, cue.az, cue.el, self.fs, self.block, self.pool,
+                         dur=self.seg_dur, fade=fade)
+        self.current = (cue, voice)
+        self.tta.append((max(self.block_t - cue.submitted, 0.0), cue.urgent))
+
+    def render(self, out=None, t=None):
+        """Render the next (block, 2) float32 block, starting to play at t (default: now)."""
+        t = self.timer() if t is None else t
+        if out is None:
+            out = self.pool.get("out", 2)
+        out[...] = 0.0
+        with self.lock:
+            self.block_t = t
+            if self._should_preempt():
+                self.fading = self.current[1]
+                self.preemptions += 1
+                self._start(self._pop_best(), fade=self.block / self.fs)
+            elif self.current is None and self.pending:
+                # Urgent cues skip the inter-cue gap
+                urgent = any(c.urgent for c in self.pending.values())
+                if urgent or self.clock - self.idle_since >= self.gap_samples:
+                    self._start(self._pop_best(), fade=self.block / self.fs if urgent else 0.05)
+
+            if self.fading is not None:
+                # One-block crossfade: outgoing cue ramps down, incoming ramps up
+                incoming, outgoing = self.pool.get("xf_in", 2), self.pool.get("xf_out", 2)
+                incoming[...] = 0.0
+                outgoing[...] = 0.0
+                self.current[1].render(incoming)
+                self.fading.render(outgoing)
+                incoming *= self.fade_in
+                outgoing *= self.fade_out
+                np.add(incoming, outgoing, out=out)
+                self.fading = None
+            elif self.current is not None:
+                self.current[1].render(out)
+
+            if self.current is not None and self.current[1].done:
+                self.current = None
+                self.idle_since = self.clock + self.block
+            self.clock += self.block
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+    # ---------- metrics ----------
+    def stats(self):
+        """Time-to-announce statistics in seconds, overall and for preempting (urgent) cues."""
+        all_tta = np.array([s for s, _ in self.tta]) if self.tta else np.zeros(0)
+        urgent = np.array([s for s, u in self.tta if u]) if self.tta else np.zeros(0)
+        return {
+            "announced": len(self.tta),
+            "preemptions": self.preemptions,
+            "tta_p50_s": float(np.median(all_tta)) if all_tta.size else None,
+            "tta_max_s": float(all_tta.max()) if all_tta.size else None,
+            "urgent_tta_max_s": float(urgent.max()) if urgent.size else None,
+            "urgent_bound_s": self.block / self.fs,
+        }
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Simulate a sweep interrupted by a close obstacle')
+    parser.add_argument('--fs', type=int, default=48000)
+    parser.add_argument('--block', type=int, default=BLOCK)
+    parser.add_argument('--step_in', type=float, default=3.1, help='Seconds until a person steps in front')
+    parser.add_argument('--frame_rate', type=float, default=15.0, help='Depth frames per second')
+    args = parser.parse_args()
+
+    scene = {"FL": (2.5, 0.6, 0.0), "FR": (3.0, -0.5, 0.0), "BL": (2.0, 2.2, 0.0),
+             "BR": (3.5, -2.4, 0.0), "UP": (1.5, 0.0, 0.8)}
+    queue = CueQueue(args.fs, args.block)
+    out = np.zeros((args.block, 2), dtype=np.float32)
+    n_blocks = int(8.0 * args.fs / args.block)
+    frame = 0
+    for i in range(n_blocks):
+        # Simulated clock: depth frames land at their own times, mostly mid-block
+        now = i * args.block / args.fs
+        while frame / args.frame_rate <= now:
+            t_frame = frame / args.frame_rate
+            picked = dict(scene)
+            if t_frame >= args.step_in:
+                picked["FR"] = (0.4, -0.05, 0.0)
+            queue.submit(picked, t_frame)
+            frame += 1
+        queue.render(out, now)
+
+    s = queue.stats()
+    blocking = 5 * 2.0 + 4 * 0.3 + 5 * 0.2     # sequential buffer: cues, gaps, count preamble
+    print(f"announced {s['announced']} cues, {s['preemptions']} preemption(s)")
+    print(f"time-to-announce: median {1e3 * s['tta_p50_s']:.1f} ms, max {1e3 * s['tta_max_s']:.1f} ms")
+    if s["urgent_tta_max_s"] is not None:
+        print(f"close obstacle announced after {1e3 * s['urgent_tta_max_s']:.1f} ms "
+              f"(bound {1e3 * s['urgent_bound_s']:.1f} ms; blocking sweep: up to {blocking - args.step_in:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
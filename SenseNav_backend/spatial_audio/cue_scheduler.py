@@ -0,0 +1,214 @@
+"""
+Change-driven cue scheduling.
+
+spatial_layers_from_pointcloud() re-renders every cue on every frame, even
+when nothing moved. CueScheduler keeps the currently sounding state per
+sector and only reports (and applies) a change when it matters:
+
+  - distance / angle hysteresis: a sector is only considered moved when its
+    range changes by more than dist_hyst meters or its direction by more
+    than angle_hyst_deg
+  - quantized parameters: a move only updates the voice when the quantized
+    cue parameters (frequency, gain, tremolo rate, pan angle) differ from
+    what is sounding
+  - minimum hold: a voice is not updated again within min_hold seconds,
+    unless the obstacle came closer by more than approach_override meters
+  - release hold: a sector missing from a frame keeps sounding for
+    release_hold seconds, so single-frame dropouts don't cut the cue
+  - crossover stickiness: an obstacle crossing a sector boundary by less
+    than crossover_deg (FL/FR at azimuth 0, BL/BR behind, front/back at the
+    sides) keeps its current sector instead of flickering between the two
+
+    scheduler = CueScheduler(renderer=BlockRenderer())
+    for picked in frames:                      # nearest_by_sector() dicts
+        changes = scheduler.update(picked)     # only changed voices touched
+        renderer.render(out)
+
+Without a renderer, update() just returns the changes, e.g. to decide which
+stems of a whole-buffer cue need re-rendering.
+
+Replay a recorded session and report how many voice updates were needed:
+    python3 cue_scheduler.py /path/to/recording
+"""
+import math
+import time
+
+from closest_obstacle_audio import choose_targets, distance_to_params
+
+# Sector pairs that share a boundary, with the boundary azimuth (rad)
+NEIGHBOURS = (
+    ("FL", "FR", 0.0),
+    ("BL", "BR", math.pi),
+    ("FL", "BL", math.pi / 2),
+    ("FR", "BR", -math.pi / 2),
+)
+
+
+def angle_diff(a, b):
+    """Absolute difference of two angles in radians, wrapped to [0, pi]."""
+    return abs((a - b + math.pi) % (2 * math.pi) - math.pi)
+
+
+class CueState:
+    """What a sector currently sounds like, and when it last changed."""
+
+    __slots__ = ("sector", "r", "az", "el", "params", "changed", "seen")
+
+    def __init__(self, sector, r, az, el, params, t):
+        self.sector = sector
+        self.r, self.az, self.el = r, az, el
+        self.params = params
+        self.changed = t
+        self.seen = t
+
+
+class CueScheduler:
+    def __init__(self, renderer=None, dist_hyst=0.1, angle_hyst_deg=5.0, min_hold=0.3,
+                 approach_override=0.3, release_hold=0.5, crossover_deg=8.0,
+                 freq_step=10.0, gain_step=0.05, rate_step=0.1, pan_step_deg=5.0):
+        self.renderer = renderer
+        self.dist_hyst = dist_hyst
+        self.angle_hyst = math.radians(angle_hyst_deg)
+        self.min_hold = min_hold
+        self.approach_override = approach_override
+        self.release_hold = release_hold
+        self.crossover = math.radians(crossover_deg)
+        self.freq_step = freq_step
+        self.gain_step = gain_step
+        self.rate_step = rate_step
+        self.pan_step = math.radians(pan_step_deg)
+        self.states = {}
+        self.frames = 0
+        self.voice_updates = 0        # voices added, updated or removed
+        self.unchanged = 0            # sector observations that needed no update
+
+    def quantize(self, r, az):
+        """Quantized cue parameters; voices are only updated when these change."""
+        rate, freq, gain = distance_to_params(r)
+        return (round(float(freq) / self.freq_step), round(float(gain) / self.gain_step),
+                round(float(rate) / self.rate_step), round(az / self.pan_step))
+
+    def _stick(self, picked):
+        """Keep obstacles that barely crossed a sector boundary in their sounding sector."""
+        picked = dict(picked)
+        for a, b, boundary in NEIGHBOURS:
+            for held, new in ((a, b), (b, a)):
+                if (held in self.states and held not in picked and new in picked
+                        and new not in self.states
+                        and angle_diff(picked[new][1], boundary) < self.crossover):
+                    picked[held] = picked.pop(new)
+        return picked
+
+    def update(self, picked, t=None):
+        """
+        picked: sector -> (r, az, el) for the current frame.
+        Returns {"added": [...], "updated": [...], "removed": [...]} (sector
+        names) and applies them to the renderer, if any.
+        """
+        t = time.time() if t is None else t
+        self.frames += 1
+        changes = {"added": [], "updated": [], "removed": []}
+
+        for sector, (r, az, el) in self._stick(picked).items():
+            r, az, el = float(r), float(az), float(el)
+            state = self.states.get(sector)
+            if state is None:
+                self.states[sector] = CueState(sector, r, az, el, self.quantize(r, az), t)
+                changes["added"].append(sector)
+                continue
+            state.seen = t
+            moved = (abs(r - state.r) > self.dist_hyst or angle_diff(az, state.az) > self.angle_hyst
+                     or abs(el - state.el) > self.angle_hyst)
+            urgent = state.r - r > self.approach_override
+            if not moved or (t - state.changed < self.min_hold and not urgent):
+                self.unchanged += 1
+                continue
+            state.r, state.az, state.el = r, az, el
+            params = self.quantize(r, az)
+            if params == state.params:
+                self.unchanged += 1
+                continue
+            state.params = params
+            state.changed = t
+            changes["updated"].append(sector)
+
+        for sector, state in list(self.states.items()):
+            if state.seen < t and t - state.seen > self.release_hold:
+                del self.states[sector]
+                changes["removed"].append(sector)
+
+        self.voice_updates += sum(len(v) for v in changes.values())
+        if self.renderer is not None:
+            self._apply(changes)
+        return changes
+
+    def _apply(self, changes):
+        voices = self.renderer.voices
+        for sector in changes["removed"]:
+            voices.pop(sector, None)
+        for sector in changes["added"]:
+            s = self.states[sector]
+            self.renderer.add_voice(sector, s.r, s.az, s.el)
+        for sector in changes["updated"]:
+            s = self.states[sector]
+            voices[sector].set_params(s.r, s.az, s.el)
+
+    def sounding(self):
+        """sector -> (r, az, el) as currently sounding."""
+        return {s.sector: (s.r, s.az, s.el) for s in self.states.values()}
+
+    def targets(self, max_targets=3):
+        """choose_targets() over the sounding state, so target order only changes with it."""
+        return choose_targets(self.sounding(), max_targets)
+
+    def summary(self):
+        observed = self.voice_updates + self.unchanged
+        return {
+            "frames": self.frames,
+            "voice_updates": self.voice_updates,
+            "unchanged": self.unchanged,
+            "update_fraction": self.voice_updates / observed if observed else 0.0,
+        }
+
+
+def main():
+    import argparse
+    import os
+    import sys
+    _utils_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+    if _utils_dir not in sys.path:
+        sys.path.insert(0, _utils_dir)
+    from recording import Recording
+
+    parser = argparse.ArgumentParser(description='Replay a recording through the cue scheduler')
+    parser.add_argument('recording', type=str, help='Session directory written by Recorder')
+    parser.add_argument('--dist_hyst', type=float, default=0.1)
+    parser.add_argument('--angle_hyst', type=float, default=5.0, help='Degrees')
+    parser.add_argument('--min_hold', type=float, default=0.3, help='Seconds')
+    args = parser.parse_args()
+
+    rec = Recording(args.recording)
+    scheduler = CueScheduler(dist_hyst=args.dist_hyst, angle_hyst_deg=args.angle_hyst, min_hold=args.min_hold)
+    naive_updates = 0
+    naive_flips = sched_flips = 0
+    prev_naive = prev_sched = None
+    for i in range(len(rec)):
+        picked = rec.sectors_dict(i)
+        # Without the scheduler every occupied sector is re-rendered on every frame
+        naive_updates += len(picked)
+        scheduler.update(picked, t=float(rec.t[i]))
+        sounding = set(scheduler.states)
+        if prev_naive is not None:
+            naive_flips += len(set(picked) ^ prev_naive)
+            sched_flips += len(sounding ^ prev_sched)
+        prev_naive, prev_sched = set(picked), sounding
+
+    s = scheduler.summary()
+    print(f"{s['frames']} frames over {rec.duration:.1f} s")
+    print(f"voice renders: {naive_updates} without scheduler, {s['voice_updates']} with "
+          f"({100 * s['voice_updates'] / max(naive_updates, 1):.1f}%)")
+    print(f"sector set changes (flicker): {naive_flips} without scheduler, {sched_flips} with")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Depth map -> point cloud backprojection with cached per-pixel ray grids.
+
+The ray for every (decimated) pixel depends only on the intrinsics and the
+image size, so it is computed once and reused; backprojecting a frame is then
+a single broadcast multiply. Rays are expressed directly in the sector frame
+used by nearest_by_sector (x = forward, y = left, z = up), so the resulting
+cloud can be passed to it as-is.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+def intrinsics_tuple(K):
+    """(fx, fy, cx, cy) from a 3x3 camera matrix or an existing 4-tuple."""
+    if isinstance(K, tuple) and len(K) == 4:
+        return tuple(float(v) for v in K)
+    K = np.asarray(K, dtype=np.float64)
+    return float(K[0, 0]), float(K[1, 1]), float(K[0, 2]), float(K[1, 2])
+
+
+@lru_cache(maxsize=16)
+def _ray_grid(fx, fy, cx, cy, width, height, step, unit):
+    u = np.arange(0, width, step, dtype=np.float32)
+    v = np.arange(0, height, step, dtype=np.float32)
+    # Camera frame: x right, y down, z forward (pinhole, z = 1 plane)
+    xn = (u - cx) / fx
+    yn = (v - cy) / fy
+
+    rays = np.empty((len(v), len(u), 3), dtype=np.float32)
+    rays[..., 0] = 1.0               # forward  <- camera z
+    rays[..., 1] = -xn[None, :]      # left     <- -camera x
+    rays[..., 2] = -yn[:, None]      # up       <- -camera y
+    if unit:
+        rays /= np.linalg.norm(rays, axis=2, keepdims=True)
+    rays.setflags(write=False)
+    return rays
+
+
+def ray_grid(K, width, height, step=1, unit=False):
+    """
+    Cached (H/step, W/step, 3) float32 ray grid in the sector frame.
+
+    Args:
+        K: 3x3 intrinsics matrix or (fx, fy, cx, cy)
+        width, height: full image size in pixels
+        step: pixel decimation (1 = every pixel)
+        unit: unit-length rays (for range images) instead of z = 1 rays (for z-depth)
+    """
+    fx, fy, cx, cy = intrinsics_tuple(K)
+    return _ray_grid(fx, fy, cx, cy, int(width), int(height), max(1, int(step)), bool(unit))
+
+
+def backproject_depth(depth, K, step=1, depth_is_range=False, min_depth=0.0, max_depth=np.inf):
+    """
+    Backproject a (decimated) depth map into an Nx3 float32 cloud (sector frame).
+
+    Args:
+        depth: (H, W) metric depth; z-depth by default, distance along the ray
+               if depth_is_range
+        K: 3x3 intrinsics matrix or (fx, fy, cx, cy) for the full-size map
+        step: pixel decimation
+        min_depth, max_depth: points outside this range (and non-finite) are dropped
+
+    Returns:
+        (N, 3) float32 array
+    """
+    height, width = depth.shape[:2]
+    rays = ray_grid(K, width, height, step=step, unit=depth_is_range)
+    d = depth[::step, ::step]
+    pts = rays * d[..., None].astype(np.float32, copy=False)
+
+    valid = np.isfinite(d) & (d > min_depth) & (d <= max_depth)
+    return pts[valid]
+
+
+def inverse_to_metric(inv_depth, scale=1.0, eps=1e-6):
+    """Relative inverse depth (MiDaS) -> pseudo-metric depth: scale / inv_depth."""
+    inv = np.asarray(inv_depth, dtype=np.float32)
+    out = np.full(inv.shape, np.inf, dtype=np.float32)
+    np.divide(np.float32(scale), inv, out=out, where=inv > eps)
+    return out
@@ -0,0 +1,185 @@
+"""
+Fuse the ultrasonic ranges from the Arduino board with the per-sector
+nearest obstacles from depth / LiDAR point clouds.
+
+Each ultrasonic sensor looks along a fixed azimuth with a narrow cone; the
+cone is mapped once onto the level sectors it overlaps (the front sensor
+covers both FL and FR, the left one FL and BL, ...). Both sources keep a
+short timestamped history, and fuse(t) combines the readings of each source
+closest to (not after) t:
+
+  - confidence decays exponentially with the age of the reading; readings
+    below min_confidence are dropped before merging, so a stale reading
+    never decides a sector
+  - when both sources see a sector and agree (within agree_tol meters) the
+    ranges are confidence-weighted and the confidences combined
+  - when they disagree the reading with the higher confidence per meter
+    wins: a fresh reading beats a decayed one, and between similar
+    confidences the nearer one wins (the camera misses near-field and
+    low-texture obstacles, the ultrasonic cone misses everything off-axis)
+
+The output is the usual sector -> (r, az, el) dict, so it feeds
+choose_targets() directly, plus a sector -> confidence dict. Updating is a
+few scalar ops per sector, cheap enough to run on every serial frame.
+All timestamps must come from the same clock (time.time() by default, which
+is what the serial reader uses).
+
+SectorFusion is thread-safe: the serial reader thread and the depth loop
+can update and fuse concurrently. A lock guards the histories; fuse() takes
+a snapshot of the two readings it needs under the lock and merges outside it.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from closest_obstacle_audio import SECTORS, choose_targets
+
+SENSOR_NAMES = ("front", "left", "back", "right")
+SENSOR_AZIMUTH_DEG = {"front": 0.0, "left": 90.0, "back": 180.0, "right": -90.0}
+ULTRASONIC_CONE_DEG = 15.0       # HC-SR04 half-angle
+ULTRASONIC_MAX_RANGE = 4.0
+
+# Azimuth interval (deg) of each level sector, + left, - right
+_SECTOR_AZ_RANGE = {"FL": (0.0, 90.0), "FR": (-90.0, 0.0), "BL": (90.0, 180.0), "BR": (-180.0, -90.0)}
+
+
+def cone_sectors(azimuth_deg, half_angle_deg):
+    """
+    Level sectors overlapped by a cone, as [(sector, representative azimuth
+    in radians)] where the azimuth is the middle of the overlap.
+    """
+    out = []
+    lo, hi = azimuth_deg - half_angle_deg, azimuth_deg + half_angle_deg
+    for name, (s_lo, s_hi) in _SECTOR_AZ_RANGE.items():
+        for shift in (-360.0, 0.0, 360.0):
+            a, b = max(lo + shift, s_lo), min(hi + shift, s_hi)
+            if b > a:
+                out.append((name, float(np.deg2rad(0.5 * (a + b)))))
+                break
+    return out
+
+
+def _at_or_before(history, t):
+    """Newest (t, value) in a time-ordered deque with timestamp <= t, or None."""
+    for entry in reversed(history):
+        if entry[0] <= t:
+            return entry
+    return None
+
+
+class SectorFusion:
+
+    def __init__(self, sensor_names=SENSOR_NAMES, cone_deg=ULTRASONIC_CONE_DEG,
+                 max_range=ULTRASONIC_MAX_RANGE, depth_confidence=0.8, ultrasonic_confidence=0.9,
+                 depth_tau=0.5, ultrasonic_tau=0.25, agree_tol=0.3, min_confidence=0.15, history=16):
+        """
+        Args:
+            sensor_names: order of the distances passed to update_ultrasonic
+            cone_deg: ultrasonic half-angle, used to map sensors onto sectors
+            max_range: ultrasonic readings beyond this are ignored
+            depth_confidence, ultrasonic_confidence: confidence of a fresh reading
+            depth_tau, ultrasonic_tau: confidence decay time constants (s)
+            agree_tol: ranges closer than this (m) are treated as the same obstacle
+            min_confidence: readings (and fused sectors) below this are dropped
+            history: readings kept per source for time alignment
+        """
+        self.sensor_names = tuple(sensor_names)
+        self.max_range = max_range
+        self.depth_confidence = depth_confidence
+        self.ultrasonic_confidence = ultrasonic_confidence
+        self.depth_tau = depth_tau
+        self.ultrasonic_tau = ultrasonic_tau
+        self.agree_tol = agree_tol
+        self.min_confidence = min_confidence
+        # (sensor index, sector, azimuth) for every sensor / sector overlap
+        self.cone_map = [(i, sector, az)
+                         for i, name in enumerate(self.sensor_names)
+                         for sector, az in cone_sectors(SENSOR_AZIMUTH_DEG[name], cone_deg)]
+        self._depth = deque(maxlen=history)
+        self._ultrasonic = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    # ---------- inputs ----------
+    def update_depth(self, sectors, t=None):
+        """Per-sector nearest obstacles from nearest_by_sector() for a frame captured at t."""
+        entry = (time.time() if t is None else t, dict(sectors))
+        with self._lock:
+            self._depth.append(entry)
+
+    def update_ultrasonic(self, distances, t=None):
+        """Ultrasonic distances in meters (NaN / <= 0 = no echo), in sensor_names order."""
+        entry = (time.time() if t is None else t, np.asarray(distances, dtype=np.float64))
+        with self._lock:
+            self._ultrasonic.append(entry)
+
+    def serial_callback(self, on_fused=None, max_targets=3):
+        """
+        Callback for SensorReader(on_reading=...): feeds each serial reading in
+        and, if on_fused is given, calls on_fused(targets, confidence) with the
+        fused choose_targets() list at the serial rate.
+        """
+        def on_reading(t_host, seq, distances):
+            self.update_ultrasonic(distances, t_host)
+            if on_fused is not None:
+                on_fused(*self.targets(t_host, max_targets))
+        return on_reading
+
+    # ---------- fusion ----------
+    def ultrasonic_sectors(self, distances):
+        """Nearest ultrasonic range per overlapped sector: sector -> (r, az, el)."""
+        out = {}
+        for i, sector, az in self.cone_map:
+            r = distances[i]
+            if not (0.0 < r <= self.max_range):
+                continue
+            if sector not in out or r < out[sector][0]:
+                out[sector] = (float(r), float(az), 0.0)
+        return out
+
+    def fuse(self, t=None):
+        """
+        Fused per-sector estimate at time t (default: now).
+        Returns (picked, confidence): sector -> (r, az, el) and sector -> confidence.
+        """
+        t = time.time() if t is None else t
+        with self._lock:
+            depth = _at_or_before(self._depth, t)
+            ultra = _at_or_before(self._ultrasonic, t)
+        candidates = {}
+        if depth is not None:
+            c = self.depth_confidence * float(np.exp(-(t - depth[0]) / self.depth_tau))
+            if c >= self.min_confidence:
+                for sector, rae in depth[1].items():
+                    candidates[sector] = [(tuple(float(v) for v in rae), c)]
+        if ultra is not None:
+            c = self.ultrasonic_confidence * float(np.exp(-(t - ultra[0]) / self.ultrasonic_tau))
+            if c >= self.min_confidence:
+                for sector, rae in self.ultrasonic_sectors(ultra[1]).items():
+                    candidates.setdefault(sector, []).append((rae, c))
+
+        picked, confidence = {}, {}
+        for sector in SECTORS:
+            if sector not in candidates:
+                continue
+            picked[sector], confidence[sector] = self._merge(candidates[sector])
+        return picked, confidence
+
+    def _merge(self, cands):
+        if len(cands) == 1:
+            return cands[0]
+        (a, ca), (b, cb) = cands
+        if abs(a[0] - b[0]) <= self.agree_tol:
+            w = ca / (ca + cb)
+            r = w * a[0] + (1.0 - w) * b[0]
+            near = a if a[0] <= b[0] else b
+            return (r, near[1], near[2]), 1.0 - (1.0 - ca) * (1.0 - cb)
+        # Different obstacles: confidence per meter, so a decayed reading
+        # can't erase a fresh one and equally trusted readings go to the nearer
+        return (a, ca) if ca / max(a[0], 1e-3) >= cb / max(b[0], 1e-3) else (b, cb)
+
+    def targets(self, t=None, max_targets=3):
+        """choose_targets() on the fused estimate. Returns (targets, confidence)."""
+        picked, confidence = self.fuse(t)
+        return choose_targets(picked, max_targets), confidence
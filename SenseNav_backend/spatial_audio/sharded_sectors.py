@@ -0,0 +1,214 @@
+"""
+Multi-core nearest_by_sector for very large frames.
+
+nearest_by_sector is a handful of whole-array NumPy passes on one core. For
+frames of millions of points (several LiDARs merged) ShardedSectorizer
+splits the rows into chunks, reduces each chunk to its per-sector minima
+(sector_minima: row index and (d, az, el), six rows per chunk) on a pool,
+and merges the partials:
+
+    per sector, the smallest d wins; equal d goes to the lowest global row
+
+which is what argmin over the whole frame picks, and every value is computed
+element-wise by the same kernel, so the result equals nearest_by_sector
+exactly (same sectors, same floats, same dtype).
+
+Two backends:
+  - "thread": chunks are views of the caller's array. NumPy releases the GIL
+    inside each op, so with chunks of a few hundred thousand rows the
+    per-op overhead is small and no data moves at all.
+  - "process": the frame lives in a shared-memory segment owned by the
+    sectorizer; workers attach it once by name and read their rows in place.
+    Frames are copied in once (no pickling), or written there directly:
+    fill sharder.buffer(n) (e.g. backproject into it) and pass the view back.
+
+Frames below `min_rows` go straight to nearest_by_sector.
+
+    with ShardedSectorizer(workers=8, backend="process") as sharder:
+        picked = sharder(cloud)               # == nearest_by_sector(cloud)
+
+Compare latency and check equality on a synthetic frame:
+    python3 sharded_sectors.py --points 4000000 --backend thread
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from closest_obstacle_audio import SECTORS, nearest_by_sector, sector_minima
+
+
+def chunk_minima(P, start, ignore_behind=False):
+    """sector_minima of rows start.. of a frame, with global row indices."""
+    if ignore_behind:
+        rows = np.flatnonzero(P[:, 0] > 0)
+        if not len(rows):
+            return np.full(len(SECTORS), -1, dtype=np.int64), None
+        idx, rae = sector_minima(P[rows])
+        idx = np.where(idx >= 0, rows[np.maximum(idx, 0)], -1)
+    else:
+        idx, rae = sector_minima(P)
+    return np.where(idx >= 0, idx + start, -1), rae
+
+
+def merge_minima(parts):
+    """
+    Merge chunk_minima results into the frame's (idx, rae): the smallest
+    distance per sector, ties to the lowest global row.
+    """
+    best_idx = np.full(len(SECTORS), -1, dtype=np.int64)
+    best = None
+    for idx, rae in parts:
+        if rae is None:
+            continue
+        if best is None:
+            best = np.full((len(SECTORS), 3), np.nan, dtype=rae.dtype)
+        for k in range(len(SECTORS)):
+            g = idx[k]
+            if g < 0:
+                continue
+            if best_idx[k] < 0 or rae[k, 0] < best[k, 0] or (rae[k, 0] == best[k, 0] and g < best_idx[k]):
+                best_idx[k] = g
+                best[k] = rae[k]
+    return best_idx, best
+
+
+def to_picked(idx, rae):
+    """(idx, rae) -> nearest_by_sector() dict."""
+    if rae is None:
+        return {}
+    return {name: (rae[k, 0], rae[k, 1], rae[k, 2]) for k, name in enumerate(SECTORS) if idx[k] >= 0}
+
+
+# ---------- process backend: worker side ----------
+_segments = {}
+
+
+def _shm_chunk(name, dtype, n, start, stop, ignore_behind):
+    shm = _segments.get(name)
+    if shm is None:
+        # The sectorizer replaces its segment when frames outgrow it; drop stale attachments
+        for old in _segments.values():
+            old.close()
+        _segments.clear()
+        # Pool workers share the parent's resource tracker, so a plain attach
+        # is right here (unlike shm_ring readers, which are unrelated processes)
+        shm = _segments[name] = shared_memory.SharedMemory(name=name)
+    P = np.ndarray((n, 3), dtype=dtype, buffer=shm.buf)
+    return chunk_minima(P[start:stop], start, ignore_behind)
+
+
+class ShardedSectorizer:
+    def __init__(self, workers=None, backend="thread", chunk_rows=262_144, min_rows=500_000):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown backend {backend!r} (thread or process)")
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.chunk_rows = int(chunk_rows)
+        self.min_rows = int(min_rows)
+        self._pool = (ThreadPoolExecutor(self.workers, thread_name_prefix="sectors") if backend == "thread"
+                      else ProcessPoolExecutor(self.workers))
+        self._shm = None
+        self._dtype = None
+
+    # ---------- shared input buffer (process backend) ----------
+    def buffer(self, n, dtype=np.float32):
+        """(n, 3) view into the shared segment; frames written here are not copied again."""
+        dtype = np.dtype(dtype)
+        nbytes = max(int(n) * 3 * dtype.itemsize, 1)
+        if self._shm is None or self._shm.size < nbytes:
+            self._release()
+            # Headroom so a slowly growing frame doesn't reallocate every time
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes + nbytes // 4)
+        self._dtype = dtype
+        return np.ndarray((int(n), 3), dtype=dtype, buffer=self._shm.buf)
+
+    def _in_buffer(self, points):
+        if self._shm is None or points.dtype != self._dtype or not points.flags.c_contiguous:
+            return False
+        base = np.ndarray((0,), dtype=np.uint8, buffer=self._shm.buf).__array_interface__["data"][0]
+        return points.__array_interface__["data"][0] == base
+
+    def _release(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    # ---------- sectorization ----------
+    def _bounds(self, n):
+        # At least one chunk per worker, and no chunk larger than chunk_rows
+        size = min(self.chunk_rows, -(-n // self.workers))
+        return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+    def minima(self, points, ignore_behind=False):
+        """Merged (idx, rae) for the frame, as sector_minima would return for all of it."""
+        n = len(points)
+        if self.backend == "thread":
+            futures = [self._pool.submit(chunk_minima, points[a:b], a, ignore_behind) for a, b in self._bounds(n)]
+        else:
+            if not self._in_buffer(points):
+                self.buffer(n, points.dtype)[...] = points
+            name, dtype = self._shm.name, self._dtype.str
+            futures = [self._pool.submit(_shm_chunk, name, dtype, n, a, b, ignore_behind)
+                       for a, b in self._bounds(n)]
+        return merge_minima(f.result() for f in futures)
+
+    def __call__(self, points, ignore_behind=False):
+        """Same result as nearest_by_sector(points, ignore_behind)."""
+        points = np.asarray(points)
+        if len(points) < self.min_rows or self.workers == 1:
+            return nearest_by_sector(points, ignore_behind=ignore_behind)
+        return to_picked(*self.minima(points, ignore_behind))
+
+    def close(self):
+        self._pool.shutdown()
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Sharded vs single-core nearest_by_sector')
+    parser.add_argument('--points', type=int, default=4_000_000)
+    parser.add_argument('--backend', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk_rows', type=int, default=262_144)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cloud = (rng.normal(size=(args.points, 3)) * 4).astype(np.float32)
+
+    def timed(fn):
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            out = fn()
+        return out, (time.perf_counter() - t0) / args.repeat
+
+    reference, single_s = timed(lambda: nearest_by_sector(cloud))
+    with ShardedSectorizer(args.workers, args.backend, args.chunk_rows, min_rows=0) as sharder:
+        if args.backend == "process":
+            # Zero-copy path: the frame is produced directly in the shared segment
+            shared = sharder.buffer(len(cloud), cloud.dtype)
+            shared[...] = cloud
+            cloud = shared
+        sharded, sharded_s = timed(lambda: sharder(cloud))
+        exact = list(sharded) == list(reference) and all(
+            tuple(sharded[k]) == tuple(reference[k]) for k in reference)
+        print(f"{args.points} points, {sharder.workers} {args.backend} worker(s), "
+              f"{len(sharder._bounds(len(cloud)))} chunks")
+    print(f"single core: {1e3 * single_s:.1f} ms, sharded: {1e3 * sharded_s:.1f} ms "
+          f"({single_s / sharded_s:.2f}x); identical: {exact}")
+
+
+if __name__ == "__main__":
+    main()
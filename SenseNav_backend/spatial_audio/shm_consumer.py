@@ -0,0 +1,168 @@
+"""
+Read point clouds published by depth_centroid.py --publish NAME from shared
+memory, turn the newest one into per-sector obstacle analysis and play the
+chosen targets as spatial cues.
+
+The cloud is used as a view into the shared segment (no copy, no pickling);
+if the writer overwrites the slot while we were reading it, the result is
+discarded and the next newest frame is used instead.
+
+    python3 depth_centroid.py --headless --source depth.npy --publish sensenav_cloud
+    python3 shm_consumer.py sensenav_cloud
+
+Targets go to a CueQueue (cue_queue.py) that an output stream renders block
+by block, so a new obstacle is announced within a block instead of waiting
+for a whole sweep. --no_audio skips the output device (headless runs) and
+--print prints one line per frame.
+
+With --serial PORT the ultrasonic board (Arduino/python_serial) is read as
+well and both sources are fused per sector (sensor_fusion.py); fused targets
+are submitted on every depth frame and every serial reading, so near-field
+obstacles the camera misses still reach a cue at the serial rate.
+"""
+import argparse
+import os
+import sys
+import time
+
+_utils_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from shm_ring import ShmRing
+from closest_obstacle_audio import _sounddevice, analyze_sectors
+from cue_queue import CueQueue
+from sensor_fusion import SectorFusion
+
+_serial_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                            '..', '..', 'Arduino', 'python_serial'))
+
+
+def attach(name, timeout=10.0, poll_s=0.05):
+    """Attach to ring NAME, waiting up to `timeout` seconds for the writer to create it."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return ShmRing.attach(name)
+        except FileNotFoundError:
+            if time.perf_counter() >= deadline:
+                raise
+            time.sleep(poll_s)
+
+
+def consume(ring, handle, timeout=1.0, max_frames=None, ignore_behind=False, max_targets=3):
+    """
+    Call handle(frame, table) for each newest frame (frames published while
+    we were busy are skipped). Stops when no frame arrives within `timeout`
+    seconds or after max_frames. Returns (processed, torn) counts.
+    """
+    seq, processed, torn = -1, 0, 0
+    while max_frames is None or processed < max_frames:
+        frame = ring.wait_newer(seq, timeout=timeout)
+        if frame is None:
+            break
+        seq = frame.seq
+        table = analyze_sectors(frame.data, ignore_behind=ignore_behind, max_targets=max_targets)
+        if not frame.valid():
+            torn += 1
+            continue
+        handle(frame, table)
+        processed += 1
+    return processed, torn
+
+
+def table_targets(table):
+    """The analyze_sectors() targets as a sector -> (r, az, el) dict, for CueQueue.submit."""
+    return {table["sector"][i]: (table["distance"][i], table["azimuth"][i], table["elevation"][i])
+            for i in table["targets"]}
+
+
+def cue_handler(queue, fusion=None, verbose=False, max_targets=3):
+    """
+    handle(frame, table) for consume(): submits each frame's targets to
+    `queue`. With a SectorFusion the frame updates the depth side first and
+    the fused targets at the frame's timestamp are submitted instead.
+    """
+    def handle(frame, table):
+        if fusion is not None:
+            fusion.update_depth({name: (table["distance"][i], table["azimuth"][i], table["elevation"][i])
+                                 for i, name in enumerate(table["sector"])}, frame.timestamp)
+            targets, _ = fusion.targets(frame.timestamp, max_targets)
+            queue.submit({name: (r, az, el) for name, r, az, el in targets})
+        else:
+            queue.submit(table_targets(table))
+        if verbose:
+            latency_ms = 1000.0 * (time.time() - frame.timestamp)
+            nearest = ", ".join(f"{table['sector'][i]} {table['distance'][i]:.2f}m" for i in table["targets"])
+            print(f"frame {frame.frame_id:6d}  {len(frame.data):6d} pts  {latency_ms:6.1f} ms  {nearest or '-'}")
+    return handle
+
+
+def fused_handler(queue, verbose=False):
+    """on_fused(targets, confidence) for SectorFusion.serial_callback(): submits fused targets to `queue`."""
+    def on_fused(targets, confidence):
+        queue.submit({name: (r, az, el) for name, r, az, el in targets})
+        if verbose:
+            fused = ", ".join(f"{name} {r:.2f}m ({confidence[name]:.2f})" for name, r, _, _ in targets)
+            print(f"fused {fused or '-'}")
+    return on_fused
+
+
+def open_output(queue):
+    """Start an output stream whose callback renders `queue` block by block."""
+    sd = _sounddevice()
+
+    def callback(outdata, frames, time_info, status):
+        queue.render(outdata)
+
+    stream = sd.OutputStream(samplerate=queue.fs, blocksize=queue.block, channels=2,
+                             dtype="float32", callback=callback)
+    stream.start()
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-sector obstacles from a shared-memory point cloud ring')
+    parser.add_argument('name', help='Ring name passed to depth_centroid.py --publish')
+    parser.add_argument('--timeout', type=float, default=2.0, help='Stop after this many seconds without a new frame')
+    parser.add_argument('--frames', type=int, default=None, help='Stop after this many frames')
+    parser.add_argument('--ignore_behind', action='store_true', help='Drop points behind the user')
+    parser.add_argument('--serial', type=str, default=None, metavar='PORT',
+                        help='Also read the ultrasonic board on PORT and fuse it with the point clouds')
+    parser.add_argument('--no_audio', action='store_true', help='Queue cues without opening an output device')
+    parser.add_argument('--print', action='store_true', help='Print the targets of every frame / fused reading')
+    args = parser.parse_args()
+
+    ring = attach(args.name)
+    queue = CueQueue()
+    stream = None if args.no_audio else open_output(queue)
+    fusion = reader = None
+    if args.serial:
+        if _serial_dir not in sys.path:
+            sys.path.insert(0, _serial_dir)
+        from sensor_reader import SensorReader
+
+        fusion = SectorFusion()
+        reader = SensorReader(args.serial, on_reading=fusion.serial_callback(fused_handler(queue, args.print)))
+        reader.start()
+
+    try:
+        processed, torn = consume(ring, cue_handler(queue, fusion, args.print), timeout=args.timeout,
+                                  max_frames=args.frames, ignore_behind=args.ignore_behind)
+    finally:
+        ring.close()
+        if reader is not None:
+            reader.stop()
+            print(reader.summary(), file=sys.stderr)
+        if stream is not None:
+            stream.stop()
+            stream.close()
+    print(f"{processed} frames, {torn} overwritten while reading", file=sys.stderr)
+    s = queue.stats()
+    if s["announced"]:
+        print(f"{s['announced']} cues announced, time-to-announce median {1e3 * s['tta_p50_s']:.1f} ms, "
+              f"max {1e3 * s['tta_max_s']:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
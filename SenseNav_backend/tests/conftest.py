@@ -0,0 +1,13 @@
+"""
+The backend modules import their siblings by name (spatial_audio/, utils/,
+api/ on sys.path), the same way app.py and the CLIs set them up; benchmarks/
+is there too for the load test helpers.
+"""
+import os
+import sys
+
+backend_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+for name in ('spatial_audio', 'utils', 'api', 'benchmarks'):
+    path = os.path.join(backend_dir, name)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,147 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+import app as api  # noqa: E402
+
+BOUNDARY = {"bbox": {"x": 100, "y": 80, "width": 120, "height": 200}, "depth": 1.5,
+            "image_width": 640, "image_height": 480}
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+def pin_quality(monkeypatch, endpoint, level):
+    """Hold the endpoint's quality controller at `level` whatever the requests take."""
+    quality = api.get_quality_controller(endpoint)
+    monkeypatch.setattr(quality, "level", level)
+    monkeypatch.setattr(quality, "record_frame", lambda *a, **k: quality.level)
+    return quality.params
+
+
+@pytest.mark.parametrize("level, fs", [(0, 48000), (4, 16000)])
+def test_boundary_layers_report_their_sample_rate(client, monkeypatch, level, fs):
+    assert pin_quality(monkeypatch, "boundary", level)["fs"] == fs
+    body = client.post("/api/spatial-audio/analyze-boundary", json=BOUNDARY).get_json()
+    assert body["fs"] == fs
+    assert len(body["layers"]) == int(8.0 * fs)
+
+
+@pytest.mark.parametrize("codec, mime, dtype", [("pcm16", "audio/L16", ">i2"), ("ulaw", "audio/PCMU", np.uint8)])
+def test_raw_stream_content_type(client, monkeypatch, codec, mime, dtype):
+    fs = pin_quality(monkeypatch, "analyze", 2)["fs"]
+    response = client.post("/api/spatial-audio/stream", json={
+        "points": [[1.0, 0.5, 0.0], [2.0, -1.0, 0.1]], "duration": 0.05, "codec": codec, "container": "raw"})
+    assert response.status_code == 200
+    assert response.mimetype == mime
+    assert response.mimetype_params == {"rate": str(fs), "channels": "2"}
+    samples = np.frombuffer(response.get_data(), dtype=dtype)
+    assert len(samples) >= 2 * int(0.05 * fs)
+
+
+@pytest.mark.parametrize("path", ["/api/spatial-audio/analyze", "/api/spatial-audio/stream"])
+def test_ragged_points_are_rejected(client, path):
+    response = client.post(path, json={"points": [[1.0, 0.5, 0.0], [2.0, -1.0]]})
+    assert response.status_code == 400
+    assert "Invalid point cloud" in response.get_json()["error"]
+
+
+@pytest.fixture
+def visualization():
+    api.get_visualization_stream.cache_clear()
+    yield api.get_visualization_stream()
+    api.get_visualization_stream.cache_clear()
+
+
+def analyze(client, points):
+    assert client.post("/api/spatial-audio/analyze", json={"points": points}).status_code == 200
+
+
+def test_visualization_deltas_follow_analyses(client, visualization):
+    analyze(client, [[2.0, 1.0, 0.0], [2.0, -1.0, 0.0]])
+    full = client.get("/api/visualization").get_json()
+    assert full["full"] is True and full["version"] == 1
+    markers = {m["id"]: m for m in full["upsert"]}
+    assert markers == {m["id"]: m for m in visualization.snapshot()["upsert"]}
+
+    assert client.get("/api/visualization?since=1").get_json()["upsert"] == []
+    analyze(client, [[2.0, 1.0, 0.0]])
+    delta = client.get("/api/visualization?since=1").get_json()
+    assert delta["full"] is False and delta["version"] == 2
+    assert delta["remove"] and all(marker_id in markers for marker_id in delta["remove"])
+    assert client.get("/api/visualization?since=abc").status_code == 400
+
+
+def test_visualization_sse_resumes_from_last_event_id(client, visualization):
+    analyze(client, [[2.0, 1.0, 0.0], [2.0, -1.0, 0.0]])
+    analyze(client, [[2.0, 1.0, 0.0]])
+    response = client.get("/api/visualization/stream", headers={"Last-Event-ID": "1"}, buffered=False)
+    assert response.mimetype == "text/event-stream"
+    events = iter(response.response)
+    assert next(events) == b"retry: 1000\n\n"
+    event = next(events).decode()
+    response.close()
+    head, data = event.strip().split("\n")
+    assert head == "id: 2"
+    delta = json.loads(data[len("data: "):])
+    assert delta == visualization.delta(since=1)
+
+
+@pytest.fixture
+def fresh_quality(monkeypatch):
+    for var in api.QUALITY_BUDGETS.values():
+        monkeypatch.delenv(var, raising=False)
+    api.get_quality_controller.cache_clear()
+    yield monkeypatch
+    api.get_quality_controller.cache_clear()
+
+
+def test_quality_is_fixed_without_a_budget(fresh_quality):
+    for endpoint in api.QUALITY_BUDGETS:
+        quality = api.get_quality_controller(endpoint)
+        for _ in range(10):
+            quality.record_frame(5.0)
+        assert quality.budget is None and quality.level == 0
+
+
+def test_slow_boundary_requests_only_degrade_the_boundary_endpoint(client, fresh_quality):
+    fresh_quality.setenv("SENSENAV_FRAME_BUDGET_MS", "100")
+    fresh_quality.setenv("SENSENAV_BOUNDARY_BUDGET_MS", "100")
+    boundary = api.get_quality_controller("boundary")
+    for _ in range(boundary.down_after):
+        boundary.record_frame(1.2)
+    assert boundary.level == 1
+    body = client.get("/api/quality").get_json()
+    assert body["analyze"]["level"] == 0 and body["analyze"]["budget_ms"] == 100
+    assert body["boundary"]["level"] == 1
+
+
+def test_recording_holds_the_analyzed_points(client, monkeypatch, tmp_path):
+    from closest_obstacle_audio import nearest_by_sector
+    from quality import subsample_points
+    from recording import Recording
+
+    monkeypatch.setenv("SENSENAV_RECORD_DIR", str(tmp_path))
+    api.get_recorder.cache_clear()
+    try:
+        budget = pin_quality(monkeypatch, "analyze", 4)["point_budget"]
+        rng = np.random.default_rng(0)
+        cloud = rng.uniform(-4.0, 4.0, (4 * budget, 3)).astype(np.float32)
+        assert client.post("/api/spatial-audio/analyze", json={"points": cloud.tolist()}).status_code == 200
+        api.get_recorder().flush()
+    finally:
+        api.get_recorder.cache_clear()
+
+    rec = Recording(str(next(tmp_path.iterdir())))
+    assert len(rec) == 1
+    np.testing.assert_array_equal(rec.points(0), subsample_points(cloud, budget))
+    fresh = nearest_by_sector(rec.points(0))
+    assert rec.sectors_dict(0).keys() == fresh.keys()
+    for sector, rae in fresh.items():
+        assert np.allclose(rec.sectors_dict(0)[sector], rae, atol=1e-4)
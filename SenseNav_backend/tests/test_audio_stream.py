@@ -0,0 +1,54 @@
+import struct
+import warnings
+
+import numpy as np
+import pytest
+
+from audio_stream import BlockEncoder, _mulaw_table, mimetype, stream_cue, wav_header
+
+PICKED = {"FL": (1.2, 0.6, 0.0), "FR": (2.0, -0.4, 0.0)}
+
+
+def test_raw_pcm16_is_big_endian_wav_is_little_endian():
+    wav = list(stream_cue(PICKED, "all", 0.05, 48000, codec="pcm16", container="wav"))
+    raw = list(stream_cue(PICKED, "all", 0.05, 48000, codec="pcm16", container="raw"))
+    assert wav[0] == wav_header(48000, 2, "pcm16")
+    le = np.frombuffer(b"".join(wav[1:]), dtype="<i2")
+    be = np.frombuffer(b"".join(raw), dtype=">i2")
+    assert np.abs(le).max() > 0
+    np.testing.assert_array_equal(le, be)
+
+
+def test_ulaw_bytes_do_not_depend_on_container():
+    wav = list(stream_cue(PICKED, "all", 0.05, 48000, codec="ulaw", container="wav"))
+    raw = list(stream_cue(PICKED, "all", 0.05, 48000, codec="ulaw", container="raw"))
+    assert b"".join(wav[1:]) == b"".join(raw)
+
+
+def test_mimetypes_carry_rate_and_channels_for_raw():
+    assert mimetype("wav", "pcm16", 24000) == "audio/wav"
+    assert mimetype("raw", "pcm16", 24000) == "audio/L16;rate=24000;channels=2"
+    assert mimetype("raw", "ulaw", 16000) == "audio/PCMU;rate=16000;channels=2"
+
+
+def test_wav_header_fields():
+    header = wav_header(32000, 2, "ulaw")
+    assert header[:4] == b"RIFF" and header[8:16] == b"WAVEfmt "
+    tag, channels, fs, byte_rate, align, bits = struct.unpack("<HHIIHH", header[20:36])
+    assert (tag, channels, fs, byte_rate, align, bits) == (7, 2, 32000, 64000, 2, 8)
+    assert struct.unpack("<I", header[-4:])[0] == 0xFFFFFFFF
+
+
+def test_mulaw_table_matches_reference_encoder():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")
+    samples = np.arange(-32768, 32768, dtype=np.int16)
+    expected = np.frombuffer(audioop.lin2ulaw(samples.tobytes(), 2), dtype=np.uint8)
+    np.testing.assert_array_equal(_mulaw_table()[samples.view(np.uint16)], expected)
+
+
+def test_encoder_clips_and_scales():
+    encoder = BlockEncoder("pcm16", block=4, channels=1, byteorder=">")
+    x = np.array([[-2.0], [-1.0], [0.5], [1.5]], dtype=np.float32)
+    assert np.frombuffer(encoder.encode(x), dtype=">i2").tolist() == [-32767, -32767, 16383, 32767]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from block_render import BlockRenderer, render_sectors, steady_state_allocations
+
+PICKED = {"FL": (1.2, 0.6, 0.0), "FR": (2.0, -0.4, 0.0), "BL": (1.5, 2.2, 0.0),
+          "BR": (3.0, -2.5, 0.0), "UP": (1.0, 0.0, 1.0), "DOWN": (1.8, 0.0, -0.8)}
+# Large block, so one float32 temporary (16 KB mono) stands out from the
+# kilobyte or two of transient Python objects
+CHECK_BLOCK = 4096
+LIMIT = CHECK_BLOCK * 4 // 2
+
+
+def large_block_renderer():
+    renderer = BlockRenderer(48000, CHECK_BLOCK)
+    renderer.set_sectors(PICKED)
+    return renderer, np.zeros((CHECK_BLOCK, 2), dtype=np.float32)
+
+
+def test_steady_state_rendering_does_not_allocate():
+    renderer, out = large_block_renderer()
+    grown = steady_state_allocations(lambda: renderer.render(out))
+    assert grown < LIMIT, f"steady-state rendering allocated {grown} bytes per run (limit {LIMIT})"
+
+
+def test_allocation_check_catches_a_temporary():
+    renderer, out = large_block_renderer()
+
+    def leaky():
+        renderer.render(out)
+        return out * 0.5            # one block-sized temporary
+
+    assert steady_state_allocations(leaky) >= LIMIT
+
+
+def test_render_output_is_float32_and_bounded():
+    renderer, out = large_block_renderer()
+    block = renderer.render(out)
+    assert block is out and block.dtype == np.float32
+    assert np.all(np.isfinite(block)) and np.abs(block).max() <= 1.0
+
+
+def test_render_sectors_matches_block_by_block():
+    dur, fs, block = 0.1, 48000, 512
+    whole = render_sectors(PICKED, dur=dur, fs=fs, block=block)
+    assert whole.shape == (int(dur * fs), 2) and whole.dtype == np.float32
+    renderer = BlockRenderer(fs, block)
+    renderer.set_sectors(PICKED, dur=dur)
+    blocks = np.concatenate([renderer.render().copy() for _ in range(-(-len(whole) // block))])
+    np.testing.assert_array_equal(whole, blocks[:len(whole)])
@@ -0,0 +1,70 @@
+import numpy as np
+
+from cue_queue import CueQueue
+
+FS, BLOCK = 48000, 512
+BLOCK_S = BLOCK / FS
+
+
+def playing(queue):
+    return queue.current[0] if queue.current is not None else None
+
+
+def test_first_cue_starts_without_a_gap():
+    queue = CueQueue(FS, BLOCK)
+    queue.submit({"FL": (2.0, 0.6, 0.0)}, t=0.0)
+    queue.render(t=0.0)
+    assert playing(queue).sector == "FL"
+    assert queue.tta == [(0.0, False)]
+
+
+def test_resubmitted_playing_sector_is_rerated():
+    queue = CueQueue(FS, BLOCK)
+    queue.submit({"FR": (3.0, -0.5, 0.0)}, t=0.0)
+    queue.render(t=0.0)
+    # The playing obstacle steps in close; another close one appears elsewhere
+    queue.submit({"FR": (0.4, -0.5, 0.0), "FL": (0.9, 0.5, 0.0)}, t=0.005)
+    cue = playing(queue)
+    assert cue.sector == "FR" and cue.urgent and cue.r == 0.4
+    assert cue.submitted == 0.0
+    queue.render(t=BLOCK_S)
+    assert playing(queue).sector == "FR"
+    assert queue.preemptions == 0
+    assert "FL" in queue.pending
+
+
+def test_urgent_cue_preempts_within_one_block():
+    queue = CueQueue(FS, BLOCK)
+    queue.submit({"FL": (2.5, 0.6, 0.0)}, t=0.0)
+    for i in range(10):
+        queue.render(t=i * BLOCK_S)
+    t_submit = 9.3 * BLOCK_S                     # between two blocks
+    queue.submit({"FR": (0.4, -0.05, 0.0)}, t=t_submit)
+    out = queue.render(t=10 * BLOCK_S)
+    assert playing(queue).sector == "FR"
+    assert queue.preemptions == 1
+    tta, urgent = queue.tta[-1]
+    assert urgent and np.isclose(tta, 0.7 * BLOCK_S)
+    stats = queue.stats()
+    assert 0.0 < stats["urgent_tta_max_s"] <= stats["urgent_bound_s"]
+    assert out.dtype == np.float32 and np.abs(out).max() <= 1.0
+
+
+def test_waiting_cue_counts_from_its_submission():
+    queue = CueQueue(FS, BLOCK, seg_dur=0.05)
+    queue.submit({"FL": (2.0, 0.6, 0.0), "BL": (3.0, 2.2, 0.0)}, t=0.0)
+    t = 0.0
+    while playing(queue) is None or playing(queue).sector != "BL":
+        queue.render(t=t)
+        t += BLOCK_S
+        assert t < 2.0
+    # BL waited for the FL cue and the gap after it
+    assert [sector_tta[1] for sector_tta in queue.tta] == [False, False]
+    assert queue.tta[-1][0] >= 0.05 + 0.3
+
+
+def test_default_timer_is_monotonic_seconds():
+    queue = CueQueue(FS, BLOCK)
+    queue.submit({"FL": (2.0, 0.6, 0.0)})
+    queue.render()
+    assert 0.0 <= queue.tta[0][0] < 1.0
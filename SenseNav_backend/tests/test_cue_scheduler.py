@@ -0,0 +1,76 @@
+import math
+
+from block_render import BlockRenderer
+from cue_scheduler import CueScheduler
+
+NO_CHANGES = {"added": [], "updated": [], "removed": []}
+
+
+def test_static_scene_updates_nothing():
+    scheduler = CueScheduler()
+    picked = {"FL": (1.5, 0.6, 0.0), "BR": (2.5, -2.4, 0.0)}
+    assert scheduler.update(picked, t=0.0)["added"] == ["FL", "BR"]
+    for i in range(1, 30):
+        assert scheduler.update(picked, t=i / 15) == NO_CHANGES
+    assert scheduler.voice_updates == 2
+
+
+def test_jitter_inside_hysteresis_is_ignored():
+    scheduler = CueScheduler(dist_hyst=0.1, angle_hyst_deg=5.0)
+    scheduler.update({"FL": (1.50, 0.60, 0.0)}, t=0.0)
+    assert scheduler.update({"FL": (1.55, 0.60 + math.radians(3), 0.0)}, t=1.0) == NO_CHANGES
+    assert scheduler.sounding()["FL"] == (1.50, 0.60, 0.0)
+
+
+def test_min_hold_delays_updates():
+    scheduler = CueScheduler(min_hold=0.3, approach_override=0.3)
+    scheduler.update({"FL": (2.0, 0.6, 0.0)}, t=0.0)
+    # Receding by 0.5 m within the hold: not applied
+    assert scheduler.update({"FL": (2.5, 0.6, 0.0)}, t=0.1) == NO_CHANGES
+    # After the hold it is
+    assert scheduler.update({"FL": (2.5, 0.6, 0.0)}, t=0.4)["updated"] == ["FL"]
+    assert scheduler.sounding()["FL"][0] == 2.5
+
+
+def test_fast_approach_overrides_the_hold():
+    scheduler = CueScheduler(min_hold=0.3, approach_override=0.3)
+    scheduler.update({"FR": (2.0, -0.6, 0.0)}, t=0.0)
+    assert scheduler.update({"FR": (1.2, -0.6, 0.0)}, t=0.05)["updated"] == ["FR"]
+
+
+def test_release_hold_bridges_dropouts():
+    scheduler = CueScheduler(release_hold=0.5)
+    scheduler.update({"UP": (1.0, 0.0, 1.0)}, t=0.0)
+    assert scheduler.update({}, t=0.3) == NO_CHANGES
+    assert "UP" in scheduler.states
+    assert scheduler.update({}, t=0.6)["removed"] == ["UP"]
+
+
+def test_crossing_azimuth_zero_keeps_the_sector():
+    scheduler = CueScheduler(crossover_deg=8.0)
+    scheduler.update({"FL": (1.5, math.radians(2), 0.0)}, t=0.0)
+    for i in range(1, 10):
+        az = math.radians(-2 if i % 2 else 2)
+        picked = {"FR": (1.5, az, 0.0)} if i % 2 else {"FL": (1.5, az, 0.0)}
+        assert scheduler.update(picked, t=i / 15) == NO_CHANGES
+    assert set(scheduler.states) == {"FL"}
+
+
+def test_clear_crossing_switches_sector():
+    scheduler = CueScheduler(crossover_deg=8.0, release_hold=0.5)
+    scheduler.update({"FL": (1.5, math.radians(20), 0.0)}, t=0.0)
+    changes = scheduler.update({"FR": (1.5, math.radians(-20), 0.0)}, t=0.1)
+    assert changes["added"] == ["FR"]
+    assert scheduler.update({"FR": (1.5, math.radians(-20), 0.0)}, t=1.0)["removed"] == ["FL"]
+
+
+def test_changes_are_applied_to_the_renderer():
+    renderer = BlockRenderer()
+    scheduler = CueScheduler(renderer=renderer)
+    scheduler.update({"FL": (2.0, 0.6, 0.0), "BL": (1.5, 2.2, 0.0)}, t=0.0)
+    assert set(renderer.voices) == {"FL", "BL"}
+    voice = renderer.voices["FL"]
+    scheduler.update({"FL": (1.0, 0.6, 0.0)}, t=1.0)
+    assert renderer.voices["FL"] is voice          # updated in place, not restarted
+    scheduler.update({"FL": (1.0, 0.6, 0.0)}, t=2.0)
+    assert set(renderer.voices) == {"FL"}
@@ -0,0 +1,137 @@
+"""float32 end to end: points after parsing, the analysis table, every generator, effect and render mode."""
+import base64
+import json
+
+import numpy as np
+import pytest
+
+import closest_obstacle_audio as coa
+from data_processing import (ANALYSIS_FIELDS, analysis_to_binary, analysis_to_compact, analysis_to_json,
+                             analysis_to_visualization, quantize_points, spherical_to_cartesian,
+                             validate_point_cloud)
+
+FS = 16000
+CLOUD = np.array([[1.2, 0.8, 0.0], [1.5, -0.9, 0.1], [-1.4, 1.1, 0.0], [-2.0, -1.5, 0.0],
+                  [0.3, 0.0, 1.2], [0.4, 0.1, -1.0]], dtype=np.float32)
+
+
+@pytest.fixture(params=[True, False], ids=["effects", "no-effects"])
+def effects(request):
+    coa.set_render_quality(None, request.param)
+    yield request.param
+    coa.set_render_quality(None, True)
+
+
+# ---------- points ----------
+def test_point_lists_parse_to_float32():
+    points = validate_point_cloud([[1, 2, 3], [4.5, 5, 6]])
+    assert points.dtype == np.float32 and points.shape == (2, 3)
+
+
+def test_int16_millimeters_decode_to_float32_meters():
+    q = quantize_points(CLOUD)
+    assert q.dtype == np.int16
+    points = validate_point_cloud({"data": base64.b64encode(q.astype("<i2").tobytes()).decode(),
+                                   "shape": list(q.shape)})
+    assert points.dtype == np.float32
+    np.testing.assert_allclose(points, CLOUD, atol=0.0006)
+
+
+def test_float32_payload_decodes_exactly():
+    spec = {"data": base64.b64encode(CLOUD.astype("<f4").tobytes()).decode(), "shape": [6, 3], "dtype": "float32"}
+    points = validate_point_cloud(spec)
+    assert points.dtype == np.float32
+    np.testing.assert_array_equal(points, CLOUD)
+
+
+@pytest.mark.parametrize("bad", [
+    [[1, 2, 3], [4, 5]],                                     # ragged
+    [[1, 2], [3, 4]],                                        # wrong width
+    {"data": base64.b64encode(b"\0" * 10).decode(), "shape": [2, 3], "dtype": "int16"},  # short
+    {"data": "", "shape": [0, 3], "dtype": "float64"},      # unsupported dtype
+])
+def test_malformed_points_raise_value_error(bad):
+    with pytest.raises(ValueError):
+        validate_point_cloud(bad)
+
+
+def test_empty_points_are_float32():
+    assert validate_point_cloud([]).dtype == np.float32
+
+
+def test_sector_minima_keep_the_point_dtype():
+    for r, az, el in coa.nearest_by_sector(CLOUD).values():
+        assert {type(r), type(az), type(el)} == {np.float32}
+
+
+# ---------- analysis table ----------
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_analysis_columns_keep_the_point_dtype(dtype):
+    table = coa.analyze_sectors(CLOUD.astype(dtype))
+    assert {table[c].dtype for c in ANALYSIS_FIELDS} == {np.dtype(dtype)}
+    assert spherical_to_cartesian(table["distance"], table["azimuth"], table["elevation"]).dtype == dtype
+    assert coa.analyze_sectors(np.zeros((0, 3), dtype=dtype))["distance"].dtype == dtype
+
+
+def test_float32_table_matches_float64_and_serializes():
+    table = coa.analyze_sectors(CLOUD)
+    wide = coa.analyze_sectors(CLOUD.astype(np.float64))
+    assert table["sector"] == wide["sector"]
+    np.testing.assert_array_equal(table["targets"], wide["targets"])
+    for c in ANALYSIS_FIELDS:
+        np.testing.assert_allclose(table[c], wide[c], rtol=1e-5)
+    # The serializers are where float32 turns into JSON numbers / wire floats
+    for payload in (analysis_to_json(table), analysis_to_compact(table), analysis_to_visualization(table)):
+        json.dumps(payload)
+    assert len(analysis_to_binary(table)) == 7 + 6 * (1 + 4 * len(ANALYSIS_FIELDS)) + 3
+
+
+# ---------- generators and effects ----------
+@pytest.mark.parametrize("gen", [coa.tone_left, coa.tone_right, coa.tone_up, coa.tone_down])
+def test_tone_generators_are_float32(gen, effects):
+    tone = gen(440.0, 0.25, FS)
+    assert tone.dtype == np.float32 and tone.shape == (int(0.25 * FS),)
+
+
+def test_beep_ping_and_sustained_tone_are_float32():
+    assert coa.make_beep(800, 0.2, FS).dtype == np.float32
+    assert coa.count_ping(3, FS).dtype == np.float32
+    assert coa.sustained_tone(500, 0.3, FS, tremolo_rate=2.0).dtype == np.float32
+
+
+@pytest.mark.parametrize("effect", [
+    lambda s: coa.tremolo(s, FS, 2.0),
+    lambda s: coa.darken(s, FS),
+    lambda s: coa.add_vibrato(s, FS),
+    lambda s: coa.add_chorus(s, FS),
+    lambda s: coa.apply_fade(s, FS),
+], ids=["tremolo", "darken", "vibrato", "chorus", "fade"])
+def test_effects_keep_float32(effect, effects):
+    out = effect(coa.tone_left(500.0, 0.25, FS))
+    assert out.dtype == np.float32 and out.shape == (int(0.25 * FS),)
+
+
+def test_scalar_cue_params_are_python_floats():
+    params = coa.distance_to_params(np.float32(1.5))
+    assert all(type(p) is float for p in params)
+    rate, freq, gain = coa.distance_to_params(np.array([0.5, 2.0], dtype=np.float32))
+    assert rate.shape == freq.shape == gain.shape == (2,)
+
+
+@pytest.mark.parametrize("az, el", [(0.7, 0.0), (-1.2, 0.0), (2.8, 0.0), (0.0, 1.0), (0.0, -1.0)])
+def test_pan_stereo_is_float32_stereo(az, el):
+    stereo = coa.pan_stereo(coa.tone_left(500.0, 0.25, FS), np.float32(az), np.float32(el), FS)
+    assert stereo.dtype == np.float32 and stereo.ndim == 2 and stereo.shape[1] == 2
+
+
+def test_mix_and_limit_is_float32():
+    stem = coa.pan_stereo(coa.tone_right(600.0, 0.2, FS), 0.3, 0.0, FS)
+    assert coa.mix_and_limit([stem, stem[:1000]]).dtype == np.float32
+
+
+# ---------- render modes ----------
+@pytest.mark.parametrize("mode", ["sequential", "priority", "unified", "all"])
+def test_render_modes_are_float32(mode, effects):
+    buf = coa.spatial_layers_from_pointcloud(CLOUD, fs=FS, dur=1.0, mode=mode, play=False)
+    assert buf.dtype == np.float32 and buf.ndim == 2 and buf.shape[1] == 2
+    assert np.all(np.isfinite(buf)) and np.abs(buf).max() <= 1.0
@@ -0,0 +1,47 @@
+"""
+Import cost and lazy loading: every import runs in a fresh interpreter, so
+modules already loaded by other tests don't hide what an import pulls in.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+backend_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+LAZY = ('scipy', 'sounddevice', 'requests', 'dotenv')
+
+
+def import_in_fresh_interpreter(module):
+    """(seconds spent importing `module` after numpy, optional modules it loaded)."""
+    code = (
+        "import json, sys, time\n"
+        f"sys.path[:0] = {[os.path.join(backend_dir, d) for d in ('spatial_audio', 'utils', 'api')]!r}\n"
+        "import numpy\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - t0\n"
+        f"print(json.dumps([seconds, sorted(m for m in {LAZY!r} if m in sys.modules)]))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env={**os.environ, "SENSENAV_LOG_LEVEL": "WARNING"})
+    return tuple(json.loads(out.stdout.splitlines()[-1]))
+
+
+@pytest.mark.parametrize("module", [
+    "closest_obstacle_audio", "data_processing", "block_render", "cue_scheduler",
+    "cue_queue", "sensor_fusion", "audio_stream", "sharded_sectors",
+])
+def test_analysis_modules_import_with_numpy_alone(module):
+    seconds, loaded = import_in_fresh_interpreter(module)
+    assert loaded == [], f"import {module} loaded {loaded}"
+    assert seconds < 1.0, f"import {module} took {1e3 * seconds:.0f} ms on top of numpy"
+
+
+def test_app_import_defers_env_and_http():
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    seconds, loaded = import_in_fresh_interpreter("app")
+    assert loaded == [], f"import app loaded {loaded}"
+    assert seconds < 2.0, f"import app took {1e3 * seconds:.0f} ms on top of numpy"
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import time
+
+from load_test import saturation_point, stop_process, summarize
+
+
+def step(level, results, elapsed=1.0):
+    return {"level": level, **summarize(results, elapsed)}
+
+
+def ok(kind, latency):
+    return (kind, 0.0, latency, 200, None)
+
+
+def test_summarize_without_results():
+    summary = summarize([], 10.0)
+    assert summary == {"all": {"count": 0, "rps": 0.0, "error_rate": None,
+                               "p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}}
+
+
+def test_saturation_at_a_level_without_results():
+    steps = [step(1, [ok("analyze", 0.01)] * 10), step(2, [ok("analyze", 0.01)] * 20), step(4, [])]
+    assert saturation_point(steps) == 2
+    assert saturation_point([step(1, []), step(2, [ok("analyze", 0.01)])]) is None
+    assert saturation_point([{"level": 1, "all": summarize([ok("analyze", 0.01)], 1.0)["all"]},
+                             {"level": 2}]) == 1
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+
+
+def test_stop_process_reaches_the_shell_children():
+    # Like spawn_server: a shell whose child is the actual server
+    proc = subprocess.Popen("sleep 30 & echo $!; wait", shell=True, start_new_session=True,
+                            stdout=subprocess.PIPE, text=True)
+    child = int(proc.stdout.readline())
+    proc.stdout.close()
+    assert _alive(child)
+    stop_process(proc)
+    deadline = time.time() + 5.0
+    while _alive(child) and time.time() < deadline:
+        time.sleep(0.01)
+    assert proc.returncode is not None
+    assert not _alive(child)
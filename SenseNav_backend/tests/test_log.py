@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+from log import MASK, JsonFormatter, Redactor, SamplingFilter, TextFormatter
+
+SUNO_BODY = '{"token": "tok-SECRET", "api_key": "k-SECRET", "status": "complete"}'
+
+
+def record(msg, *args, **extra):
+    rec = logging.LogRecord("sensenav.api", logging.WARNING, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+@pytest.fixture(autouse=True)
+def suno_key(monkeypatch):
+    monkeypatch.setenv("SUNO_API_KEY", "sk-live-SECRET")
+
+
+@pytest.fixture(params=["text", "json"])
+def formatter(request):
+    return (JsonFormatter if request.param == "json" else TextFormatter)(Redactor())
+
+
+def test_suno_body_is_masked(formatter):
+    line = formatter.format(record("Suno error body: %.200s", SUNO_BODY))
+    assert "SECRET" not in line
+    assert "complete" in line
+
+
+def test_bearer_and_env_secret_are_masked(formatter):
+    line = formatter.format(record("headers %s", {"Authorization": "Bearer abc.def-123", "x": "sk-live-SECRET"}))
+    assert "abc.def-123" not in line and "SECRET" not in line
+
+
+def test_json_extras_are_masked_and_stay_structured():
+    rec = record("clip %s", "c1", clip_id="c1", attempt=2, body=SUNO_BODY,
+                 headers={"authorization": "Bearer xyz", "accept": "application/json"}, token="t-SECRET")
+    out = json.loads(JsonFormatter(Redactor()).format(rec))
+    assert out["msg"] == "clip c1"
+    assert out["clip_id"] == "c1" and out["attempt"] == 2
+    assert "SECRET" not in out["body"]
+    assert out["headers"] == {"authorization": MASK, "accept": "application/json"}
+    assert out["token"] == MASK
+
+
+def test_sampling_passes_every_nth_per_call_site():
+    sampler = SamplingFilter()
+    passed = [sampler.filter(record("frame", sample_every=5)) for _ in range(12)]
+    assert passed == [True] + [False] * 4 + [True] + [False] * 4 + [True, False]
+    assert sampler.filter(record("other")) is True
+
+
+def test_audio_demo_narrates_sectors():
+    pytest.importorskip("scipy")
+    demo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "spatial_audio", "closest_obstacle_audio.py")
+    out = subprocess.run([sys.executable, demo, "--no_play"], capture_output=True, text=True, timeout=120,
+                         check=True).stdout
+    assert "SEQUENTIAL MODE: 1 target(s)" in out
+    assert "FL    | r=2.50m, az=+36.9°, el= +0.0°" in out
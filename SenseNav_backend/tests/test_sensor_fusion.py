@@ -0,0 +1,83 @@
+import math
+import sys
+import threading
+
+from sensor_fusion import SectorFusion
+
+NAN = float("nan")
+
+
+def test_stale_ultrasonic_does_not_erase_fresh_depth():
+    fusion = SectorFusion()
+    fusion.update_ultrasonic([0.5, NAN, NAN, NAN], t=0.0)
+    fusion.update_depth({"FL": (3.0, 0.3, 0.0), "FR": (3.0, -0.3, 0.0)}, t=2.0)
+    picked, confidence = fusion.fuse(t=2.0)
+    assert picked == {"FL": (3.0, 0.3, 0.0), "FR": (3.0, -0.3, 0.0)}
+    assert confidence["FL"] == confidence["FR"] == fusion.depth_confidence
+
+
+def test_stale_sources_drop_out():
+    fusion = SectorFusion()
+    fusion.update_depth({"BL": (1.0, 2.0, 0.0)}, t=0.0)
+    assert fusion.fuse(t=0.0)[0] == {"BL": (1.0, 2.0, 0.0)}
+    assert fusion.fuse(t=10.0) == ({}, {})
+
+
+def test_fresh_near_ultrasonic_beats_far_depth():
+    fusion = SectorFusion()
+    fusion.update_depth({"FL": (3.0, 0.3, 0.0)}, t=0.0)
+    fusion.update_ultrasonic([0.5, NAN, NAN, NAN], t=0.0)
+    picked, _ = fusion.fuse(t=0.0)
+    assert picked["FL"][0] == 0.5
+    assert picked["FR"][0] == 0.5          # the front cone covers both front sectors
+
+
+def test_decayed_near_reading_loses_to_confident_far_one():
+    fusion = SectorFusion(min_confidence=0.01)
+    fusion.update_ultrasonic([0.5, NAN, NAN, NAN], t=0.0)
+    fusion.update_depth({"FL": (3.0, 0.3, 0.0)}, t=1.0)
+    # ultrasonic confidence 0.9 * exp(-4) ~ 0.016 over 0.5 m < depth 0.8 over 3 m
+    picked, confidence = fusion.fuse(t=1.0)
+    assert picked["FL"] == (3.0, 0.3, 0.0)
+    assert confidence["FL"] == fusion.depth_confidence
+    assert picked["FR"][0] == 0.5          # no depth competitor there
+
+
+def test_agreeing_ranges_are_confidence_weighted():
+    fusion = SectorFusion()
+    fusion.update_depth({"FL": (1.2, 0.3, 0.1)}, t=0.0)
+    fusion.update_ultrasonic([1.0, NAN, NAN, NAN], t=0.0)
+    picked, confidence = fusion.fuse(t=0.0)
+    cd, cu = fusion.depth_confidence, fusion.ultrasonic_confidence
+    assert math.isclose(picked["FL"][0], (cd * 1.2 + cu * 1.0) / (cd + cu))
+    assert math.isclose(confidence["FL"], 1.0 - (1.0 - cd) * (1.0 - cu))
+
+
+def test_serial_thread_can_update_while_fusing():
+    fusion = SectorFusion(history=256)
+    fusion.update_depth({"FL": (2.0, 0.3, 0.0)}, t=0.0)
+    stop = threading.Event()
+    errors = []
+
+    def serial_thread():
+        i = 0
+        while not stop.is_set():
+            fusion.update_ultrasonic([1.0, NAN, NAN, NAN], t=float(i))
+            fusion.update_depth({"FL": (2.0, 0.3, 0.0)}, t=float(i))
+            i += 1
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=serial_thread)
+    writer.start()
+    try:
+        for _ in range(2000):
+            # t=0 walks the whole history, so each fuse() iterates while the writer appends
+            fusion.fuse(t=0.0)
+    except RuntimeError as e:
+        errors.append(e)
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(interval)
+    assert errors == []
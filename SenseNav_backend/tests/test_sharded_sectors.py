@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from closest_obstacle_audio import nearest_by_sector
+from sharded_sectors import ShardedSectorizer
+
+
+def assert_identical(got, want):
+    assert list(got) == list(want)
+    for sector, rae in want.items():
+        assert tuple(got[sector]) == tuple(rae)
+        assert all(np.asarray(a).dtype == np.asarray(b).dtype for a, b in zip(got[sector], rae))
+
+
+@pytest.fixture(scope="module", params=["thread", "process"])
+def sharder(request):
+    with ShardedSectorizer(workers=3, backend=request.param, chunk_rows=1000, min_rows=0) as s:
+        yield s
+
+
+def cloud(dtype, n=10_000, seed=0):
+    return (np.random.default_rng(seed).normal(size=(n, 3)) * 4).astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("ignore_behind", [False, True])
+def test_matches_nearest_by_sector(sharder, dtype, ignore_behind):
+    points = cloud(dtype)
+    assert len(sharder._bounds(len(points))) > 1
+    assert_identical(sharder(points, ignore_behind=ignore_behind), nearest_by_sector(points, ignore_behind))
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_ties_across_chunks_go_to_the_lowest_row(sharder, dtype):
+    points = np.full((3000, 3), 50.0, dtype=dtype)       # far filler
+    # Same distance (sqrt 5) twice per sector, on either side of a chunk
+    # boundary and in different directions: only the lower row's (az, el)
+    # matches nearest_by_sector
+    ties = {"FL": ((2.0, 1.0, 0.0), (1.0, 2.0, 0.0), 999, 1000),
+            "FR": ((2.0, -1.0, 0.0), (1.0, -2.0, 0.0), 998, 1001),
+            "BL": ((-2.0, 1.0, 0.0), (-1.0, 2.0, 0.0), 1999, 2000),
+            "BR": ((-1.0, -2.0, 0.0), (-2.0, -1.0, 0.0), 1998, 2001)}
+    for first, second, lower, upper in ties.values():
+        points[lower], points[upper] = first, second
+    want = nearest_by_sector(points)
+    for sector in ties:
+        assert want[sector][0] == np.sqrt(np.asarray(5.0, dtype=dtype))
+    assert_identical(sharder(points), want)
+
+
+def test_process_backend_reads_frames_written_into_its_buffer():
+    points = cloud(np.float32, seed=1)
+    with ShardedSectorizer(workers=2, backend="process", chunk_rows=2000, min_rows=0) as sharder:
+        shared = sharder.buffer(len(points), points.dtype)
+        shared[...] = points
+        assert_identical(sharder(shared), nearest_by_sector(points))
+        # A larger frame replaces the segment; workers must attach the new one
+        bigger = cloud(np.float32, n=30_000, seed=2)
+        assert_identical(sharder(bigger), nearest_by_sector(bigger))
+
+
+def test_empty_and_all_behind():
+    with ShardedSectorizer(workers=2, chunk_rows=10, min_rows=0) as sharder:
+        behind = -np.abs(cloud(np.float32, n=100))
+        assert sharder(behind, ignore_behind=True) == nearest_by_sector(behind, ignore_behind=True) == {}
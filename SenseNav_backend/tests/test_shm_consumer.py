@@ -0,0 +1,42 @@
+import os
+import time
+
+import numpy as np
+
+from cue_queue import CueQueue
+from sensor_fusion import SectorFusion
+from shm_consumer import consume, cue_handler, fused_handler
+from shm_ring import ShmRing
+
+NAN = float("nan")
+
+
+def publish_and_consume(handle, cloud, t):
+    name = f"sensenav_test_{os.getpid()}"
+    with ShmRing.create(name, n_slots=2, capacity=len(cloud)) as ring:
+        ring.publish(cloud, frame_id=1, timestamp=t)
+        return consume(ring, handle, timeout=0.05)
+
+
+def test_depth_frames_reach_the_cue_queue():
+    queue = CueQueue(timer=lambda: 0.0)
+    cloud = np.array([[2.0, 1.0, 0.0], [2.5, -1.0, 0.0]], dtype=np.float32)
+    assert publish_and_consume(cue_handler(queue), cloud, time.time()) == (1, 0)
+    assert set(queue.pending) == {"FL", "FR"}
+    queue.render(t=0.0)
+    assert queue.current is not None
+
+
+def test_fused_near_field_obstacle_reaches_the_cue_queue():
+    queue = CueQueue(timer=lambda: 0.0)
+    fusion = SectorFusion()
+    t = time.time()
+    cloud = np.array([[3.0, -1.0, 0.0]], dtype=np.float32)       # camera: FR only, far
+    publish_and_consume(cue_handler(queue, fusion), cloud, t)
+    assert set(queue.pending) == {"FR"}
+
+    # The front ultrasonic sees something the camera missed
+    fusion.serial_callback(fused_handler(queue))(t, 0, [0.4, NAN, NAN, NAN])
+    assert queue.pending["FL"].r == 0.4 and queue.pending["FL"].urgent
+    queue.render(t=0.0)
+    assert queue.current[0].r == 0.4
@@ -0,0 +1,84 @@
+import numpy as np
+
+from visualization_stream import VisualizationStream, apply_delta
+
+
+def marker(sector, x, y=0.0, z=0.0, priority=None):
+    return {"id": f"obstacle_{sector}", "position": {"x": x, "y": y, "z": z},
+            "sector": sector, "priority": priority}
+
+
+def frame(*markers):
+    return {"obstacle_markers": list(markers)}
+
+
+def ids(delta):
+    return sorted(m["id"] for m in delta["upsert"])
+
+
+def test_upsert_then_remove_across_versions():
+    stream = VisualizationStream()
+    v1 = stream.update(frame(marker("FL", 1.0), marker("FR", 2.0)))
+    v2 = stream.update(frame(marker("FL", 1.0), marker("FR", 2.0), marker("BL", 3.0)))
+    v3 = stream.update(frame(marker("FL", 1.0), marker("FR", 2.0)))
+    assert (v1, v2, v3) == (1, 2, 3)
+
+    # BL appeared and vanished after the client's version: only the removal is left
+    assert stream.delta(since=v1) == {"version": 3, "since": 1, "full": False, "upsert": [],
+                                      "remove": ["obstacle_BL"]}
+    d = stream.delta(since=v2)
+    assert ids(d) == [] and d["remove"] == ["obstacle_BL"]
+
+    # Removed, then back: the later upsert wins
+    stream.update(frame(marker("FL", 1.0), marker("FR", 2.0), marker("BL", 3.5)))
+    d = stream.delta(since=v2)
+    assert ids(d) == ["obstacle_BL"] and d["remove"] == []
+    assert d["upsert"][0]["position"]["x"] == 3.5
+
+
+def test_small_moves_are_not_versions():
+    stream = VisualizationStream(move_threshold=0.05)
+    stream.update(frame(marker("FL", 1.0)))
+    assert stream.update(frame(marker("FL", 1.02))) is None
+    # Drift is measured against the published position, so it adds up
+    assert stream.update(frame(marker("FL", 1.06))) == 2
+    assert stream.update(frame(marker("FL", 1.06, priority=1))) == 3
+
+
+def test_up_to_date_client_gets_an_empty_delta():
+    stream = VisualizationStream()
+    stream.update(frame(marker("FL", 1.0)))
+    assert stream.delta(since=stream.version) == {"version": 1, "since": 1, "full": False,
+                                                  "upsert": [], "remove": []}
+    empty = VisualizationStream()
+    assert empty.delta(since=0) == {"version": 0, "since": 0, "full": False, "upsert": [], "remove": []}
+
+
+def test_client_older_than_history_gets_a_snapshot():
+    stream = VisualizationStream(history=3)
+    for i in range(6):
+        stream.update(frame(marker("FL", 1.0 + i), marker("FR", 2.0)))
+    snapshot = stream.snapshot()
+    # History holds versions 4..6, so a client at 3 can still be diffed; 2 can't
+    assert stream.delta(since=3)["full"] is False
+    for since in (0, 2, 7):
+        d = stream.delta(since=since)
+        assert d["full"] is True and d["since"] == 0 and d["version"] == 6
+        assert ids(d) == ids(snapshot) == ["obstacle_FL", "obstacle_FR"]
+
+
+def test_applied_deltas_match_the_snapshot():
+    rng = np.random.default_rng(0)
+    sectors = ("FL", "FR", "BL", "BR", "UP", "DOWN")
+    stream = VisualizationStream(history=8)
+    client, version = {}, 0
+    for step in range(200):
+        present = [s for s in sectors if rng.random() < 0.6]
+        stream.update(frame(*(marker(s, float(rng.uniform(0.3, 4.0)), priority=int(rng.integers(0, 3)))
+                              for s in present)))
+        # The client polls irregularly, sometimes falling out of the history
+        if step % int(rng.integers(1, 12)) == 0:
+            delta = stream.delta(since=version)
+            apply_delta(client, delta)
+            version = delta["version"]
+            assert client == {m["id"]: m for m in stream.snapshot()["upsert"]}
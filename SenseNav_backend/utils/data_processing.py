@@ -1,30 +1,135 @@
+import base64
+import struct
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 
-def validate_point_cloud(points: List[List[float]]) -> np.ndarray:
+# Columns of a columnar analysis result (closest_obstacle_audio.analyze_sectors)
+# in the order they are emitted by the compact and binary formats.
+ANALYSIS_FIELDS = ("distance", "azimuth", "elevation", "tremolo_rate", "frequency", "gain", "score")
+
+# Binary payload: magic, version, sector count, target count
+BINARY_MAGIC = b"SNAV"
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<4sBBB")
+
+# Point cloud encodings: float32 meters, or int16 millimeters (+-32.767 m)
+_POINT_DTYPES = {"float32": np.float32, "int16": np.int16}
+POINT_SCALE_MM = 0.001
+
+def validate_point_cloud(points) -> np.ndarray:
     """
-    Validate and convert point cloud data to numpy array
+    Validate and convert point cloud data to a float32 numpy array
     
     Args:
-        points: List of [x, y, z] coordinates
+        points: List of [x, y, z] coordinates, or a dict
+            {"data": base64 little-endian values, "shape": [n, 3],
+             "dtype": "int16" (default, millimeters) | "float32",
+             "scale": meters per unit (default 0.001 for int16)}
         
     Returns:
-        numpy array of shape (N, 3)
+        float32 numpy array of shape (N, 3)
         
     Raises:
-        ValueError: If points format is invalid
+        ValueError: If points format is invalid (including ragged lists)
     """
-    if not points:
-        return np.array([]).reshape(0, 3)
+    if points is None or (not isinstance(points, dict) and len(points) == 0):
+        return np.zeros((0, 3), dtype=np.float32)
     
     try:
-        points_array = np.array(points)
+        if isinstance(points, dict):
+            dtype = points.get("dtype", "int16")
+            if dtype not in _POINT_DTYPES:
+                raise ValueError(f"unsupported dtype '{dtype}'")
+            raw = np.frombuffer(base64.b64decode(points["data"]), dtype=np.dtype(_POINT_DTYPES[dtype]).newbyteorder("<"))
+            raw = raw.reshape(tuple(int(n) for n in points.get("shape", (-1, 3))))
+            scale = float(points.get("scale", POINT_SCALE_MM if dtype == "int16" else 1.0))
+            points_array = raw.astype(np.float32)
+            if scale != 1.0:
+                points_array *= np.float32(scale)
+        else:
+            points_array = np.asarray(points, dtype=np.float32)
         if points_array.ndim != 2 or points_array.shape[1] != 3:
             raise ValueError("Points must be a list of [x, y, z] coordinates")
         return points_array
     except Exception as e:
         raise ValueError(f"Invalid point cloud format: {str(e)}")
 
+def quantize_points(points: np.ndarray, scale: float = POINT_SCALE_MM) -> np.ndarray:
+    """
+    (N, 3) int16 points in units of `scale` meters (millimeters by default,
+    clipped to +-32.767 m), a quarter of the float64 size on the wire. The
+    inverse of the "int16" encoding accepted by validate_point_cloud.
+    """
+    q = np.rint(np.asarray(points, dtype=np.float32) / np.float32(scale))
+    return np.clip(q, -32767, 32767).astype(np.int16)
+
+# Integer depth ROI encodings: quantized value q -> offset + q * scale meters, q == 0 invalid
+_ROI_DTYPES = {"uint8": np.uint8, "uint16": np.uint16, "float16": np.float16, "float32": np.float32}
+
+def decode_depth_roi(spec) -> np.ndarray:
+    """
+    Decode a depth region of interest sent with a boundary request.
+
+    Args:
+        spec: nested list of metric depths, or a dict
+            {"data": base64 little-endian values, "shape": [h, w],
+             "dtype": "uint16" (default) | "uint8" | "float16" | "float32",
+             "scale": meters per unit (default 0.001 = millimeters for
+             integer types), "offset": meters added to valid values}
+
+    Returns:
+        (h, w) float32 metric depth; invalid cells are 0
+
+    Raises:
+        ValueError: If the encoding is malformed
+    """
+    try:
+        if not isinstance(spec, dict):
+            roi = np.asarray(spec, dtype=np.float32)
+        else:
+            dtype = spec.get("dtype", "uint16")
+            if dtype not in _ROI_DTYPES:
+                raise ValueError(f"unsupported dtype '{dtype}'")
+            raw = np.frombuffer(base64.b64decode(spec["data"]), dtype=np.dtype(_ROI_DTYPES[dtype]).newbyteorder("<"))
+            raw = raw.reshape(tuple(int(n) for n in spec["shape"]))
+            integer = np.issubdtype(raw.dtype, np.integer)
+            scale = float(spec.get("scale", 0.001 if integer else 1.0))
+            roi = raw.astype(np.float32) * np.float32(scale) + np.float32(spec.get("offset", 0.0))
+            if integer:
+                roi[raw == 0] = 0.0
+        if roi.ndim != 2 or roi.size == 0:
+            raise ValueError("depth ROI must be a non-empty 2D array")
+        return roi
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid depth ROI: {e}")
+
+def decode_mask(spec) -> np.ndarray:
+    """
+    Decode an obstacle mask sent with a boundary request.
+
+    Args:
+        spec: nested list of 0/1, or a dict {"data": base64 of
+            np.packbits(mask) (row-major, MSB first), "shape": [h, w]}
+
+    Returns:
+        (h, w) bool array
+
+    Raises:
+        ValueError: If the encoding is malformed
+    """
+    try:
+        if not isinstance(spec, dict):
+            mask = np.asarray(spec).astype(bool)
+        else:
+            shape = tuple(int(n) for n in spec["shape"])
+            bits = np.unpackbits(np.frombuffer(base64.b64decode(spec["data"]), dtype=np.uint8))
+            mask = bits[:int(np.prod(shape))].reshape(shape).astype(bool)
+        if mask.ndim != 2 or not mask.any():
+            raise ValueError("mask must be a 2D array with at least one set cell")
+        return mask
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid mask: {e}")
+
 def filter_points_by_distance(points: np.ndarray, min_distance: float = 0.1, max_distance: float = 10.0) -> np.ndarray:
     """
     Filter points by distance from origin
@@ -44,6 +149,57 @@ def filter_points_by_distance(points: np.ndarray, min_distance: float = 0.1, max
     mask = (distances >= min_distance) & (distances <= max_distance)
     return points[mask]
 
+def spherical_to_cartesian(distance, azimuth, elevation) -> np.ndarray:
+    """
+    Vectorized spherical -> Cartesian conversion (x forward, y left, z up).
+
+    Args:
+        distance, azimuth, elevation: arrays (or scalars) of equal length,
+            angles in radians
+
+    Returns:
+        numpy array of shape (N, 3), float32 for float32 inputs (float64 otherwise)
+    """
+    dtype = np.result_type(np.asarray(distance), np.asarray(azimuth), np.asarray(elevation), np.float32)
+    r = np.asarray(distance, dtype=dtype).reshape(-1)
+    az = np.asarray(azimuth, dtype=dtype).reshape(-1)
+    el = np.asarray(elevation, dtype=dtype).reshape(-1)
+    xyz = np.empty((len(r), 3), dtype=dtype)
+    horizontal = r * np.cos(el)
+    np.multiply(horizontal, np.cos(az), out=xyz[:, 0])
+    np.multiply(horizontal, np.sin(az), out=xyz[:, 1])
+    np.multiply(r, np.sin(el), out=xyz[:, 2])
+    return xyz
+
+def _visualization_markers(sectors: List[str], xyz: np.ndarray, distance: List[float],
+                           frequency: List[float], gain: List[float], targets: List[int],
+                           n_obstacles: Optional[int] = None) -> Dict:
+    """
+    Build the visualization payload from per-row columns (positions already
+    converted). The first n_obstacles rows (default: all) become obstacle
+    markers; targets are row indices in priority order.
+    """
+    positions = [{"x": x, "y": y, "z": z} for x, y, z in xyz.tolist()]
+    return {
+        "obstacle_markers": [{
+            "id": f"obstacle_{sector}",
+            "sector": sector,
+            "position": positions[i],
+            "distance": distance[i],
+            "audio_frequency": frequency[i],
+            "intensity": gain[i]
+        } for i, sector in enumerate(sectors[:n_obstacles])],
+        "audio_zones": [],
+        "priority_targets": [{
+            "id": f"target_{rank}",
+            "sector": sectors[i],
+            "priority": rank + 1,
+            "position": dict(positions[i]),
+            "distance": distance[i],
+            "audio_frequency": frequency[i]
+        } for rank, i in enumerate(targets)]
+    }
+
 def convert_to_visualization_format(obstacles: Dict, targets: List) -> Dict:
     """
     Convert spatial audio data to format suitable for frontend visualization
@@ -55,52 +211,129 @@ def convert_to_visualization_format(obstacles: Dict, targets: List) -> Dict:
     Returns:
         Dictionary formatted for frontend consumption
     """
-    visualization_data = {
-        "obstacle_markers": [],
-        "audio_zones": [],
-        "priority_targets": []
+    # Obstacles and targets are converted together in one vectorized pass
+    items = list(obstacles.values()) + list(targets)
+    if not items:
+        return {"obstacle_markers": [], "audio_zones": [], "priority_targets": []}
+    rae = np.array([(d["distance"], d["azimuth_rad"], d["elevation_rad"]) for d in items])
+    xyz = spherical_to_cartesian(rae[:, 0], rae[:, 1], rae[:, 2])
+    n = len(obstacles)
+    sectors = list(obstacles.keys()) + [t["sector"] for t in targets]
+    return _visualization_markers(sectors, xyz,
+                                  rae[:, 0].tolist(),
+                                  [d["audio_params"]["frequency"] for d in items],
+                                  [d["audio_params"].get("gain") for d in items],
+                                  list(range(n, len(items))), n_obstacles=n)
+
+def analysis_to_visualization(table: Dict) -> Dict:
+    """
+    Visualization payload (same shape as convert_to_visualization_format)
+    straight from a columnar analysis result; targets reuse the positions of
+    their sector rows.
+
+    Args:
+        table: columnar result from analyze_sectors
+
+    Returns:
+        Dictionary formatted for frontend consumption
+    """
+    xyz = spherical_to_cartesian(table["distance"], table["azimuth"], table["elevation"])
+    return _visualization_markers(list(table["sector"]), xyz,
+                                  np.asarray(table["distance"]).tolist(),
+                                  np.asarray(table["frequency"]).tolist(),
+                                  np.asarray(table["gain"]).tolist(),
+                                  np.asarray(table["targets"]).tolist())
+
+def analysis_to_json(table: Dict) -> Dict:
+    """
+    Serialize a columnar analysis result into the full (legacy) JSON shape
+    returned by /api/spatial-audio/analyze.
+
+    Args:
+        table: columnar result from analyze_sectors
+
+    Returns:
+        Dictionary with "obstacles", "targets" and "total_obstacles"
+    """
+    # One vectorized conversion per column, then plain Python floats
+    cols = {
+        "distance": table["distance"].tolist(),
+        "azimuth_deg": np.degrees(table["azimuth"]).tolist(),
+        "elevation_deg": np.degrees(table["elevation"]).tolist(),
+        "azimuth_rad": table["azimuth"].tolist(),
+        "elevation_rad": table["elevation"].tolist(),
+        "frequency": table["frequency"].tolist(),
+        "tremolo_rate": table["tremolo_rate"].tolist(),
+        "gain": table["gain"].tolist(),
     }
-    
-    # Convert obstacles to visualization markers
-    for sector, data in obstacles.items():
-        # Convert spherical to cartesian for visualization
-        distance = data["distance"]
-        azimuth = data["azimuth_rad"]
-        elevation = data["elevation_rad"]
-        
-        # Convert to cartesian coordinates
-        x = distance * np.cos(elevation) * np.cos(azimuth)
-        y = distance * np.cos(elevation) * np.sin(azimuth)
-        z = distance * np.sin(elevation)
-        
-        visualization_data["obstacle_markers"].append({
-            "id": f"obstacle_{sector}",
-            "sector": sector,
-            "position": {"x": float(x), "y": float(y), "z": float(z)},
-            "distance": distance,
-            "audio_frequency": data["audio_params"]["frequency"],
-            "intensity": data["audio_params"]["gain"]
-        })
-    
-    # Convert targets to priority visualization
-    for i, target in enumerate(targets):
-        sector = target["sector"]
-        distance = target["distance"]
-        azimuth = target["azimuth_rad"]
-        elevation = target["elevation_rad"]
-        
-        # Convert to cartesian coordinates
-        x = distance * np.cos(elevation) * np.cos(azimuth)
-        y = distance * np.cos(elevation) * np.sin(azimuth)
-        z = distance * np.sin(elevation)
-        
-        visualization_data["priority_targets"].append({
-            "id": f"target_{i}",
-            "sector": sector,
-            "priority": i + 1,
-            "position": {"x": float(x), "y": float(y), "z": float(z)},
-            "distance": distance,
-            "audio_frequency": target["audio_params"]["frequency"]
+
+    rows = []
+    for i in range(len(table["sector"])):
+        rows.append({
+            "distance": cols["distance"][i],
+            "azimuth_deg": cols["azimuth_deg"][i],
+            "elevation_deg": cols["elevation_deg"][i],
+            "azimuth_rad": cols["azimuth_rad"][i],
+            "elevation_rad": cols["elevation_rad"][i],
+            "audio_params": {
+                "frequency": cols["frequency"][i],
+                "tremolo_rate": cols["tremolo_rate"][i],
+                "gain": cols["gain"][i]
+            }
         })
-    
-    return visualization_data
+
+    targets = []
+    for i in table["targets"].tolist():
+        targets.append({"sector": table["sector"][i], **rows[i]})
+
+    return {
+        "obstacles": dict(zip(table["sector"], rows)),
+        "targets": targets,
+        "total_obstacles": len(rows)
+    }
+
+def analysis_to_compact(table: Dict, decimals: int = 4) -> Dict:
+    """
+    Serialize a columnar analysis result as parallel arrays (one per field).
+
+    Args:
+        table: columnar result from analyze_sectors
+        decimals: rounding applied to every float column
+
+    Returns:
+        Dictionary with "sectors", one list per field in ANALYSIS_FIELDS and
+        "targets" as row indices sorted by salience
+    """
+    out = {"sectors": list(table["sector"])}
+    for field in ANALYSIS_FIELDS:
+        out[field] = np.round(table[field], decimals).tolist()
+    out["targets"] = table["targets"].tolist()
+    return out
+
+def analysis_to_binary(table: Dict) -> bytes:
+    """
+    Serialize a columnar analysis result into a little-endian binary payload.
+
+    Layout:
+        header      "SNAV", version u8, sector count n u8, target count k u8
+        sectors     n x u8 sector index (FL, FR, BL, BR, UP, DOWN = 0..5)
+        values      n x len(ANALYSIS_FIELDS) float32, row-major
+        targets     k x u8 row index, sorted by salience
+
+    Args:
+        table: columnar result from analyze_sectors
+
+    Returns:
+        bytes payload
+    """
+    n = len(table["sector"])
+    targets = np.asarray(table["targets"], dtype=np.uint8)
+    values = np.empty((n, len(ANALYSIS_FIELDS)), dtype="<f4")
+    for j, field in enumerate(ANALYSIS_FIELDS):
+        values[:, j] = table[field]
+    return b"".join([
+        _BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, n, len(targets)),
+        np.asarray(table["sector_index"], dtype=np.uint8).tobytes(),
+        values.tobytes(),
+        targets.tobytes(),
+    ])
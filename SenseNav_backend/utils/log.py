@@ -0,0 +1,178 @@
+"""
+Structured, non-blocking logging for the request and render paths.
+
+Modules log through the standard library (logging.getLogger("sensenav.<area>"));
+entry points call setup_logging() once. Records then go through a
+QueueHandler, so the calling thread only pays for building the record and a
+queue put (a few microseconds). A QueueListener thread formats, redacts and
+writes them.
+
+  - levels per logger as usual; the root level comes from SENSENAV_LOG_LEVEL
+    (default INFO)
+  - SENSENAV_LOG_FORMAT=json emits one JSON object per line, with any
+    `extra=` fields as keys; the default is a one-line text format
+  - high-frequency events pass extra=sampled(n) (or {"sample_every": n}) and
+    only every n-th occurrence of that call site is queued; the count of
+    skipped ones rides along as "sampled_out"
+  - bearer tokens, "api_key"-style fields and the values of secret
+    environment variables (SUNO_API_KEY, ...) are masked before anything is
+    written
+
+    from log import setup_logging
+    setup_logging()
+    log = logging.getLogger("sensenav.api")
+    log.info("analyzed %d points", n, extra={"points": n, "ms": 3.2})
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+
+ROOT = "sensenav"
+SECRET_ENV = ("SUNO_API_KEY",)
+MASK = "***"
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_SECRET_KEY = re.compile(r"(?i)^(?:api[_-]?key|authorization|token|secret)$")
+_PATTERNS = [
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._~+/=-]+"), r"\1" + MASK),
+    (re.compile(r"(?i)(['\"]?(?:api[_-]?key|authorization|token|secret)['\"]?\s*[:=]\s*['\"]?)"
+                r"(?!bearer\b)[^'\",\s}]+"), r"\1" + MASK),
+]
+
+_listener = None
+_lock = threading.Lock()
+
+
+def sampled(every):
+    """extra= for a high-frequency event: log one in `every` occurrences."""
+    return {"sample_every": int(every)}
+
+
+class SamplingFilter(logging.Filter):
+    """Passes every n-th record per call site for records with a sample_every attribute."""
+
+    def __init__(self):
+        super().__init__()
+        self._counts = {}
+
+    def filter(self, record):
+        every = getattr(record, "sample_every", None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        n = self._counts.get(key, 0)
+        self._counts[key] = n + 1
+        if n % every:
+            return False
+        record.sampled_out = every - 1 if n else 0
+        return True
+
+
+class Redactor:
+    """Masks secrets in strings: known patterns plus literal secret values from the environment."""
+
+    def __init__(self, secret_env=SECRET_ENV):
+        self.secret_env = secret_env
+
+    def __call__(self, text):
+        for pattern, repl in _PATTERNS:
+            text = pattern.sub(repl, text)
+        for name in self.secret_env:
+            value = os.environ.get(name)
+            if value and len(value) >= 4:
+                text = text.replace(value, MASK)
+        return text
+
+    def value(self, value):
+        """Redact a structured value (an extra= field): strings, containers, secret-named keys."""
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, dict):
+            return {k: MASK if isinstance(k, str) and _SECRET_KEY.match(k) else self.value(v)
+                    for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.value(v) for v in value]
+        return self(str(value))
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, redact):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+        self.redact = redact
+
+    def format(self, record):
+        return self.redact(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact):
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record):
+        # Redact the fields before encoding: json.dumps escapes quotes inside
+        # them, which the patterns would no longer match
+        out = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": self.redact(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "sample_every":
+                out[key] = MASK if _SECRET_KEY.match(key) else self.redact.value(value)
+        if record.exc_info:
+            out["exc"] = self.redact(self.formatException(record.exc_info))
+        return json.dumps(out)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The stock prepare() formats the message on the caller's thread. The
+        # queue is in-process, so hand the record over as-is and let the
+        # listener do the % formatting (callers pass immutable args).
+        return record
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """
+    Route the "sensenav" loggers through a background queue listener.
+    Safe to call more than once (later calls only change the level).
+    """
+    global _listener
+    level = level or os.environ.get("SENSENAV_LOG_LEVEL", "INFO")
+    root = logging.getLogger(ROOT)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    with _lock:
+        if _listener is not None:
+            return root
+        fmt = (fmt or os.environ.get("SENSENAV_LOG_FORMAT", "text")).lower()
+        redact = Redactor()
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(JsonFormatter(redact) if fmt == "json" else TextFormatter(redact))
+
+        q = queue.SimpleQueue()
+        queue_handler = _QueueHandler(q)
+        queue_handler.addFilter(SamplingFilter())
+        root.addHandler(queue_handler)
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(q, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """Flush the queue and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,166 @@
+"""
+Deadline-aware quality scaling.
+
+Every stage of the pipeline normally runs at full quality: whole point
+clouds, 48 kHz synthesis with all harmonics and effects, native-size depth
+inference. QualityController watches per-frame latency against a budget and
+steps through LEVELS instead:
+
+  - over budget for `down_after` consecutive frames -> one level down
+  - under `headroom` x budget for `up_after` consecutive frames -> one level up
+  - in between nothing changes, so the level doesn't oscillate
+  - budget_ms <= 0 (or None) pins start_level; frames are still timed
+
+Each level is a dict of knobs the stages read (ctl.params):
+    point_budget   max points handed to the sector search (subsample_points)
+    harmonics      overtones kept per tone (None = all, 0 = pure sine)
+    fs             internal synthesis sample rate
+    effects        run chorus / vibrato / darken
+    input_scale    depth inference input size relative to the model's native size
+
+    ctl = QualityController(budget_ms=100, on_change=apply_levels)
+    with ctl.frame():
+        with ctl.stage("analyze"):
+            cloud = subsample_points(cloud, ctl.params["point_budget"])
+            ...
+    ctl.snapshot()     # level, timings, transitions (served by /api/quality)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+LEVELS = (
+    {"name": "full", "point_budget": None, "harmonics": None, "fs": 48000, "effects": True, "input_scale": 1.0},
+    {"name": "high", "point_budget": 200_000, "harmonics": None, "fs": 48000, "effects": True, "input_scale": 1.0},
+    {"name": "medium", "point_budget": 50_000, "harmonics": 1, "fs": 32000, "effects": True, "input_scale": 0.875},
+    {"name": "low", "point_budget": 20_000, "harmonics": 1, "fs": 24000, "effects": False, "input_scale": 0.75},
+    {"name": "minimal", "point_budget": 5_000, "harmonics": 0, "fs": 16000, "effects": False, "input_scale": 0.625},
+)
+
+
+def subsample_points(points: np.ndarray, budget: Optional[int], keep_within: float = 1.5) -> np.ndarray:
+    """
+    Reduce a cloud to about `budget` points. Every point closer than
+    keep_within meters is kept (so near obstacles, and the per-sector minima
+    below that range, are exact); the rest are strided evenly.
+    """
+    if budget is None or len(points) <= budget:
+        return points
+    d2 = np.einsum("ij,ij->i", points, points)
+    keep = d2 < keep_within * keep_within
+    far = np.flatnonzero(~keep)
+    remaining = budget - (len(points) - len(far))
+    if remaining > 0 and len(far):
+        keep[far[::-(-len(far) // remaining)]] = True
+    return points[keep]
+
+
+def scaled_input_size(native: int, scale: float, multiple: int = 32) -> int:
+    """Inference input size for a quality level, rounded to a multiple the models accept."""
+    return max(multiple, int(round(native * scale / multiple)) * multiple)
+
+
+class QualityController:
+    def __init__(self, budget_ms: Optional[float] = 100.0, levels=LEVELS, down_after: int = 2, up_after: int = 30,
+                 headroom: float = 0.6, ema: float = 0.2, start_level: int = 0,
+                 on_change: Optional[Callable[[Dict], None]] = None):
+        self.budget = budget_ms / 1000.0 if budget_ms and budget_ms > 0 else None    # None = fixed level
+        self.levels = levels
+        self.down_after = down_after
+        self.up_after = up_after
+        self.headroom = headroom
+        self.ema = ema
+        self.on_change = on_change
+        self.level = min(max(int(start_level), 0), len(levels) - 1)
+        self.over = 0                 # consecutive frames over budget
+        self.under = 0                # consecutive frames under headroom
+        self.frames = 0
+        self.transitions = 0
+        self.last_s = None
+        self.ema_s = None
+        self.stage_ema: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if on_change is not None:
+            on_change(self.params)
+
+    @property
+    def params(self) -> Dict:
+        return self.levels[self.level]
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time one stage of the current frame (per thread)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = getattr(self._local, "stages", None)
+            if stages is not None:
+                stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+
+    @contextmanager
+    def frame(self):
+        """Time one frame; the level is updated when it ends."""
+        self._local.stages = {}
+        t0 = time.perf_counter()
+        try:
+            yield self.params
+        finally:
+            stages, self._local.stages = self._local.stages, None
+            self.record_frame(time.perf_counter() - t0, stages)
+
+    def record_frame(self, seconds: float, stages: Optional[Dict[str, float]] = None) -> int:
+        """Account one frame that took `seconds` (e.g. capture-to-output latency); returns the level."""
+        with self._lock:
+            self.frames += 1
+            self.last_s = seconds
+            self.ema_s = seconds if self.ema_s is None else self.ema_s + self.ema * (seconds - self.ema_s)
+            for name, s in (stages or {}).items():
+                old = self.stage_ema.get(name)
+                self.stage_ema[name] = s if old is None else old + self.ema * (s - old)
+
+            level = self.level
+            if self.budget is None:
+                pass
+            elif seconds > self.budget:
+                self.over, self.under = self.over + 1, 0
+                if self.over >= self.down_after and level < len(self.levels) - 1:
+                    level += 1
+            elif seconds < self.headroom * self.budget:
+                self.over, self.under = 0, self.under + 1
+                if self.under >= self.up_after and level > 0:
+                    level -= 1
+            else:
+                self.over = self.under = 0
+            changed = level != self.level
+            if changed:
+                self.level = level
+                self.over = self.under = 0
+                self.transitions += 1
+        if changed and self.on_change is not None:
+            self.on_change(self.params)
+        return self.level
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "level": self.level,
+                "max_level": len(self.levels) - 1,
+                "params": dict(self.params),
+                "budget_ms": None if self.budget is None else 1e3 * self.budget,
+                "last_ms": None if self.last_s is None else 1e3 * self.last_s,
+                "ema_ms": None if self.ema_s is None else 1e3 * self.ema_s,
+                "stage_ema_ms": {name: 1e3 * s for name, s in self.stage_ema.items()},
+                "frames": self.frames,
+                "transitions": self.transitions,
+            }
+
+    def summary(self) -> str:
+        ema = "-" if self.ema_s is None else f"{1e3 * self.ema_s:.0f}"
+        if self.budget is None:
+            return f"quality {self.params['name']} (level {self.level} fixed, {ema} ms)"
+        return f"quality {self.params['name']} (level {self.level}, {ema}/{1e3 * self.budget:.0f} ms)"
@@ -0,0 +1,404 @@
+"""
+Session recording and replay.
+
+A recording is a directory of append-only columns plus a small JSON header:
+
+    meta.json        format version, sector order, column dtypes / row shapes
+    points.bin       float32 (N, 3), the point clouds of all frames back to back
+    t.bin            float64 capture time (time.time()) per frame
+    frame_id.bin     int64 source frame id
+    point_offset.bin int64 first row of the frame in points.bin
+    n_points.bin     int64 rows of the frame in points.bin
+    sectors.bin      float32 (6, 3) nearest (r, az, el) per sector, NaN = empty
+    targets.bin      int8 (MAX_TARGETS,) sector indices by salience, -1 = none
+    bbox_offset.bin  int64 first row of the frame in bboxes.bin
+    n_bboxes.bin     int64 rows of the frame in bboxes.bin
+    bboxes.bin       float32 (M, 5) x, y, width, height, depth
+
+Columns are written with plain appends, so a recording can be read (and
+memory-mapped) while it is still being written; the reader only exposes
+frames whose every column is complete. Reading is zero-copy: points(i) and
+friends are views into the memory maps.
+
+    rec = Recorder("sessions/run1")
+    rec.write(points, sectors=table, bboxes=[(x, y, w, h, depth)])
+    rec.close()
+
+    log = Recording("sessions/run1")
+    i = log.index_at(t)                 # random access by time
+    cloud = log.points(i)               # (n, 3) float32 view
+
+Replay (re-analysis, API or shared-memory ring) at any speed:
+    python3 recording.py sessions/run1 --speed 4 --publish sensenav_cloud
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# Same order as closest_obstacle_audio.SECTORS
+SECTOR_NAMES = ("FL", "FR", "BL", "BR", "UP", "DOWN")
+MAX_TARGETS = 3
+
+# name -> (dtype, row shape)
+COLUMNS = {
+    "points": ("float32", (3,)),
+    "t": ("float64", ()),
+    "frame_id": ("int64", ()),
+    "point_offset": ("int64", ()),
+    "n_points": ("int64", ()),
+    "sectors": ("float32", (len(SECTOR_NAMES), 3)),
+    "targets": ("int8", (MAX_TARGETS,)),
+    "bbox_offset": ("int64", ()),
+    "n_bboxes": ("int64", ()),
+    "bboxes": ("float32", (5,)),
+}
+# Columns with one row per frame (points and bboxes are indexed through offsets)
+FRAME_COLUMNS = ("t", "frame_id", "point_offset", "n_points", "sectors", "targets", "bbox_offset", "n_bboxes")
+
+
+def sectors_to_array(sectors) -> np.ndarray:
+    """
+    (6, 3) float32 array from either a nearest_by_sector() dict
+    (sector -> (r, az, el)) or a columnar analyze_sectors() table.
+    """
+    out = np.full((len(SECTOR_NAMES), 3), np.nan, dtype=np.float32)
+    if not sectors:
+        return out
+    if "sector_index" in sectors:
+        idx = np.asarray(sectors["sector_index"], dtype=np.intp)
+        out[idx, 0] = sectors["distance"]
+        out[idx, 1] = sectors["azimuth"]
+        out[idx, 2] = sectors["elevation"]
+        return out
+    for name, rae in sectors.items():
+        out[SECTOR_NAMES.index(name)] = rae
+    return out
+
+
+def targets_to_array(targets, sectors=None) -> np.ndarray:
+    """
+    (MAX_TARGETS,) int8 sector indices from a choose_targets() list, a list of
+    sector names, or the "targets" row indices of a columnar table.
+    """
+    out = np.full(MAX_TARGETS, -1, dtype=np.int8)
+    if targets is None:
+        if sectors is not None and "targets" in sectors:
+            targets = [int(sectors["sector_index"][i]) for i in sectors["targets"]]
+        else:
+            return out
+    idx = []
+    for t in list(targets)[:MAX_TARGETS]:
+        if isinstance(t, (tuple, list)):
+            t = t[0]
+        idx.append(SECTOR_NAMES.index(t) if isinstance(t, str) else int(t))
+    out[:len(idx)] = idx
+    return out
+
+
+class Recorder:
+    """Append frames to a recording directory. Safe to call from several threads."""
+
+    def __init__(self, path: str, flush_every: int = 30):
+        """
+        Args:
+            path: recording directory (created if missing; appended to if it exists)
+            flush_every: flush the column files every N frames
+        """
+        self.path = path
+        self.flush_every = flush_every
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            meta = {
+                "version": FORMAT_VERSION,
+                "sectors": list(SECTOR_NAMES),
+                "columns": {name: {"dtype": dtype, "shape": list(shape)}
+                            for name, (dtype, shape) in COLUMNS.items()},
+            }
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=2)
+
+        # Resume after the last complete frame of an existing recording
+        existing = Recording(path) if os.path.exists(os.path.join(path, "t.bin")) else None
+        self.frames = len(existing) if existing is not None else 0
+        self._n_points = existing.total_points if existing is not None else 0
+        self._n_bboxes = existing.total_bboxes if existing is not None else 0
+        if existing is not None:
+            existing.close()
+            # Cut off a frame that was only partly written (e.g. after a crash)
+            rows = dict.fromkeys(FRAME_COLUMNS, self.frames)
+            rows.update(points=self._n_points, bboxes=self._n_bboxes)
+            for name, (dtype, shape) in COLUMNS.items():
+                column = os.path.join(path, name + ".bin")
+                if os.path.exists(column):
+                    os.truncate(column, rows[name] * _row_bytes(np.dtype(dtype), shape))
+
+        self._files = {name: open(os.path.join(path, name + ".bin"), "ab") for name in COLUMNS}
+        self._lock = threading.Lock()
+
+    def write(self, points: Optional[np.ndarray] = None, t: Optional[float] = None, frame_id: Optional[int] = None,
+              sectors=None, targets=None, bboxes: Optional[Iterable[Sequence[float]]] = None) -> int:
+        """
+        Append one frame. Returns its index in the recording.
+
+        Args:
+            points: (N, 3) cloud (stored as float32); None for frames without one
+            t: capture time (time.time() clock); defaults to now
+            frame_id: source frame id; defaults to the frame index
+            sectors: nearest_by_sector() dict or analyze_sectors() table
+            targets: choose_targets() list or sector names; taken from a
+                     columnar `sectors` table when omitted
+            bboxes: iterable of (x, y, width, height, depth)
+        """
+        pts = np.zeros((0, 3), dtype=np.float32) if points is None else \
+            np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 3)
+        boxes = np.asarray(list(bboxes) if bboxes is not None else [], dtype=np.float32).reshape(-1, 5)
+        sec = sectors_to_array(sectors)
+        tgt = targets_to_array(targets, sectors if isinstance(sectors, dict) else None)
+        t = time.time() if t is None else t
+
+        with self._lock:
+            index = self.frames
+            # Variable-length columns first: a frame only becomes visible to
+            # readers once its per-frame columns exist.
+            self._files["points"].write(pts.tobytes())
+            self._files["bboxes"].write(boxes.tobytes())
+            row = {
+                "t": np.float64(t),
+                "frame_id": np.int64(index if frame_id is None else frame_id),
+                "point_offset": np.int64(self._n_points),
+                "n_points": np.int64(len(pts)),
+                "sectors": sec,
+                "targets": tgt,
+                "bbox_offset": np.int64(self._n_bboxes),
+                "n_bboxes": np.int64(len(boxes)),
+            }
+            for name in FRAME_COLUMNS:
+                self._files[name].write(np.asarray(row[name]).tobytes())
+            self._n_points += len(pts)
+            self._n_bboxes += len(boxes)
+            self.frames += 1
+            if self.frames % self.flush_every == 0:
+                self.flush()
+        return index
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _row_bytes(dtype: np.dtype, shape: Tuple[int, ...]) -> int:
+    return dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+
+def _map_column(path: str, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    row_bytes = _row_bytes(dtype, shape)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    rows = size // row_bytes
+    if rows == 0:
+        return np.zeros((0,) + shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,) + shape)
+
+
+class Recording:
+    """Read-only, memory-mapped view of a recording directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version {self.meta.get('version')} in {path}")
+        self.sector_names = tuple(self.meta["sectors"])
+        self.refresh()
+
+    def refresh(self):
+        """Re-map the columns (picks up frames appended since opening)."""
+        cols = {}
+        for name, spec in self.meta["columns"].items():
+            cols[name] = _map_column(os.path.join(self.path, name + ".bin"),
+                                     np.dtype(spec["dtype"]), tuple(spec["shape"]))
+        n = min(len(cols[name]) for name in FRAME_COLUMNS)
+        if n:
+            # Drop a trailing frame whose points / bboxes are not fully on disk yet
+            ends_p = cols["point_offset"][:n] + cols["n_points"][:n]
+            ends_b = cols["bbox_offset"][:n] + cols["n_bboxes"][:n]
+            complete = (ends_p <= len(cols["points"])) & (ends_b <= len(cols["bboxes"]))
+            n = int(np.argmin(complete)) if not complete.all() else n
+        self._n = n
+        for name in FRAME_COLUMNS:
+            setattr(self, name, cols[name][:n])
+        self._points = cols["points"]
+        self._bboxes = cols["bboxes"]
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def total_points(self) -> int:
+        return int(self.point_offset[-1] + self.n_points[-1]) if self._n else 0
+
+    @property
+    def total_bboxes(self) -> int:
+        return int(self.bbox_offset[-1] + self.n_bboxes[-1]) if self._n else 0
+
+    @property
+    def duration(self) -> float:
+        return float(self.t[-1] - self.t[0]) if self._n else 0.0
+
+    # ---------- random access ----------
+    def points(self, i: int) -> np.ndarray:
+        """(n, 3) float32 view of frame i's cloud."""
+        start = int(self.point_offset[i])
+        return self._points[start:start + int(self.n_points[i])]
+
+    def bboxes(self, i: int) -> np.ndarray:
+        """(m, 5) float32 view of frame i's boxes (x, y, width, height, depth)."""
+        start = int(self.bbox_offset[i])
+        return self._bboxes[start:start + int(self.n_bboxes[i])]
+
+    def points_range(self, start: int, stop: int) -> np.ndarray:
+        """All points of frames start..stop-1 as one contiguous view."""
+        if stop <= start:
+            return self._points[:0]
+        first = int(self.point_offset[start])
+        last = int(self.point_offset[stop - 1] + self.n_points[stop - 1])
+        return self._points[first:last]
+
+    def sectors_dict(self, i: int) -> Dict[str, Tuple[float, float, float]]:
+        """Frame i's recorded sectors in nearest_by_sector() form."""
+        rows = self.sectors[i]
+        return {name: tuple(float(v) for v in rows[k])
+                for k, name in enumerate(self.sector_names) if not np.isnan(rows[k, 0])}
+
+    def target_names(self, i: int) -> list:
+        return [self.sector_names[k] for k in self.targets[i] if k >= 0]
+
+    def index_at(self, t: float) -> int:
+        """Index of the last frame captured at or before t (0 if t precedes the recording)."""
+        return max(int(np.searchsorted(self.t, t, side="right")) - 1, 0)
+
+    def between(self, t0: float, t1: float) -> slice:
+        """Frames with t0 <= t < t1."""
+        return slice(int(np.searchsorted(self.t, t0, side="left")),
+                     int(np.searchsorted(self.t, t1, side="left")))
+
+    def frame(self, i: int) -> dict:
+        return {
+            "index": i,
+            "t": float(self.t[i]),
+            "frame_id": int(self.frame_id[i]),
+            "points": self.points(i),
+            "sectors": self.sectors_dict(i),
+            "targets": self.target_names(i),
+            "bboxes": self.bboxes(i),
+        }
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self.frame(i)
+
+    def close(self):
+        for name in FRAME_COLUMNS:
+            setattr(self, name, None)
+        self._points = self._bboxes = None
+        self._n = 0
+
+
+# ---------- replay ----------
+def replay(recording: Recording, handle: Callable[[dict], object], speed: float = 1.0,
+           start: Optional[float] = None, end: Optional[float] = None) -> int:
+    """
+    Feed recorded frames to handle(frame) with their original spacing divided
+    by `speed` (speed <= 0 or inf: as fast as possible). start / end are
+    offsets in seconds from the beginning of the recording.
+    Returns the number of frames replayed.
+    """
+    if len(recording) == 0:
+        return 0
+    t0 = float(recording.t[0])
+    sl = recording.between(t0 + (start or 0.0), t0 + end if end is not None else np.inf)
+    paced = 0 < speed < np.inf
+    wall0 = time.perf_counter()
+    first = None
+    count = 0
+    for i in range(sl.start, sl.stop):
+        frame = recording.frame(i)
+        if paced:
+            if first is None:
+                first = frame["t"]
+            delay = (frame["t"] - first) / speed - (time.perf_counter() - wall0)
+            if delay > 0:
+                time.sleep(delay)
+        handle(frame)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded session')
+    parser.add_argument('path', help='Recording directory')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed (0 = as fast as possible)')
+    parser.add_argument('--start', type=float, default=None, help='Start offset (s)')
+    parser.add_argument('--end', type=float, default=None, help='End offset (s)')
+    parser.add_argument('--post', type=str, default=None, metavar='URL',
+                        help='POST each frame to an /api/spatial-audio/analyze endpoint')
+    parser.add_argument('--publish', type=str, default=None, metavar='NAME',
+                        help='Publish each cloud to the shared-memory ring NAME')
+    args = parser.parse_args()
+
+    rec = Recording(args.path)
+    print(f"{args.path}: {len(rec)} frames, {rec.total_points} points, {rec.duration:.1f}s")
+    sinks = []
+
+    if args.publish:
+        from shm_ring import ShmRing
+        capacity = int(rec.n_points.max()) if len(rec) else 1
+        ring = ShmRing.create(args.publish, n_slots=8, capacity=max(capacity, 1), row_shape=(3,))
+        sinks.append(lambda f: ring.publish(f["points"], frame_id=f["frame_id"]))
+    if args.post:
+        import requests
+        session = requests.Session()
+        sinks.append(lambda f: session.post(args.post, json={"points": f["points"].tolist()}))
+    if not sinks:
+        # Re-run the analysis and report frames whose nearest sectors changed
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spatial_audio'))
+        from closest_obstacle_audio import nearest_by_sector
+        mismatches = []
+
+        def check(f):
+            fresh = sectors_to_array(nearest_by_sector(np.asarray(f["points"])))
+            if not np.allclose(fresh, rec.sectors[f["index"]], atol=1e-4, equal_nan=True):
+                mismatches.append(f["index"])
+        sinks.append(check)
+
+    t0 = time.perf_counter()
+    n = replay(rec, lambda f: [sink(f) for sink in sinks], speed=args.speed, start=args.start, end=args.end)
+    elapsed = time.perf_counter() - t0
+    print(f"Replayed {n} frames in {elapsed:.2f}s ({n / elapsed if elapsed > 0 else 0:.1f} fps)")
+    if args.publish:
+        ring.close()
+    if not args.publish and not args.post:
+        print(f"{len(mismatches)} frames differ from the recorded sectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Parallel offline re-scoring of recorded sessions.
+
+Re-runs the sector analysis (nearest_by_sector, distance_to_params,
+obstacle_score, target selection) over every frame of a recording, e.g.
+after tuning the cue mapping, and writes the results as columns:
+
+    out/meta.json      source, frame count, sector order, options
+    out/frame_id.npy   int64 (N,)
+    out/t.npy          float64 (N,) capture time
+    out/sectors.npy    float32 (N, 6, 3) nearest (r, az, el) per sector, NaN = empty
+    out/params.npy     float32 (N, 6, 3) tremolo rate, frequency, gain per sector
+    out/score.npy      float32 (N, 6) obstacle_score per sector
+    out/targets.npy    int8 (N, MAX_TARGETS) sector indices by salience, -1 = none
+    out/wav/NNNNNNNN.wav   rendered cue per frame (--wav)
+
+The source is a recording directory (utils/recording.py) or a directory of
+per-frame (n, 3) .npy clouds, read in name order. Frames are split into
+fixed-size chunks handed to a process pool; each worker memory-maps the
+source once, so a chunk only costs two integers to schedule and no point
+data is pickled. Every finished chunk is written to out/chunks/ (atomically),
+so an interrupted run resumes after the chunks it already completed; the
+final columns are assembled from the chunk files at the end.
+
+    python3 rescore.py sessions/20250914-101500 rescored/20250914 --workers 8
+    python3 rescore.py frames/ rescored/frames --chunk 64 --wav --mode sequential
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+_spatial_audio_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spatial_audio'))
+if _spatial_audio_dir not in sys.path:
+    sys.path.insert(0, _spatial_audio_dir)
+
+from closest_obstacle_audio import SECTORS, analyze_sectors, spatial_layers_from_pointcloud
+from recording import MAX_TARGETS, Recording
+
+
+class FrameSource:
+    """Frames of a recording directory or of a directory of .npy clouds."""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(os.path.join(path, "meta.json")):
+            self.recording = Recording(path)
+            self.files = None
+        else:
+            self.recording = None
+            self.files = sorted(glob.glob(os.path.join(path, "*.npy")))
+            if not self.files:
+                raise ValueError(f"{path} is neither a recording nor a directory of .npy frames")
+
+    def __len__(self):
+        return len(self.recording) if self.recording is not None else len(self.files)
+
+    def points(self, i):
+        if self.recording is not None:
+            return self.recording.points(i)
+        return np.load(self.files[i], mmap_mode="r").reshape(-1, 3)
+
+    def t(self, i):
+        if self.recording is not None:
+            return float(self.recording.t[i])
+        return os.path.getmtime(self.files[i])
+
+    def frame_id(self, i):
+        return int(self.recording.frame_id[i]) if self.recording is not None else i
+
+
+def write_wav(path, buf, fs):
+    """Float (n, channels) buffer in [-1, 1] -> 16-bit PCM WAV."""
+    buf = np.asarray(buf)
+    pcm = (np.clip(buf, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1 if pcm.ndim == 1 else pcm.shape[1])
+        w.setsampwidth(2)
+        w.setframerate(int(fs))
+        w.writeframes(pcm.tobytes())
+
+
+# ---------- worker ----------
+_worker = {}
+
+
+def _init_worker(source_path, opts):
+    _worker["source"] = FrameSource(source_path)
+    _worker["opts"] = opts
+
+
+def _chunk_path(out, k):
+    return os.path.join(out, "chunks", f"{k:06d}.npz")
+
+
+def process_chunk(k, start, stop):
+    """Analyze frames start..stop-1 and write chunk k. Returns (k, frames, points, seconds)."""
+    source, opts = _worker["source"], _worker["opts"]
+    t0 = time.perf_counter()
+    n = stop - start
+    n_sec = len(SECTORS)
+    sectors = np.full((n, n_sec, 3), np.nan, dtype=np.float32)
+    params = np.full((n, n_sec, 3), np.nan, dtype=np.float32)
+    score = np.full((n, n_sec), np.nan, dtype=np.float32)
+    targets = np.full((n, MAX_TARGETS), -1, dtype=np.int8)
+    frame_id = np.empty(n, dtype=np.int64)
+    t = np.empty(n, dtype=np.float64)
+    n_points = 0
+
+    for row, i in enumerate(range(start, stop)):
+        points = np.asarray(source.points(i))
+        n_points += len(points)
+        frame_id[row] = source.frame_id(i)
+        t[row] = source.t(i)
+        table = analyze_sectors(points, ignore_behind=opts["ignore_behind"], max_targets=MAX_TARGETS)
+        idx = table["sector_index"]
+        sectors[row, idx, 0] = table["distance"]
+        sectors[row, idx, 1] = table["azimuth"]
+        sectors[row, idx, 2] = table["elevation"]
+        params[row, idx, 0] = table["tremolo_rate"]
+        params[row, idx, 1] = table["frequency"]
+        params[row, idx, 2] = table["gain"]
+        score[row, idx] = table["score"]
+        targets[row, :len(table["targets"])] = idx[table["targets"]]
+
+        if opts["wav"] and len(idx):
+            buf = spatial_layers_from_pointcloud(points, fs=opts["fs"], dur=opts["dur"],
+                                                 ignore_behind=opts["ignore_behind"], mode=opts["mode"], play=False)
+            if buf is not None:
+                write_wav(os.path.join(opts["out"], "wav", f"{i:08d}.wav"), buf, opts["fs"])
+
+    path = _chunk_path(opts["out"], k)
+    tmp = path[:-len(".npz")] + ".tmp.npz"
+    np.savez(tmp, start=start, stop=stop, frame_id=frame_id, t=t, sectors=sectors,
+             params=params, score=score, targets=targets)
+    os.replace(tmp, path)
+    return k, n, n_points, time.perf_counter() - t0
+
+
+# ---------- driver ----------
+def plan_chunks(n_frames, chunk):
+    return [(k, start, min(start + chunk, n_frames)) for k, start in enumerate(range(0, n_frames, chunk))]
+
+
+def completed(out, k, stop):
+    """True if chunk k was written and covers frames up to `stop` (a recording may have grown since)."""
+    path = _chunk_path(out, k)
+    if not os.path.exists(path):
+        return False
+    try:
+        with np.load(path) as z:
+            return int(z["stop"]) == stop
+    except (OSError, ValueError, KeyError):
+        return False          # truncated by a crash before os.replace: redo
+
+
+def assemble(out, chunks, n_frames):
+    """Concatenate the chunk files into the final .npy columns (memory-mapped, constant memory)."""
+    n_sec = len(SECTORS)
+    specs = {
+        "frame_id": (np.int64, ()),
+        "t": (np.float64, ()),
+        "sectors": (np.float32, (n_sec, 3)),
+        "params": (np.float32, (n_sec, 3)),
+        "score": (np.float32, (n_sec,)),
+        "targets": (np.int8, (MAX_TARGETS,)),
+    }
+    cols = {name: np.lib.format.open_memmap(os.path.join(out, name + ".npy"), mode="w+",
+                                            dtype=dtype, shape=(n_frames,) + shape)
+            for name, (dtype, shape) in specs.items()}
+    for k, start, stop in chunks:
+        with np.load(_chunk_path(out, k)) as z:
+            for name, col in cols.items():
+                col[start:stop] = z[name]
+    for col in cols.values():
+        col.flush()
+    return cols
+
+
+def rescore(source_path, out, workers=None, chunk=256, wav=False, mode="sequential", fs=48000, dur=2.0,
+            ignore_behind=False, progress=print):
+    """Re-score every frame of `source_path` into `out`. Returns a summary dict."""
+    source = FrameSource(source_path)
+    n_frames = len(source)
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(os.path.join(out, "chunks"), exist_ok=True)
+    if wav:
+        os.makedirs(os.path.join(out, "wav"), exist_ok=True)
+
+    meta_path = os.path.join(out, "meta.json")
+    opts = {"out": out, "wav": wav, "mode": mode, "fs": fs, "dur": dur, "ignore_behind": ignore_behind}
+    meta = {"source": os.path.abspath(source_path), "chunk": chunk, "sectors": list(SECTORS),
+            "max_targets": MAX_TARGETS, "options": {k: v for k, v in opts.items() if k != "out"}}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            old = json.load(f)
+        if old.get("chunk") != chunk or old.get("options") != meta["options"]:
+            raise ValueError(f"{out} was written with chunk={old.get('chunk')} and options "
+                             f"{old.get('options')}; use a fresh output directory")
+    meta["frames"] = n_frames
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    chunks = plan_chunks(n_frames, chunk)
+    pending = [c for c in chunks if not completed(out, c[0], c[2])]
+    skipped = len(chunks) - len(pending)
+    if skipped:
+        progress(f"Resuming: {skipped}/{len(chunks)} chunks already done")
+
+    t0 = time.perf_counter()
+    done_frames = done_points = 0
+    last_report = t0
+
+    def account(result):
+        nonlocal done_frames, done_points, last_report
+        _, n, n_points, _ = result
+        done_frames += n
+        done_points += n_points
+        now = time.perf_counter()
+        if now - last_report >= 2.0:
+            last_report = now
+            progress(f"{done_frames}/{sum(c[2] - c[1] for c in pending)} frames, "
+                     f"{done_frames / (now - t0):.1f} frames/s")
+
+    if workers == 1 or len(pending) <= 1:
+        _init_worker(source_path, opts)
+        for c in pending:
+            account(process_chunk(*c))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(source_path, opts)) as pool:
+            futures = [pool.submit(process_chunk, *c) for c in pending]
+            for future in as_completed(futures):
+                account(future.result())
+    elapsed = time.perf_counter() - t0
+
+    cols = assemble(out, chunks, n_frames)
+    summary = {
+        "frames": n_frames,
+        "processed": done_frames,
+        "points": done_points,
+        "seconds": elapsed,
+        "fps": done_frames / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+    }
+    if source.recording is not None and n_frames:
+        # How many frames would now announce different targets than at record time
+        summary["targets_changed"] = int(np.any(cols["targets"][:] != source.recording.targets[:n_frames], axis=1).sum())
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score recorded frames in parallel')
+    parser.add_argument('source', help='Recording directory, or a directory of (n, 3) .npy clouds')
+    parser.add_argument('out', help='Output directory (re-running resumes it)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk', type=int, default=256, help='Frames per scheduled chunk')
+    parser.add_argument('--wav', action='store_true', help='Also render each frame\'s cue to out/wav/')
+    parser.add_argument('--mode', default='sequential', choices=['sequential', 'priority', 'unified', 'all'],
+                        help='Render mode for --wav')
+    parser.add_argument('--fs', type=int, default=48000, help='Sample rate for --wav')
+    parser.add_argument('--dur', type=float, default=2.0, help='Cue duration for --wav (s)')
+    parser.add_argument('--ignore_behind', action='store_true')
+    args = parser.parse_args()
+
+    summary = rescore(args.source, args.out, workers=args.workers, chunk=args.chunk, wav=args.wav,
+                      mode=args.mode, fs=args.fs, dur=args.dur, ignore_behind=args.ignore_behind,
+                      progress=lambda msg: print(msg, file=sys.stderr))
+    print(f"Re-scored {summary['processed']} of {summary['frames']} frames "
+          f"({summary['points']} points) in {summary['seconds']:.2f}s: "
+          f"{summary['fps']:.1f} frames/s with {summary['workers']} worker(s)")
+    if "targets_changed" in summary:
+        print(f"{summary['targets_changed']} frames changed targets against the recording")
+
+
+if __name__ == "__main__":
+    main()
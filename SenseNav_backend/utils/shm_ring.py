@@ -0,0 +1,202 @@
+"""
+Fixed-slot ring of arrays in multiprocessing.shared_memory.
+
+One writer process publishes frames (depth maps or Nx3 point clouds); any
+number of reader processes attach by name and read the newest frame as a
+NumPy view into shared memory, without copies, pickling or HTTP.
+
+Layout (little-endian):
+    header  64 B   magic "SNRG", version, slot count, row capacity, row
+                   shape, dtype, sequence number of the last published frame
+    slots   n x (32 B slot header + capacity * row bytes)
+    slot header    seq (u64), rows (u32), frame id (u64), timestamp (f64)
+
+Each slot is protected by a seqlock: the writer sets the slot seq to an odd
+value while copying, then to an even value derived from the frame sequence.
+Readers never lock; they check the slot seq before and after reading and
+retry (or report the frame as overwritten) if it changed.
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"SNRG"
+VERSION = 1
+MAX_ROW_DIMS = 3
+_HEADER = struct.Struct("<4sIIII" + "I" * MAX_ROW_DIMS + "8sQ")  # ..., dtype str, last seq
+_HEADER_SIZE = 64
+_SEQ_OFFSET = _HEADER.size - 8
+_SLOT_HEADER = struct.Struct("<QIxxxxQd")
+_SLOT_META = struct.Struct("<IxxxxQd")  # slot header after the seq field
+_SLOT_HEADER_SIZE = 32
+_SLOT_ALIGN = 64
+
+
+def _slot_bytes(capacity, row_shape, dtype):
+    row_bytes = int(np.prod(row_shape, dtype=np.int64)) * dtype.itemsize
+    size = _SLOT_HEADER_SIZE + capacity * row_bytes
+    return -(-size // _SLOT_ALIGN) * _SLOT_ALIGN
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach without letting this process's resource tracker unlink the segment on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class RingFrame:
+    """
+    Zero-copy view of one published frame. `data` points into shared memory
+    and may be overwritten once the writer laps the ring: check valid() after
+    using it, or call copy() for a private, validated copy.
+    """
+
+    def __init__(self, ring, slot, seq, data, frame_id, timestamp):
+        self._ring = ring
+        self._slot = slot
+        self.seq = seq
+        self.data = data
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+
+    def valid(self) -> bool:
+        return self._ring._slot_seq(self._slot) == 2 * self.seq + 2
+
+    def copy(self) -> Optional[np.ndarray]:
+        out = np.array(self.data, copy=True)
+        return out if self.valid() else None
+
+
+class ShmRing:
+    """Shared-memory ring; use ShmRing.create() in the writer and ShmRing.attach() in readers."""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        magic, version, n_slots, capacity, ndim, *rest = _HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Shared memory '{shm.name}' is not a SenseNav ring")
+        dims, dtype = rest[:MAX_ROW_DIMS], rest[MAX_ROW_DIMS]
+        self.n_slots = n_slots
+        self.capacity = capacity
+        self.row_shape = tuple(dims[:ndim])
+        self.dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        self.slot_bytes = _slot_bytes(capacity, self.row_shape, self.dtype)
+        self._slot_headers = [np.ndarray((1,), dtype=np.uint64, buffer=shm.buf,
+                                         offset=self._slot_offset(i)) for i in range(n_slots)]
+        self._payloads = [np.ndarray((capacity,) + self.row_shape, dtype=self.dtype, buffer=shm.buf,
+                                     offset=self._slot_offset(i) + _SLOT_HEADER_SIZE)
+                          for i in range(n_slots)]
+        self._last_seq = np.ndarray((1,), dtype=np.uint64, buffer=shm.buf, offset=_SEQ_OFFSET)
+
+    @classmethod
+    def create(cls, name: str, n_slots: int, capacity: int, row_shape: Tuple[int, ...] = (3,),
+               dtype="float32") -> "ShmRing":
+        """
+        Create a ring of n_slots frames of up to `capacity` rows of `row_shape`
+        (e.g. capacity=N, row_shape=(3,) for point clouds; capacity=H,
+        row_shape=(W,) for depth maps).
+        """
+        row_shape = tuple(int(d) for d in row_shape)
+        if len(row_shape) > MAX_ROW_DIMS:
+            raise ValueError(f"row_shape supports at most {MAX_ROW_DIMS} dims")
+        dtype = np.dtype(dtype)
+        slot_bytes = _slot_bytes(capacity, row_shape, dtype)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_SIZE + n_slots * slot_bytes)
+        dims = row_shape + (0,) * (MAX_ROW_DIMS - len(row_shape))
+        _HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, n_slots, capacity, len(row_shape),
+                          *dims, dtype.str.encode(), 0)
+        for i in range(n_slots):
+            _SLOT_HEADER.pack_into(shm.buf, _HEADER_SIZE + i * slot_bytes, 0, 0, 0, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmRing":
+        return cls(_attach(name), owner=False)
+
+    def _slot_offset(self, slot):
+        return _HEADER_SIZE + slot * self.slot_bytes
+
+    def _slot_seq(self, slot):
+        return int(self._slot_headers[slot][0])
+
+    @property
+    def last_seq(self) -> int:
+        """Number of frames published so far (the newest frame has seq last_seq - 1)."""
+        return int(self._last_seq[0])
+
+    # ---------- writer ----------
+    def publish(self, data: np.ndarray, frame_id: int = 0, timestamp: Optional[float] = None) -> int:
+        """Copy `data` (rows x row_shape, rows <= capacity) into the next slot. Returns its seq."""
+        rows = len(data)
+        if rows > self.capacity:
+            raise ValueError(f"{rows} rows exceed ring capacity {self.capacity}")
+        seq = self.last_seq
+        slot = seq % self.n_slots
+        header = self._slot_headers[slot]
+        header[0] = 2 * seq + 1                     # odd: write in progress
+        self._payloads[slot][:rows] = data
+        _SLOT_META.pack_into(self.shm.buf, self._slot_offset(slot) + 8, rows, frame_id,
+                             time.time() if timestamp is None else timestamp)
+        header[0] = 2 * seq + 2                     # even: frame `seq` complete
+        self._last_seq[0] = seq + 1
+        return seq
+
+    # ---------- readers ----------
+    def read(self, seq: int) -> Optional[RingFrame]:
+        """Frame `seq` as a zero-copy view, or None if it is not (or no longer) available."""
+        if seq < 0 or seq >= self.last_seq or seq < self.last_seq - self.n_slots:
+            return None
+        slot = seq % self.n_slots
+        if self._slot_seq(slot) != 2 * seq + 2:
+            return None
+        _, rows, frame_id, timestamp = _SLOT_HEADER.unpack_from(self.shm.buf, self._slot_offset(slot))
+        frame = RingFrame(self, slot, seq, self._payloads[slot][:rows], frame_id, timestamp)
+        return frame if frame.valid() else None
+
+    def latest(self) -> Optional[RingFrame]:
+        """Newest complete frame (retries if the writer lapped us mid-read)."""
+        for _ in range(self.n_slots):
+            last = self.last_seq
+            if last == 0:
+                return None
+            frame = self.read(last - 1)
+            if frame is not None:
+                return frame
+        return None
+
+    def wait_newer(self, seq: int, timeout: Optional[float] = None, poll_s: float = 0.001) -> Optional[RingFrame]:
+        """Newest frame with seq greater than `seq` (pass -1 for any), polling until `timeout`."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if self.last_seq - 1 > seq:
+                frame = self.latest()
+                if frame is not None and frame.seq > seq:
+                    return frame
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(poll_s)
+
+    def close(self):
+        """Detach (and unlink, in the creating process). RingFrame views must be released first."""
+        self._slot_headers = self._payloads = self._last_seq = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
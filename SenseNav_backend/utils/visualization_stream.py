@@ -0,0 +1,122 @@
+"""
+Versioned, delta-encoded visualization markers.
+
+Every analysis produces the full marker set (convert_to_visualization_format
+/ analysis_to_visualization), but from frame to frame most markers are
+unchanged or moved by millimeters. VisualizationStream keeps the markers as
+last sent and bumps a version only when a marker appeared, moved further
+than `move_threshold` meters, changed a non-positional field (sector,
+priority) or vanished. A client acknowledges the last version it applied and
+gets back only what changed since then:
+
+    stream = VisualizationStream()
+    stream.update(analysis_to_visualization(table))
+    stream.delta(since=client_version)
+    # {"version": 7, "since": 5, "full": False,
+    #  "upsert": [marker, ...], "remove": ["obstacle_BL"]}
+
+Positions compare against the last *published* position, so slow drift still
+gets through once it adds up to the threshold. Clients that are too far
+behind (older than the retained history) or new (since=0) get a full
+snapshot with "full": True. Thread-safe; wait() lets a streaming endpoint
+block until the next version.
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+MARKER_GROUPS = ("obstacle_markers", "priority_targets")
+
+
+def markers_by_id(visualization: Dict) -> Dict[str, Dict]:
+    """Flatten a visualization payload into id -> marker."""
+    out = {}
+    for group in MARKER_GROUPS:
+        for marker in visualization.get(group, ()):
+            out[marker["id"]] = marker
+    return out
+
+
+def _moved(old: Dict, new: Dict, threshold: float) -> bool:
+    a, b = old["position"], new["position"]
+    if math.dist((a["x"], a["y"], a["z"]), (b["x"], b["y"], b["z"])) > threshold:
+        return True
+    return old.get("sector") != new.get("sector") or old.get("priority") != new.get("priority")
+
+
+class VisualizationStream:
+    def __init__(self, move_threshold: float = 0.05, history: int = 256):
+        self.move_threshold = move_threshold
+        self.markers: Dict[str, Dict] = {}       # as last published
+        self.version = 0
+        self._deltas = deque(maxlen=history)     # (version, upsert ids -> marker, removed ids)
+        self._cond = threading.Condition()
+
+    def update(self, visualization: Dict) -> Optional[int]:
+        """
+        Publish a new full marker set; returns the new version, or None if
+        nothing changed beyond the threshold.
+        """
+        incoming = markers_by_id(visualization)
+        with self._cond:
+            upsert = {}
+            for marker_id, marker in incoming.items():
+                old = self.markers.get(marker_id)
+                if old is None or _moved(old, marker, self.move_threshold):
+                    upsert[marker_id] = marker
+            removed = [marker_id for marker_id in self.markers if marker_id not in incoming]
+            if not upsert and not removed:
+                return None
+            self.markers.update(upsert)
+            for marker_id in removed:
+                del self.markers[marker_id]
+            self.version += 1
+            self._deltas.append((self.version, upsert, removed))
+            self._cond.notify_all()
+            return self.version
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {"version": self.version, "since": 0, "full": True,
+                    "upsert": list(self.markers.values()), "remove": []}
+
+    def delta(self, since: int = 0) -> Dict:
+        """Changes between the client's acknowledged version `since` and now."""
+        with self._cond:
+            if since == self.version:
+                return {"version": self.version, "since": since, "full": False, "upsert": [], "remove": []}
+            oldest = self._deltas[0][0] if self._deltas else self.version + 1
+            if since <= 0 or since > self.version or since < oldest - 1:
+                return {"version": self.version, "since": 0, "full": True,
+                        "upsert": list(self.markers.values()), "remove": []}
+            # Merge the deltas after `since`: a later upsert or removal wins
+            upsert: Dict[str, Dict] = {}
+            removed = set()
+            for version, changed, gone in self._deltas:
+                if version <= since:
+                    continue
+                for marker_id, marker in changed.items():
+                    upsert[marker_id] = marker
+                    removed.discard(marker_id)
+                for marker_id in gone:
+                    upsert.pop(marker_id, None)
+                    removed.add(marker_id)
+            return {"version": self.version, "since": since, "full": False,
+                    "upsert": list(upsert.values()), "remove": sorted(removed)}
+
+    def wait(self, since: int, timeout: Optional[float] = None) -> bool:
+        """Block until the version moves past `since`; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.version != since, timeout)
+
+
+def apply_delta(markers: Dict[str, Dict], delta: Dict) -> Dict[str, Dict]:
+    """Client-side reference: apply a delta to an id -> marker dict (in place)."""
+    if delta["full"]:
+        markers.clear()
+    for marker in delta["upsert"]:
+        markers[marker["id"]] = marker
+    for marker_id in delta["remove"]:
+        markers.pop(marker_id, None)
+    return markers